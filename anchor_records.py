@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+锚定尚未锚定的追踪、生产和质检记录：组成 Merkle 树并把根哈希追加到账本文件
+
+用法:
+    python anchor_records.py                 # 锚定新记录（可配置为定时任务）
+    python anchor_records.py --verify-ledger # 校验账本哈希链
+"""
+
+import argparse
+import sys
+from src.models.database import SessionLocal
+from src.services.anchoring import anchor_pending, verify_ledger, LEDGER_PATH
+
+def main():
+    parser = argparse.ArgumentParser(description='追踪记录锚定')
+    parser.add_argument('--verify-ledger', action='store_true', help='只校验账本哈希链')
+    args = parser.parse_args()
+
+    if args.verify_ledger:
+        count, errors = verify_ledger()
+        for error in errors:
+            print(f"❌ {error}")
+        if errors:
+            return 1
+        print(f"✅ 账本 {LEDGER_PATH} 共 {count} 条记录，哈希链完整")
+        return 0
+
+    session = SessionLocal()
+    try:
+        batches = anchor_pending(session)
+        if not batches:
+            print("没有需要锚定的新记录")
+        for batch in batches:
+            print(f"✅ 批次 {batch.id}: {batch.leaf_count} 条记录，根哈希 {batch.merkle_root}")
+    except Exception as e:
+        session.rollback()
+        print(f"❌ 锚定记录时出错: {str(e)}")
+        return 1
+    finally:
+        session.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,12 @@
-# 从src/app导入配置好的Flask应用实例
+# 从src/app导入配置好的Flask应用实例（开发调试入口，生产环境使用 gunicorn -c gunicorn.conf.py src.app:app）
 import os
 from src.app import app
+from src.models.database import SessionLocal
+from src.services.anchoring import start_scheduler
 
 if __name__ == '__main__':
+    # 按 ANCHOR_INTERVAL_SECONDS 定期锚定新记录（gunicorn 部署时由 post_worker_init 启动）
+    start_scheduler(SessionLocal)
     host = os.getenv('HOST', '0.0.0.0')
     port = int(os.getenv('PORT', 5000))
-    app.run(host=host, port=port, debug=True)
\ No newline at end of file
+    app.run(host=host, port=port, debug=os.getenv('DEBUG', 'False') == 'True')
\ No newline at end of file
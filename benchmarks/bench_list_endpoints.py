@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+列表接口并发吞吐基准测试
+
+对运行中的服务依次以 1~32 个并发客户端请求各列表接口，
+输出吞吐量与延迟分位数，用于验证请求级会话和连接池配置的扩展性。
+
+用法:
+    python benchmarks/bench_list_endpoints.py --base-url http://localhost:5000 --duration 10
+"""
+
+import argparse
+from itertools import cycle
+
+from common import BASE_URL, BENCH_USER, BENCH_PASSWORD, login, run_load, print_results
+
+LIST_ENDPOINTS = ['/api/products', '/api/tracking', '/api/quality', '/api/suppliers', '/api/devices']
+
+def main():
+    parser = argparse.ArgumentParser(description='列表接口并发吞吐基准测试')
+    parser.add_argument('--base-url', default=BASE_URL)
+    parser.add_argument('--user', default=BENCH_USER)
+    parser.add_argument('--password', default=BENCH_PASSWORD)
+    parser.add_argument('--concurrency', default='1,2,4,8,16,32', help='逗号分隔的并发级别')
+    parser.add_argument('--duration', type=float, default=10, help='每个并发级别持续的秒数')
+    parser.add_argument('--endpoints', default=','.join(LIST_ENDPOINTS))
+    args = parser.parse_args()
+
+    headers = {'Authorization': f'Bearer {login(args.base_url, args.user, args.password)}'}
+    endpoints = args.endpoints.split(',')
+
+    def send(http, urls=cycle(endpoints)):
+        return http.get(f'{args.base_url}{next(urls)}?per_page=20', headers=headers, timeout=30)
+
+    results = []
+    for concurrency in [int(level) for level in args.concurrency.split(',')]:
+        results.append(run_load(send, concurrency, args.duration))
+        print(f"并发 {concurrency}: {results[-1]['rps']:.1f} req/s")
+
+    print_results(f"列表接口吞吐（{', '.join(endpoints)}）", results)
+
+if __name__ == '__main__':
+    main()
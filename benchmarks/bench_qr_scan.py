@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+二维码扫描接口延迟基准测试
+
+从 /api/tracking 取一批二维码，以默认 500 个并发扫描客户端反复随机扫描，
+输出吞吐量与 p50/p95/p99 延迟。对比缓存效果时，可用 SCAN_CACHE_TTL=0
+启动服务端关闭进程内缓存后再运行一次。
+
+用法:
+    python benchmarks/bench_qr_scan.py --base-url http://localhost:5000 --concurrency 500 --duration 30
+"""
+
+import argparse
+import random
+
+import requests
+
+from common import BASE_URL, BENCH_USER, BENCH_PASSWORD, login, run_load, print_results
+
+def fetch_codes(base_url, headers, count):
+    """按游标翻页读取二维码内容"""
+    codes = []
+    cursor = None
+    while len(codes) < count:
+        params = {'per_page': 100, 'total': 'none'}
+        if cursor:
+            params['cursor'] = cursor
+        data = requests.get(f'{base_url}/api/tracking', params=params, headers=headers, timeout=30).json()
+        codes.extend(item['qr_code'] for item in data.get('tracking_data', []))
+        cursor = data.get('next_cursor')
+        if not cursor:
+            break
+    return codes[:count]
+
+def main():
+    parser = argparse.ArgumentParser(description='二维码扫描接口延迟基准测试')
+    parser.add_argument('--base-url', default=BASE_URL)
+    parser.add_argument('--user', default=BENCH_USER)
+    parser.add_argument('--password', default=BENCH_PASSWORD)
+    parser.add_argument('--path', default='/api/tracking/qrcode', help='扫描接口路径')
+    parser.add_argument('--concurrency', default='500', help='逗号分隔的并发级别')
+    parser.add_argument('--duration', type=float, default=30, help='每个并发级别持续的秒数')
+    parser.add_argument('--codes', type=int, default=1000, help='参与扫描的二维码数量')
+    args = parser.parse_args()
+
+    headers = {'Authorization': f'Bearer {login(args.base_url, args.user, args.password)}'}
+    codes = fetch_codes(args.base_url, headers, args.codes)
+    if not codes:
+        print('❌ 没有可扫描的追踪数据，请先创建追踪记录')
+        return
+    print(f'✅ 读取到 {len(codes)} 个二维码')
+
+    def send(http):
+        return http.post(f'{args.base_url}{args.path}', json={'qr_code': random.choice(codes)}, headers=headers, timeout=60)
+
+    results = []
+    for concurrency in [int(level) for level in args.concurrency.split(',')]:
+        results.append(run_load(send, concurrency, args.duration))
+        print(f"并发 {concurrency}: {results[-1]['rps']:.1f} req/s, p99 {results[-1]['p99_ms']:.1f} ms")
+
+    print_results(f'二维码扫描延迟（{len(codes)} 个二维码随机扫描）', results)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+工作进程启动开销基准测试
+
+在全新的 Python 进程中导入 src.app，统计导入耗时、导入后的 RSS，以及
+matplotlib、pandas、qrcode 等重型依赖是否在启动时被加载。
+加 --gunicorn 时以 --preload 启动 gunicorn，读取每个工作进程的 RSS 和
+PSS（按共享页分摊后的内存），用于确认预加载的应用状态在进程间共享。
+
+用法:
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --gunicorn --workers 4
+"""
+
+import argparse
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ['matplotlib', 'pandas', 'numpy', 'qrcode', 'PIL', 'openpyxl', 'cv2', 'pymongo', 'redis']
+
+IMPORT_PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+import src.app
+elapsed = time.perf_counter() - started
+rss = next(int(line.split()[1]) for line in open('/proc/self/status') if line.startswith('VmRSS'))
+print(json.dumps({'import_ms': elapsed * 1000, 'rss_kb': rss,
+                  'heavy': [name for name in %r if name in sys.modules]}))
+''' % (HEAVY_MODULES,)
+
+def probe_env():
+    env = dict(os.environ)
+    env.setdefault('DATABASE_URL', 'sqlite:////tmp/bench_startup.db')
+    env['DB_ECHO'] = 'False'
+    return env
+
+def measure_imports(runs):
+    """每次在新进程中导入应用，返回各次结果"""
+    results = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', IMPORT_PROBE], cwd=PROJECT_ROOT, env=probe_env(),
+            capture_output=True, text=True, check=True
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return results
+
+def read_memory(pid):
+    """读取进程的 RSS 和 PSS（kB）"""
+    rss = pss = 0
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmRSS'):
+                rss = int(line.split()[1])
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    pss = int(line.split()[1])
+    except OSError:
+        pass
+    return rss, pss
+
+def child_pids(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+def measure_gunicorn(workers, port, preload, timeout=60):
+    """启动 gunicorn，等待工作进程就绪后读取主进程和各工作进程内存"""
+    command = [sys.executable, '-m', 'gunicorn', '-w', str(workers), '-b', f'127.0.0.1:{port}', 'src.app:app']
+    if preload:
+        command.insert(3, '--preload')
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=PROJECT_ROOT, env=probe_env(),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        import requests
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                requests.get(f'http://127.0.0.1:{port}/', timeout=1)
+                break
+            except requests.RequestException:
+                time.sleep(0.2)
+        ready = time.perf_counter() - started
+        while len(child_pids(process.pid)) < workers and time.monotonic() < deadline:
+            time.sleep(0.2)
+        time.sleep(1)
+        return {
+            'ready_s': ready,
+            'master': read_memory(process.pid),
+            'workers': [read_memory(pid) for pid in child_pids(process.pid)]
+        }
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=30)
+
+def main():
+    parser = argparse.ArgumentParser(description='工作进程启动开销基准测试')
+    parser.add_argument('--runs', type=int, default=5, help='导入测试次数')
+    parser.add_argument('--gunicorn', action='store_true', help='同时测试 gunicorn 工作进程内存')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--port', type=int, default=5077)
+    parser.add_argument('--no-preload', action='store_true', help='gunicorn 不使用 --preload（对照）')
+    args = parser.parse_args()
+
+    results = measure_imports(args.runs)
+    import_ms = [row['import_ms'] for row in results]
+    rss_kb = [row['rss_kb'] for row in results]
+    print(f"导入 src.app（{args.runs} 次）")
+    print(f"  耗时 中位数 {statistics.median(import_ms):.0f} ms  最小 {min(import_ms):.0f} ms  最大 {max(import_ms):.0f} ms")
+    print(f"  RSS  中位数 {statistics.median(rss_kb) / 1024:.1f} MB")
+    print(f"  启动时已加载的重型依赖: {', '.join(results[0]['heavy']) or '无'}")
+
+    if args.gunicorn:
+        report = measure_gunicorn(args.workers, args.port, not args.no_preload)
+        mode = '不预加载' if args.no_preload else '--preload'
+        print(f"\ngunicorn {mode}，{args.workers} 个工作进程（就绪 {report['ready_s']:.1f}s）")
+        rss, pss = report['master']
+        print(f"  主进程   RSS {rss / 1024:8.1f} MB  PSS {pss / 1024:8.1f} MB")
+        for index, (rss, pss) in enumerate(report['workers']):
+            print(f"  工作进程{index} RSS {rss / 1024:8.1f} MB  PSS {pss / 1024:8.1f} MB")
+        total_pss = report['master'][1] + sum(pss for rss, pss in report['workers'])
+        print(f"  PSS 合计 {total_pss / 1024:.1f} MB")
+
+if __name__ == '__main__':
+    main()
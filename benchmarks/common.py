@@ -0,0 +1,83 @@
+"""
+基准测试公共工具：登录获取Token、并发压测与结果统计
+"""
+
+import os
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# 允许以 python benchmarks/xxx.py 方式运行时导入 src 包
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BASE_URL = os.getenv('BENCH_BASE_URL', 'http://localhost:5000')
+BENCH_USER = os.getenv('BENCH_USER', 'admin')
+BENCH_PASSWORD = os.getenv('BENCH_PASSWORD', 'admin')
+
+def login(base_url=BASE_URL, username=BENCH_USER, password=BENCH_PASSWORD):
+    """登录并返回访问令牌"""
+    response = requests.post(f'{base_url}/api/auth/login', json={'username': username, 'password': password}, timeout=10)
+    response.raise_for_status()
+    return response.json()['access_token']
+
+def percentile(values, pct):
+    """计算百分位数（毫秒）"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))
+    return values[index] * 1000
+
+def run_load(send, concurrency, duration):
+    """以 concurrency 个并发客户端持续调用 send(http_session) duration 秒
+
+    send 返回 HTTP 响应，状态码 >= 400 计为错误。
+    """
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        http = requests.Session()
+        local_latencies = []
+        local_errors = 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                response = send(http)
+                if response.status_code >= 400:
+                    local_errors += 1
+            except requests.RequestException:
+                local_errors += 1
+            local_latencies.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in range(concurrency):
+            executor.submit(client)
+    elapsed = time.perf_counter() - started
+
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': errors[0],
+        'rps': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99)
+    }
+
+def print_results(title, results):
+    """打印压测结果表格"""
+    print(f"\n{title}")
+    print(f"{'并发':>6} {'请求数':>8} {'错误':>6} {'吞吐(req/s)':>12} {'p50(ms)':>9} {'p95(ms)':>9} {'p99(ms)':>9}")
+    for row in results:
+        print(f"{row['concurrency']:>6} {row['requests']:>8} {row['errors']:>6} {row['rps']:>12.1f} "
+              f"{row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f}")
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+开发服务器与 gunicorn 的吞吐对比压测
+
+依次以 Flask 开发服务器（python -m src.app）和 gunicorn（gunicorn.conf.py）
+启动应用，对列表接口和二维码扫描接口在多个并发级别下压测，输出各模式的
+吞吐量、延迟分位数以及 gunicorn 相对开发服务器的吞吐倍数。
+两种模式使用同一个数据库（DATABASE_URL 或 .env 配置），需先准备好数据和压测账号。
+已有运行中的服务时可用 --base-url 只压测该服务。
+
+用法:
+    python benchmarks/load_test.py --modes dev,gunicorn --concurrency 1,8,32 --duration 10
+    GUNICORN_WORKERS=4 GUNICORN_THREADS=8 python benchmarks/load_test.py --modes gunicorn
+    python benchmarks/load_test.py --base-url http://localhost:5000
+"""
+
+import argparse
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+from itertools import cycle
+
+import requests
+
+from common import BENCH_USER, BENCH_PASSWORD, login, run_load, print_results
+from bench_list_endpoints import LIST_ENDPOINTS
+from bench_qr_scan import fetch_codes
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVER_COMMANDS = {
+    'dev': [sys.executable, '-m', 'src.app'],
+    'gunicorn': [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'src.app:app'],
+}
+
+def start_server(mode, port, timeout=60):
+    """启动服务并等待首页可访问"""
+    env = dict(os.environ, PORT=str(port), HOST='127.0.0.1', DEBUG='False', DB_ECHO='False')
+    process = subprocess.Popen(SERVER_COMMANDS[mode], cwd=PROJECT_ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'{mode} 服务启动失败，退出码 {process.returncode}')
+        try:
+            requests.get(f'http://127.0.0.1:{port}/', timeout=1)
+            return process
+        except requests.RequestException:
+            time.sleep(0.2)
+    stop_server(process)
+    raise RuntimeError(f'{mode} 服务 {timeout} 秒内未就绪')
+
+def stop_server(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+def run_scenarios(base_url, args):
+    """压测列表接口和扫描接口，返回 {场景: 结果列表}"""
+    headers = {'Authorization': f'Bearer {login(base_url, args.user, args.password)}'}
+    codes = fetch_codes(base_url, headers, args.codes)
+
+    def send_list(http, urls=cycle(LIST_ENDPOINTS)):
+        return http.get(f'{base_url}{next(urls)}?per_page=20', headers=headers, timeout=60)
+
+    def send_scan(http):
+        return http.post(f'{base_url}{args.scan_path}', json={'qr_code': random.choice(codes)}, headers=headers, timeout=60)
+
+    scenarios = {'列表接口': send_list}
+    if codes:
+        scenarios['二维码扫描'] = send_scan
+    else:
+        print('❌ 没有可扫描的追踪数据，跳过扫描接口')
+
+    results = {}
+    for name, send in scenarios.items():
+        results[name] = []
+        for concurrency in [int(level) for level in args.concurrency.split(',')]:
+            results[name].append(run_load(send, concurrency, args.duration))
+            print(f"  {name} 并发 {concurrency}: {results[name][-1]['rps']:.1f} req/s")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='开发服务器与 gunicorn 的吞吐对比压测')
+    parser.add_argument('--modes', default='dev,gunicorn', help='逗号分隔的启动模式：dev, gunicorn')
+    parser.add_argument('--base-url', help='压测已运行的服务，不自行启动')
+    parser.add_argument('--port', type=int, default=5088)
+    parser.add_argument('--user', default=BENCH_USER)
+    parser.add_argument('--password', default=BENCH_PASSWORD)
+    parser.add_argument('--concurrency', default='1,8,32', help='逗号分隔的并发级别')
+    parser.add_argument('--duration', type=float, default=10, help='每个并发级别持续的秒数')
+    parser.add_argument('--codes', type=int, default=500, help='参与扫描的二维码数量')
+    parser.add_argument('--scan-path', default='/api/tracking/qrcode', help='扫描接口路径')
+    args = parser.parse_args()
+
+    all_results = {}
+    if args.base_url:
+        all_results[args.base_url] = run_scenarios(args.base_url, args)
+    else:
+        for mode in args.modes.split(','):
+            print(f'启动 {mode} 服务...')
+            process = start_server(mode, args.port)
+            try:
+                all_results[mode] = run_scenarios(f'http://127.0.0.1:{args.port}', args)
+            finally:
+                stop_server(process)
+
+    for mode, results in all_results.items():
+        for name, rows in results.items():
+            print_results(f'{mode} - {name}', rows)
+
+    if 'dev' in all_results and 'gunicorn' in all_results:
+        print('\ngunicorn 相对开发服务器的吞吐倍数')
+        for name, rows in all_results['gunicorn'].items():
+            baseline = {row['concurrency']: row['rps'] for row in all_results['dev'].get(name, [])}
+            for row in rows:
+                if baseline.get(row['concurrency']):
+                    print(f"  {name} 并发 {row['concurrency']:>3}: {row['rps'] / baseline[row['concurrency']]:.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -1,43 +1,43 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 """
-检查并初始化数据库所有表
+检查数据库表和结构版本，缺少的表通过迁移创建
 """
 
 from sqlalchemy import inspect
 from src.models.database import engine, Base
-from src.models.user import User
-from src.models.device import Device
-from src.models.product import Product
-from src.models.supplier import Supplier
-from src.models.tracking import ProductionRecord, QualityCheck
+import src.models  # noqa: F401  确保所有模型已注册
+from src.models.migrations import CURRENT_VERSION, current_version, migrate
 
 def check_and_create_tables():
     print("检查数据库表...")
     
-    # 获取所有已定义的模型
-    models = [User, Device, Product, Supplier, ProductionRecord, QualityCheck]
-    
     # 获取数据库中的表
     inspector = inspect(engine)
-    existing_tables = inspector.get_table_names()
+    existing_tables = set(inspector.get_table_names())
     
-    print(f"数据库中已存在的表: {existing_tables}")
-    print("需要创建的模型表:")
+    print(f"数据库中已存在的表: {sorted(existing_tables)}")
     
     # 检查每个模型的表是否存在
-    tables_to_create = []
-    for model in models:
-        table_name = model.__tablename__
+    missing_tables = []
+    for table_name in sorted(Base.metadata.tables):
         if table_name in existing_tables:
             print(f"✅ {table_name} 表已存在")
         else:
             print(f"❌ {table_name} 表不存在，需要创建")
-            tables_to_create.append(table_name)
+            missing_tables.append(table_name)
+    
+    with engine.connect() as connection:
+        version = current_version(connection)
+    print(f"\n数据库结构版本: {version}，代码要求版本: {CURRENT_VERSION}")
     
-    # 创建不存在的表
-    if tables_to_create:
-        print(f"\n开始创建 {len(tables_to_create)} 个表...")
+    # 版本落后时执行迁移；版本已是最新但有表缺失（如被手动删除）时补建
+    if version < CURRENT_VERSION:
+        print("开始执行数据库迁移...")
+        migrate(engine)
+        print("✅ 数据库结构已更新")
+    elif missing_tables:
+        print(f"\n开始补建 {len(missing_tables)} 个表...")
         Base.metadata.create_all(bind=engine)
         print("✅ 所有表创建完成")
     else:
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+gunicorn 生产环境配置
+
+用法:
+    gunicorn -c gunicorn.conf.py src.app:app
+
+- preload_app: 主进程导入应用（路由、模型、ORM 映射器），工作进程 fork 后共享这些内存页；
+  主进程不启动后台线程，ANCHOR_INTERVAL_SECONDS 的锚定线程在 post_worker_init 中随工作进程启动，
+  由调度锁保证同一时刻只有一个工作进程定期锚定
+- 工作进程默认 gthread（GUNICORN_WORKER_CLASS=gevent 可切换为协程），
+  处理 max_requests 个请求后加随机抖动重启，避免内存缓慢增长
+- 数据库连接池按工作进程的并发数和 DB_MAX_CONNECTIONS 总预算计算，
+  显式设置的 DB_POOL_SIZE / DB_MAX_OVERFLOW 优先
+"""
+import multiprocessing
+import os
+
+CPU_COUNT = multiprocessing.cpu_count()
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', 5000)}"
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.getenv('GUNICORN_WORKERS', CPU_COUNT * 2 + 1 if worker_class == 'sync' else max(2, CPU_COUNT)))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 100))
+
+preload_app = True
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', max_requests // 10))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+# 心跳文件放在内存文件系统，避免容器磁盘 IO 抖动导致工作进程被误杀
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+# 生产配置默认值（应用导入前设置，环境变量已设置时不覆盖）
+os.environ.setdefault('APP_ENV', 'production')
+
+
+def worker_concurrency():
+    """单个工作进程同时处理的请求数"""
+    if worker_class == 'gthread':
+        return threads
+    if worker_class in ('gevent', 'eventlet'):
+        return worker_connections
+    return 1
+
+
+def pool_settings(max_connections=None):
+    """按工作进程数分摊数据库连接预算，返回 (pool_size, max_overflow)
+
+    常驻连接数等于单进程并发数（不超过预算），余下预算留作溢出连接，
+    供导出任务、后台线程和突发请求使用
+    """
+    max_connections = max_connections or int(os.getenv('DB_MAX_CONNECTIONS', 100))
+    budget = max(1, max_connections // workers)
+    pool_size = min(worker_concurrency(), budget)
+    return pool_size, max(0, budget - pool_size)
+
+
+_pool_size, _max_overflow = pool_settings()
+os.environ.setdefault('DB_POOL_SIZE', str(_pool_size))
+os.environ.setdefault('DB_MAX_OVERFLOW', str(_max_overflow))
+os.environ.setdefault('DB_POOL_WARMUP', str(min(_pool_size, 2)))
+
+
+def when_ready(server):
+    server.log.info(
+        f"工作进程 {workers} 个（{worker_class}，并发 {worker_concurrency()}），"
+        f"每进程连接池 {os.environ['DB_POOL_SIZE']} + 溢出 {os.environ['DB_MAX_OVERFLOW']}"
+    )
+
+
+def post_fork(server, worker):
+    # 丢弃从主进程继承的数据库连接，按配置预热本进程的连接池
+    from src.models.database import init_worker_pool
+    init_worker_pool()
+
+
+def post_worker_init(worker):
+    # 按 ANCHOR_INTERVAL_SECONDS 定期锚定新记录（未配置时由 anchor_records.py 定时任务执行）
+    from src.models.database import SessionLocal
+    from src.services.anchoring import start_scheduler
+    start_scheduler(SessionLocal)
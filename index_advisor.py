@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+索引顾问：对各接口的查询运行 EXPLAIN，报告全表扫描和额外排序
+
+存在问题时以退出码 1 结束，可用于部署前检查。
+"""
+
+import sys
+from src.models.database import SessionLocal
+from src.services.index_advisor import advise
+
+def main():
+    session = SessionLocal()
+    try:
+        report = advise(session)
+    finally:
+        session.close()
+
+    problems = 0
+    for item in report:
+        status = '❌' if item['issues'] else '✅'
+        print(f"{status} {item['endpoint']}")
+        print(f"    执行计划: {item['plan']}")
+        for issue in item['issues']:
+            print(f"    {issue}")
+        problems += len(item['issues'])
+
+    print(f"\n共检查 {len(report)} 个查询，发现 {problems} 个问题")
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
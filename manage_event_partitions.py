@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+为 tracking_events 表补建未来月份的分区（仅 MySQL，建议每月定时执行）
+
+用法:
+    python manage_event_partitions.py --months-ahead 3
+"""
+
+import argparse
+import sys
+from src.models.database import engine
+from src.services.tracking_events import ensure_event_partitions
+
+def main():
+    parser = argparse.ArgumentParser(description='追踪事件表分区维护')
+    parser.add_argument('--months-ahead', type=int, default=3, help='提前创建的月份数')
+    args = parser.parse_args()
+
+    try:
+        with engine.begin() as connection:
+            created = ensure_event_partitions(connection, args.months_ahead)
+        if created:
+            print(f"✅ 已创建分区: {', '.join(created)}")
+        else:
+            print("✅ 分区已是最新（或当前数据库不支持分区）")
+        return 0
+    except Exception as e:
+        print(f"❌ 维护分区时出错: {str(e)}")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+执行数据库结构迁移（部署时运行，或设置 DB_AUTO_MIGRATE=True 由应用启动时执行）
+
+用法:
+    python migrate.py             # 执行全部未完成的迁移
+    python migrate.py --status    # 查看当前版本和待执行的迁移
+    python migrate.py --target 3  # 只迁移到指定版本
+"""
+
+import argparse
+import sys
+from src.models.database import engine
+from src.models.migrations import CURRENT_VERSION, current_version, pending_migrations, migrate
+
+def main():
+    parser = argparse.ArgumentParser(description='数据库结构迁移')
+    parser.add_argument('--status', action='store_true', help='只查看迁移状态')
+    parser.add_argument('--target', type=int, help='目标版本（默认最新）')
+    args = parser.parse_args()
+
+    try:
+        with engine.connect() as connection:
+            version = current_version(connection)
+        pending = pending_migrations(version)
+        print(f"数据库结构版本: {version}，代码要求版本: {CURRENT_VERSION}")
+
+        if args.status:
+            for number, name, upgrade in pending:
+                print(f"❌ 待执行: {number:04d} {name}")
+            if not pending:
+                print("✅ 数据库结构已是最新")
+            return 0
+
+        applied = migrate(engine, target=args.target)
+        if not applied:
+            print("✅ 没有需要执行的迁移")
+        else:
+            print(f"✅ 已执行 {len(applied)} 个迁移，当前版本 {applied[-1]}")
+    except Exception as e:
+        print(f"❌ 数据库迁移时出错: {str(e)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+为已有数据库补建模型中声明的索引
+
+用法:
+    python migrate_indexes.py            # 创建缺失的索引
+    python migrate_indexes.py --dry-run  # 只列出缺失的索引
+"""
+
+import sys
+from src.models.database import engine
+import src.models  # noqa: F401  确保所有模型已注册
+from src.models.indexes import ensure_indexes
+
+def main():
+    dry_run = '--dry-run' in sys.argv
+    print("检查数据库索引...")
+    indexes = ensure_indexes(engine, dry_run=dry_run)
+    if not indexes:
+        print("✅ 所有索引都已存在")
+        return
+    for name in indexes:
+        print(f"{'❌ 缺少索引' if dry_run else '✅ 已创建索引'}: {name}")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ 补建索引时出错: {str(e)}")
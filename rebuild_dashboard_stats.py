@@ -0,0 +1,24 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+从业务表全量重建仪表盘统计汇总表 dashboard_stats
+"""
+
+from src.models.database import SessionLocal
+from src.services.dashboard_stats import rebuild_stats
+
+def main():
+    session = SessionLocal()
+    try:
+        print("开始重建仪表盘统计...")
+        counts = rebuild_stats(session)
+        session.commit()
+        print(f"✅ 统计重建完成，共 {len(counts)} 个统计项")
+    except Exception as e:
+        session.rollback()
+        print(f"❌ 重建统计时出错: {str(e)}")
+    finally:
+        session.close()
+
+if __name__ == "__main__":
+    main()
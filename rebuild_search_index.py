@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+为全部产品重建 n-gram 搜索倒排索引 product_search_terms
+
+用法:
+    python rebuild_search_index.py            # 全量重建
+    python rebuild_search_index.py --pending  # 只为待索引队列中的产品补建（可配置为定时任务）
+"""
+
+import argparse
+from src.models.database import SessionLocal
+from src.services.search import rebuild_search_index, index_pending
+
+def main():
+    parser = argparse.ArgumentParser(description='重建产品搜索索引')
+    parser.add_argument('--pending', action='store_true', help='只为批量导入后尚未建立索引的产品补建')
+    args = parser.parse_args()
+
+    session = SessionLocal()
+    try:
+        if args.pending:
+            print("开始为待索引队列中的产品建立索引...")
+            total = index_pending(session)
+            print(f"✅ 补建完成，共 {total} 个产品")
+            return
+        print("开始重建产品搜索索引...")
+        total = rebuild_search_index(session)
+        session.commit()
+        print(f"✅ 索引重建完成，共 {total} 个产品")
+    except Exception as e:
+        session.rollback()
+        print(f"❌ 重建搜索索引时出错: {str(e)}")
+    finally:
+        session.close()
+
+if __name__ == "__main__":
+    main()
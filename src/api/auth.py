@@ -4,6 +4,7 @@ from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identi
 from datetime import timedelta
 from src.models.database import db_session
 from src.models.user import User
+from src.api.auth_middleware import user_claims, user_cache
 
 class Register(Resource):
     def post(self):
@@ -57,8 +58,10 @@ class Login(Resource):
         if not user.is_active:
             return {'message': '用户账号已被禁用'}, 403
 
-        # 创建访问令牌 - 这里移除了对app.config的直接依赖
-        access_token = create_access_token(identity=user.id)
+        # 创建访问令牌，角色与激活状态写入声明，鉴权时无需再查询用户表
+        claims = user_claims(user)
+        access_token = create_access_token(identity=user.id, additional_claims=claims)
+        user_cache.set(user.id, (claims['role'], claims['active']))
 
         return {
             'message': '登录成功',
@@ -1,8 +1,71 @@
+import os
+import time
 from functools import wraps
 from flask import jsonify
-from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity, get_jwt
+from sqlalchemy import event, inspect
 from src.models.user import User
 from src.models.database import db_session
+from src.utils.cache import TTLCache
+
+# 用户角色与激活状态缓存：user_id -> (role, is_active)
+# 其他进程中的角色变更或禁用最多延迟 USER_CACHE_TTL 秒生效
+user_cache = TTLCache(
+    maxsize=int(os.getenv('USER_CACHE_SIZE', 10000)),
+    ttl=int(os.getenv('USER_CACHE_TTL', 30))
+)
+# 缓存中表示用户不存在（或已删除）的值
+MISSING_USER = ()
+
+def user_claims(user):
+    """登录时写入JWT的附加声明"""
+    return {'role': user.role, 'active': bool(user.is_active)}
+
+def resolve_user_state(user_id, claims):
+    """获取用户的 (角色, 是否激活)，用户不存在时返回 None"""
+    state = user_cache.get(user_id)
+    if state is not None:
+        return state or None
+
+    # 令牌签发时间仍在缓存有效期内时，令牌中的声明与缓存同样新鲜，无需查询数据库
+    age = time.time() - claims.get('iat', 0)
+    if 'role' in claims and 'active' in claims and age < user_cache.ttl:
+        state = (claims['role'], claims['active'])
+        user_cache.set(user_id, state, ttl=user_cache.ttl - age)
+        return state
+
+    row = db_session.query(User.role, User.is_active).filter_by(id=user_id).first()
+    state = (row.role, bool(row.is_active)) if row else MISSING_USER
+    user_cache.set(user_id, state)
+    return state or None
+
+def _after_flush(session, flush_context):
+    pending = session.info.setdefault('user_cache_pending', {})
+    for obj in session.new:
+        if isinstance(obj, User):
+            pending[obj.id] = (obj.role, bool(obj.is_active))
+    for obj in session.dirty:
+        if isinstance(obj, User):
+            state = inspect(obj)
+            if state.attrs.role.history.has_changes() or state.attrs.is_active.history.has_changes():
+                pending[obj.id] = (obj.role, bool(obj.is_active))
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            pending[obj.id] = MISSING_USER
+
+def _after_commit(session):
+    # 提交后用最新状态覆盖缓存（而不是删除），避免旧令牌中的声明再次被采信
+    for user_id, state in session.info.pop('user_cache_pending', {}).items():
+        user_cache.set(user_id, state)
+
+def _after_rollback(session):
+    session.info.pop('user_cache_pending', None)
+
+def install_user_cache_listeners(session_factory):
+    """为会话工厂注册用户角色、激活状态变更时的缓存刷新事件"""
+    for name, listener in (('after_flush', _after_flush), ('after_commit', _after_commit), ('after_rollback', _after_rollback)):
+        if not event.contains(session_factory, name, listener):
+            event.listen(session_factory, name, listener)
 
 def jwt_required(fn):
     """验证JWT令牌的装饰器"""
@@ -23,18 +86,21 @@ def roles_required(*required_roles):
         def wrapper(*args, **kwargs):
             try:
                 verify_jwt_in_request()
-                user_id = get_jwt_identity()
-                user = db_session.query(User).filter_by(id=user_id).first()
-                
-                if not user:
+                state = resolve_user_state(get_jwt_identity(), get_jwt())
+
+                if not state:
                     # 返回字典而不是jsonify对象，以兼容Flask-RESTful
                     return {'message': '用户不存在'}, 404
-                
+
+                role, is_active = state
+                if not is_active:
+                    return {'message': '用户账号已被禁用'}, 403
+
                 # 检查用户角色是否在允许的角色列表中
-                if user.role not in required_roles:
+                if role not in required_roles:
                     # 返回字典而不是jsonify对象，以兼容Flask-RESTful
                     return {'message': '权限不足'}, 403
-                
+
                 return fn(*args, **kwargs)
             except Exception as e:
                 # 返回字典而不是jsonify对象，以兼容Flask-RESTful
@@ -42,7 +108,11 @@ def roles_required(*required_roles):
         return wrapper
     return decorator
 
+def get_current_user_id():
+    """获取当前登录用户ID（不查询数据库）"""
+    return get_jwt_identity()
+
 def get_current_user():
     """获取当前登录用户"""
     user_id = get_jwt_identity()
-    return db_session.query(User).filter_by(id=user_id).first()
\ No newline at end of file
+    return db_session.query(User).filter_by(id=user_id).first()
@@ -3,6 +3,9 @@ from flask_restful import Resource
 from src.models.database import db_session
 from src.models.device import Device
 from src.api.auth_middleware import jwt_required, roles_required
+from src.utils.pagination import keyset_paginate, pagination_meta
+from src.utils import http_cache
+from src.utils.serializers import SERIALIZERS
 from datetime import datetime
 
 class DeviceList(Resource):
@@ -10,6 +13,13 @@ class DeviceList(Resource):
     def get(self):
         """获取设备列表"""
         try:
+            validators = http_cache.collection_validators(db_session, 'devices')
+            cached = http_cache.not_modified(*validators)
+            if cached:
+                return cached
+            
+            serializer = SERIALIZERS['devices']
+            fields = serializer.parse_fields(request.args.get('fields'))
             page = request.args.get('page', 1, type=int)
             per_page = request.args.get('per_page', 20, type=int)
             device_type = request.args.get('type')
@@ -27,19 +37,19 @@ class DeviceList(Resource):
             if location:
                 query = query.filter_by(location=location)
             
-            pagination = query.order_by(Device.device_name).paginate(
-                page=page, per_page=per_page, error_out=False
+            # 只查询需要的列（加上排序列），不构造 ORM 对象
+            order_by = [(Device.device_name, False), (Device.id, False)]
+            result = keyset_paginate(
+                serializer.query(query, fields, [column for column, descending in order_by]), order_by,
+                cursor=request.args.get('cursor'), per_page=per_page,
+                total=request.args.get('total'), page=page
             )
             
-            devices = pagination.items
-            total = pagination.total
-            
-            return {
-                'devices': [device.to_dict() for device in devices],
-                'total': total,
-                'page': page,
-                'per_page': per_page
-            }, 200
+            response = {'devices': serializer.dump_rows(result['items'], fields)}
+            response.update(pagination_meta(result))
+            return response, 200, http_cache.cache_headers(*validators)
+        except ValueError as e:
+            return {'message': str(e)}, 400
         except Exception as e:
             return {'message': '获取设备列表失败', 'error': str(e)}, 500
     
@@ -71,11 +81,25 @@ class DeviceDetail(Resource):
     @jwt_required
     def get(self, device_id):
         """获取设备详情"""
-        device = db_session.query(Device).filter_by(id=device_id).first()
-        if not device:
+        serializer = SERIALIZERS['devices']
+        try:
+            fields = serializer.parse_fields(request.args.get('fields'))
+        except ValueError as e:
+            return {'message': str(e)}, 400
+        
+        # 先只查询版本列，条件请求命中时不加载整行
+        validators = http_cache.row_validators(db_session, Device, device_id)
+        if validators is None:
+            return {'message': '设备不存在'}, 404
+        cached = http_cache.not_modified(*validators)
+        if cached:
+            return cached
+        
+        row = serializer.query(db_session.query(Device), fields).filter(Device.id == device_id).first()
+        if not row:
             return {'message': '设备不存在'}, 404
         
-        return {'device': device.to_dict()}, 200
+        return {'device': serializer.dump(row, fields)}, 200, http_cache.cache_headers(*validators)
     
     @roles_required('admin', 'manager')
     def put(self, device_id):
@@ -0,0 +1,79 @@
+from flask import request, Response, send_file, stream_with_context
+from flask_restful import Resource
+from src.api.auth_middleware import roles_required, get_current_user_id
+from src.services import export
+from src.utils.utils import log_operation
+from datetime import datetime
+import os
+
+class DataExport(Resource):
+    @roles_required('admin', 'manager')
+    def get(self, dataset):
+        """以分块 CSV 响应流式导出数据集（products、quality_checks、production_records、tracking_events）"""
+        try:
+            export.get_dataset(dataset)
+            filters = export.parse_filters(request.args)
+        except ValueError as e:
+            return {'message': str(e)}, 400
+
+        log_operation(get_current_user_id(), 'export', dataset, None, {'format': 'csv', 'mode': 'stream'})
+        filename = f"{dataset}_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.csv"
+        return Response(
+            stream_with_context(export.stream_csv(dataset, filters)),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
+        )
+
+class ExportJobList(Resource):
+    @roles_required('admin', 'manager')
+    def post(self):
+        """提交后台导出任务（xlsx 或 csv），完成后通过下载地址获取文件"""
+        data = request.get_json() or {}
+        try:
+            filters = export.parse_filters(data)
+            job = export.submit_job(
+                data.get('dataset'), data.get('format', 'xlsx'), filters, user_id=get_current_user_id()
+            )
+        except ValueError as e:
+            return {'message': str(e)}, 400
+        except Exception as e:
+            return {'message': '提交导出任务失败', 'error': str(e)}, 500
+
+        log_operation(get_current_user_id(), 'export', job['dataset'], None, {'format': job['format'], 'job_id': job['id']})
+        return {
+            'message': '导出任务已提交',
+            'job': job,
+            'status_url': f"/api/exports/jobs/{job['id']}"
+        }, 202
+
+class ExportJobDetail(Resource):
+    @roles_required('admin', 'manager')
+    def get(self, job_id):
+        """查询导出任务状态"""
+        job = export.get_job(job_id)
+        if not job:
+            return {'message': '导出任务不存在或已过期'}, 404
+
+        result = {'job': job}
+        if job['status'] == 'done':
+            result['download_url'] = f'/api/exports/jobs/{job_id}/download'
+        return result, 200
+
+class ExportJobDownload(Resource):
+    @roles_required('admin', 'manager')
+    def get(self, job_id):
+        """下载已完成的导出文件"""
+        job = export.get_job(job_id)
+        if not job:
+            return {'message': '导出任务不存在或已过期'}, 404
+        if job['status'] != 'done':
+            return {'message': '导出任务尚未完成', 'status': job['status']}, 409
+
+        path = export.job_file_path(job)
+        if not os.path.exists(path):
+            return {'message': '导出文件已被清理'}, 410
+        return send_file(
+            path,
+            as_attachment=True,
+            download_name=f"{job['dataset']}_{job_id[:8]}.{job['format']}"
+        )
@@ -2,13 +2,27 @@ from flask import request, jsonify
 from flask_restful import Resource
 from src.models.database import db_session
 from src.models.product import Product
-from src.api.auth_middleware import jwt_required, roles_required
+from src.api.auth_middleware import jwt_required, roles_required, get_current_user_id
+from src.utils.utils import log_operation
+from src.utils.pagination import keyset_paginate, pagination_meta
+from src.utils import http_cache
+from src.utils.serializers import SERIALIZERS
+from src.services.search import search_products, index_in_background, SEARCH_FIELDS
+from src.services import transitions
+from src.services.bulk_import import import_products, iter_json_rows, iter_ndjson_rows, iter_csv_rows, BATCH_SIZE, COMMIT_SIZE
 
 class ProductList(Resource):
     @jwt_required
     def get(self):
         """获取产品列表"""
         try:
+            validators = http_cache.collection_validators(db_session, 'products')
+            cached = http_cache.not_modified(*validators)
+            if cached:
+                return cached
+            
+            serializer = SERIALIZERS['products']
+            fields = serializer.parse_fields(request.args.get('fields'))
             # 获取查询参数
             page = request.args.get('page', 1, type=int)
             per_page = request.args.get('per_page', 20, type=int)
@@ -24,21 +38,20 @@ class ProductList(Resource):
             if status:
                 query = query.filter_by(status=status)
             
-            # 分页
-            pagination = query.order_by(Product.created_at.desc()).paginate(
-                page=page, per_page=per_page, error_out=False
+            # 游标分页，按 (created_at, id) 倒序
+            # 只查询需要的列（加上排序列），不构造 ORM 对象
+            order_by = [(Product.created_at, True), (Product.id, True)]
+            result = keyset_paginate(
+                serializer.query(query, fields, [column for column, descending in order_by]), order_by,
+                cursor=request.args.get('cursor'), per_page=per_page,
+                total=request.args.get('total'), page=page
             )
             
-            products = pagination.items
-            total = pagination.total
-            
-            return {
-                'products': [product.to_dict() for product in products],
-                'total': total,
-                'page': page,
-                'per_page': per_page,
-                'pages': pagination.pages
-            }, 200
+            response = {'products': serializer.dump_rows(result['items'], fields)}
+            response.update(pagination_meta(result))
+            return response, 200, http_cache.cache_headers(*validators)
+        except ValueError as e:
+            return {'message': str(e)}, 400
         except Exception as e:
             return {'message': '获取产品列表失败', 'error': str(e)}, 500
     
@@ -60,6 +73,7 @@ class ProductList(Resource):
             new_product = Product(**data)
             db_session.add(new_product)
             db_session.commit()
+            log_operation(get_current_user_id(), 'create', 'product', new_product.id)
             
             return {'message': '产品创建成功', 'product': new_product.to_dict()}, 201
         except Exception as e:
@@ -70,16 +84,30 @@ class ProductDetail(Resource):
     @jwt_required
     def get(self, product_id):
         """获取产品详情"""
-        product = db_session.query(Product).filter_by(id=product_id).first()
-        if not product:
+        serializer = SERIALIZERS['products']
+        try:
+            fields = serializer.parse_fields(request.args.get('fields'))
+        except ValueError as e:
+            return {'message': str(e)}, 400
+        
+        # 先只查询版本列，条件请求命中时不加载整行
+        validators = http_cache.row_validators(db_session, Product, product_id)
+        if validators is None:
             return {'message': '产品不存在'}, 404
+        cached = http_cache.not_modified(*validators)
+        if cached:
+            return cached
         
-        return {'product': product.to_dict()}, 200
+        row = serializer.query(db_session.query(Product), fields).filter(Product.id == product_id).first()
+        if not row:
+            return {'message': '产品不存在'}, 404
+        
+        return {'product': serializer.dump(row, fields)}, 200, http_cache.cache_headers(*validators)
     
     @roles_required('admin', 'manager')
     def put(self, product_id):
         """更新产品信息"""
-        product = Product.query.get(product_id)
+        product = db_session.query(Product).filter_by(id=product_id).first()
         if not product:
             return {'message': '产品不存在'}, 404
         
@@ -92,6 +120,7 @@ class ProductDetail(Resource):
                     setattr(product, key, value)
             
             db_session.commit()
+            log_operation(get_current_user_id(), 'update', 'product', product_id, {'fields': list(data)})
             return {'message': '产品更新成功', 'product': product.to_dict()}, 200
         except Exception as e:
             db_session.rollback()
@@ -107,6 +136,7 @@ class ProductDetail(Resource):
         try:
             db_session.delete(product)
             db_session.commit()
+            log_operation(get_current_user_id(), 'delete', 'product', product_id)
             return {'message': '产品删除成功'}, 200
         except Exception as e:
             db_session.rollback()
@@ -121,16 +151,83 @@ class ProductSearch(Resource):
             if not keyword:
                 return {'message': '搜索关键词不能为空'}, 400
             
-            # 搜索产品名称、编码等字段
-            products = db_session.query(Product).filter(
-                (Product.product_name.contains(keyword)) |
-                (Product.product_code.contains(keyword)) |
-                (Product.product_type.contains(keyword))
-            ).all()
+            # 通过 n-gram 倒排索引搜索名称、编码、类型（search_fields=spec 可搜索规格参数键）
+            search_fields = request.args.get('search_fields')
+            result = search_products(
+                db_session, keyword,
+                fields=search_fields.split(',') if search_fields else SEARCH_FIELDS,
+                per_page=request.args.get('per_page', 20, type=int),
+                cursor=request.args.get('cursor'),
+                total=request.args.get('total')
+            )
             
+            products = [dict(product.to_dict(), score=score) for product, score in result['products']]
             return {
-                'products': [product.to_dict() for product in products],
-                'total': len(products)
+                'products': products,
+                'total': result['total'],
+                'total_is_estimate': result['total_is_estimate'],
+                'next_cursor': result['next_cursor'],
+                'has_more': result['has_more']
             }, 200
+        except ValueError as e:
+            return {'message': str(e)}, 400
+        except Exception as e:
+            return {'message': '搜索失败', 'error': str(e)}, 500
+
+class ProductBulkImport(Resource):
+    @roles_required('admin', 'manager')
+    def post(self):
+        """批量导入产品（JSON数组、NDJSON 或 CSV）"""
+        try:
+            content_type = request.mimetype
+            if content_type in ('application/x-ndjson', 'application/jsonl'):
+                rows = iter_ndjson_rows(request.stream)
+            elif content_type == 'text/csv':
+                rows = iter_csv_rows(request.stream)
+            else:
+                rows = iter_json_rows(request.get_json())
+            
+            # 新产品已在导入事务内进入待索引队列，索引由后台线程建立
+            inserted_ids = []
+            report = import_products(
+                db_session, rows,
+                batch_size=request.args.get('batch_size', BATCH_SIZE, type=int),
+                commit_size=request.args.get('commit_size', COMMIT_SIZE, type=int),
+                index_search=False, inserted_ids=inserted_ids
+            )
+            index_in_background(inserted_ids)
+            return {'message': '产品导入完成', 'report': report}, 200
+        except ValueError as e:
+            return {'message': str(e)}, 400
         except Exception as e:
-            return {'message': '搜索失败', 'error': str(e)}, 500
\ No newline at end of file
+            db_session.rollback()
+            return {'message': '产品导入失败', 'error': str(e)}, 500
+
+class ProductTransition(Resource):
+    @roles_required('admin', 'manager')
+    def post(self):
+        """批量流转产品状态（produced -> shipped -> sold / recalled），按ID列表或过滤条件选择产品"""
+        try:
+            data = request.get_json() or {}
+            if data.get('product_ids') is not None:
+                versions = transitions.parse_items(data['product_ids'])
+                condition = Product.id.in_(list(versions))
+            else:
+                versions = None
+                condition = transitions.product_filter(data.get('filter'))
+
+            result = transitions.transition(
+                db_session, data.get('status'), condition, versions=versions,
+                location=data.get('location'), operator_id=get_current_user_id(), source='api'
+            )
+            db_session.commit()
+            log_operation(get_current_user_id(), 'transition', 'product', None, {
+                'status': result['status'], 'updated': len(result['updated']), 'conflicts': len(result['conflicts'])
+            })
+            return {'message': '产品状态流转完成', **result}, 200
+        except ValueError as e:
+            db_session.rollback()
+            return {'message': str(e)}, 400
+        except Exception as e:
+            db_session.rollback()
+            return {'message': '产品状态流转失败', 'error': str(e)}, 500
@@ -1,10 +1,16 @@
 from flask import request, jsonify
 from flask_restful import Resource
+from sqlalchemy.orm.exc import StaleDataError
 from src.models.database import db_session
 from src.models.tracking import QualityCheck
 from src.models.product import Product
 from src.api.auth_middleware import jwt_required, roles_required
-from src.api.auth_middleware import get_current_user
+from src.api.auth_middleware import get_current_user_id
+from src.utils.pagination import keyset_paginate, pagination_meta
+from src.utils import http_cache
+from src.utils.serializers import SERIALIZERS
+from src.services.quality_ingest import ingest_quality_checks
+from src.utils.utils import log_operation
 from datetime import datetime
 
 class QualityCheckList(Resource):
@@ -12,6 +18,13 @@ class QualityCheckList(Resource):
     def get(self):
         """获取质量检查列表"""
         try:
+            validators = http_cache.collection_validators(db_session, 'quality_checks')
+            cached = http_cache.not_modified(*validators)
+            if cached:
+                return cached
+            
+            serializer = SERIALIZERS['quality_checks']
+            fields = serializer.parse_fields(request.args.get('fields'))
             page = request.args.get('page', 1, type=int)
             per_page = request.args.get('per_page', 20, type=int)
             product_id = request.args.get('product_id', type=int)
@@ -29,19 +42,19 @@ class QualityCheckList(Resource):
             if pass_status is not None:
                 query = query.filter_by(pass_status=pass_status)
             
-            pagination = query.order_by(QualityCheck.check_time.desc()).paginate(
-                page=page, per_page=per_page, error_out=False
+            # 只查询需要的列（加上排序列），不构造 ORM 对象
+            order_by = [(QualityCheck.check_time, True), (QualityCheck.id, True)]
+            result = keyset_paginate(
+                serializer.query(query, fields, [column for column, descending in order_by]), order_by,
+                cursor=request.args.get('cursor'), per_page=per_page,
+                total=request.args.get('total'), page=page
             )
             
-            quality_checks = pagination.items
-            total = pagination.total
-            
-            return {
-                'quality_checks': [qc.to_dict() for qc in quality_checks],
-                'total': total,
-                'page': page,
-                'per_page': per_page
-            }, 200
+            response = {'quality_checks': serializer.dump_rows(result['items'], fields)}
+            response.update(pagination_meta(result))
+            return response, 200, http_cache.cache_headers(*validators)
+        except ValueError as e:
+            return {'message': str(e)}, 400
         except Exception as e:
             return {'message': '获取质量检查列表失败', 'error': str(e)}, 500
     
@@ -60,13 +73,13 @@ class QualityCheckList(Resource):
             if not product:
                 return {'message': '产品不存在'}, 404
             
-            # 获取当前用户作为检查员
-            inspector = get_current_user()
+            # 当前用户作为检查员（ID取自令牌，无需查询用户表）
+            inspector_id = get_current_user_id()
             
             # 创建质量检查记录
             new_quality_check = QualityCheck(
                 product_id=data['product_id'],
-                inspector_id=inspector.id,
+                inspector_id=inspector_id,
                 check_type=data['check_type'],
                 check_items=data['check_items'],
                 pass_status=data['pass_status'],
@@ -76,21 +89,61 @@ class QualityCheckList(Resource):
             
             db_session.add(new_quality_check)
             db_session.commit()
+            log_operation(inspector_id, 'create', 'quality_check', new_quality_check.id)
             
             return {'message': '质量检查记录创建成功', 'quality_check': new_quality_check.to_dict()}, 201
         except Exception as e:
             db_session.rollback()
             return {'message': '质量检查记录创建失败', 'error': str(e)}, 500
 
+class QualityCheckBatch(Resource):
+    @roles_required('admin', 'manager', 'inspector')
+    def post(self):
+        """批量录入质量检查记录（检测工位）"""
+        try:
+            data = request.get_json()
+            items = data.get('checks') if isinstance(data, dict) else data
+            if not isinstance(items, list) or not items:
+                return {'message': '请求体必须包含检查记录数组'}, 400
+            
+            results = ingest_quality_checks(
+                db_session, items, get_current_user_id(),
+                batch_key=request.headers.get('Idempotency-Key')
+            )
+            
+            summary = {'created': 0, 'duplicate': 0, 'error': 0}
+            for result in results:
+                summary[result['status']] += 1
+            return {'message': '质量检查记录批量录入完成', 'summary': summary, 'results': results}, 200
+        except ValueError as e:
+            return {'message': str(e)}, 400
+        except Exception as e:
+            db_session.rollback()
+            return {'message': '质量检查记录批量录入失败', 'error': str(e)}, 500
+
 class QualityCheckDetail(Resource):
     @jwt_required
     def get(self, check_id):
         """获取质量检查详情"""
-        quality_check = db_session.query(QualityCheck).filter_by(id=check_id).first()
-        if not quality_check:
+        serializer = SERIALIZERS['quality_checks']
+        try:
+            fields = serializer.parse_fields(request.args.get('fields'))
+        except ValueError as e:
+            return {'message': str(e)}, 400
+        
+        # 先只查询版本列，条件请求命中时不加载整行
+        validators = http_cache.row_validators(db_session, QualityCheck, check_id)
+        if validators is None:
+            return {'message': '质量检查记录不存在'}, 404
+        cached = http_cache.not_modified(*validators)
+        if cached:
+            return cached
+        
+        row = serializer.query(db_session.query(QualityCheck), fields).filter(QualityCheck.id == check_id).first()
+        if not row:
             return {'message': '质量检查记录不存在'}, 404
         
-        return {'quality_check': quality_check.to_dict()}, 200
+        return {'quality_check': serializer.dump(row, fields)}, 200, http_cache.cache_headers(*validators)
     
     @roles_required('admin', 'manager', 'inspector')
     def put(self, check_id):
@@ -104,12 +157,17 @@ class QualityCheckDetail(Resource):
             
             # 更新检查信息
             for key, value in data.items():
-                if key not in ['id', 'product_id', 'inspector_id', 'check_time']:
+                if key not in ['id', 'product_id', 'inspector_id', 'check_time', 'version']:
                     if hasattr(quality_check, key):
                         setattr(quality_check, key, value)
             
             db_session.commit()
+            log_operation(get_current_user_id(), 'update', 'quality_check', check_id, {'fields': list(data)})
             return {'message': '质量检查记录更新成功', 'quality_check': quality_check.to_dict()}, 200
+        except StaleDataError:
+            # 读取后记录已被其他请求修改或删除（version 乐观锁）
+            db_session.rollback()
+            return {'message': '质量检查记录已被其他请求修改，请刷新后重试'}, 409
         except Exception as e:
             db_session.rollback()
             return {'message': '质量检查记录更新失败', 'error': str(e)}, 500
@@ -124,7 +182,11 @@ class QualityCheckDetail(Resource):
         try:
             db_session.delete(quality_check)
             db_session.commit()
+            log_operation(get_current_user_id(), 'delete', 'quality_check', check_id)
             return {'message': '质量检查记录删除成功'}, 200
+        except StaleDataError:
+            db_session.rollback()
+            return {'message': '质量检查记录已被其他请求修改，请刷新后重试'}, 409
         except Exception as e:
             db_session.rollback()
             return {'message': '质量检查记录删除失败', 'error': str(e)}, 500
\ No newline at end of file
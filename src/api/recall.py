@@ -0,0 +1,87 @@
+from flask import request, Response, stream_with_context
+from flask_restful import Resource
+from src.models.database import db_session
+from src.models.product import Product
+from src.api.auth_middleware import roles_required, get_current_user_id
+from src.services import recall
+from src.utils.pagination import keyset_paginate, pagination_meta
+from src.utils.utils import log_operation
+from datetime import datetime
+
+class RecallImpact(Resource):
+    @roles_required('admin', 'manager', 'inspector')
+    def get(self):
+        """召回影响分析：按设备时间段、供应商批次或问题产品（反向）分页列出受影响产品"""
+        try:
+            criteria = recall.parse_criteria(request.args)
+            result = keyset_paginate(
+                recall.impact_query(db_session, criteria), [(Product.id, False)],
+                cursor=request.args.get('cursor'), per_page=request.args.get('per_page', 50, type=int),
+                total='none'
+            )
+
+            response = {
+                'products': [product.to_dict() for product in result['items']],
+                'summary': recall.impact_summary(db_session, criteria)
+            }
+            if criteria['product_id'] is not None:
+                response['sources'] = recall.describe_sources(
+                    *recall.product_sources(db_session, criteria['product_id'], criteria['window_hours'])
+                )
+            response.update(pagination_meta(result))
+            response['total'] = response['summary']['total']
+            return response, 200
+        except ValueError as e:
+            return {'message': str(e)}, 400
+        except Exception as e:
+            return {'message': '召回影响分析失败', 'error': str(e)}, 500
+
+class RecallImpactExport(Resource):
+    @roles_required('admin', 'manager', 'inspector')
+    def get(self):
+        """以分块 CSV 响应流式导出受影响产品"""
+        try:
+            criteria = recall.parse_criteria(request.args)
+        except ValueError as e:
+            return {'message': str(e)}, 400
+
+        log_operation(get_current_user_id(), 'export', 'recall_impact', None, {'criteria': request.args.to_dict()})
+        filename = f"recall_impact_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.csv"
+        return Response(
+            stream_with_context(recall.stream_impact_csv(criteria)),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
+        )
+
+class RecallExecute(Resource):
+    @roles_required('admin')
+    def post(self):
+        """把受影响产品在一个事务内批量标记为已召回，dry_run=true 时只返回影响统计"""
+        try:
+            data = request.get_json() or {}
+            criteria = recall.parse_criteria(data)
+            if data.get('dry_run'):
+                return {'dry_run': True, 'summary': recall.impact_summary(db_session, criteria)}, 200
+
+            result = recall.recall_products(db_session, criteria, operator_id=get_current_user_id())
+            db_session.commit()
+            log_operation(get_current_user_id(), 'recall', 'product', None, {
+                'criteria': {key: value for key, value in data.items() if key != 'dry_run'},
+                'reason': data.get('reason'),
+                'recalled': result['recalled'],
+                'skipped': len(result['skipped'])
+            })
+            result['skipped'] = result['skipped'][:100]
+            return {'message': '批量召回成功', **result}, 200
+        except recall.RecallIncomplete as e:
+            db_session.rollback()
+            return {
+                'message': '部分产品被并发修改未能召回，本次召回已整体回滚，请重试',
+                'conflicts': e.conflicts[:100]
+            }, 409
+        except ValueError as e:
+            db_session.rollback()
+            return {'message': str(e)}, 400
+        except Exception as e:
+            db_session.rollback()
+            return {'message': '批量召回失败', 'error': str(e)}, 500
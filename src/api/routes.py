@@ -1,19 +1,26 @@
 from flask_restful import Resource
 from flask import Blueprint, render_template
 from src.api.auth import Login, Register, Logout
-from src.api.products import ProductList, ProductDetail, ProductSearch
-from src.api.tracking import TrackingDataList, TrackingDataDetail, QRCodeScan, TrackingHistory
-from src.api.quality import QualityCheckList, QualityCheckDetail
+from src.api.products import ProductList, ProductDetail, ProductSearch, ProductBulkImport, ProductTransition
+from src.api.tracking import TrackingDataList, TrackingDataDetail, QRCodeScan, TrackingHistory, QRCodeBatch, QRCodeBatchStatus, QRCodeArchive, TrackingVerify, TrackingEventList, TrackingTransition
+from src.api.quality import QualityCheckList, QualityCheckDetail, QualityCheckBatch
 from src.api.suppliers import SupplierList, SupplierDetail
 from src.api.devices import DeviceList, DeviceDetail
-from src.api.dashboard import DashboardStats
+from src.api.dashboard import DashboardStats, ActivityFeed, DashboardChart, DashboardChartImage
+from src.api.system import AuditLogMetrics
+from src.api.exports import DataExport, ExportJobList, ExportJobDetail, ExportJobDownload
+from src.api.trace import ProductTrace, TraceBatch, ProductMaterialList
+from src.api.recall import RecallImpact, RecallImpactExport, RecallExecute
 from src.api.auth_middleware import jwt_required, roles_required
+from src.utils.serializers import install_json_representation
 
 # 创建Blueprint用于前端页面
 web_bp = Blueprint('web', __name__, template_folder='../../src/templates')
 
 def register_routes(api, app):
     """注册所有API路由"""
+    install_json_representation(api)
+    
     # 认证相关路由
     api.add_resource(Register, '/api/auth/register')
     api.add_resource(Login, '/api/auth/login')
@@ -23,15 +30,25 @@ def register_routes(api, app):
     api.add_resource(ProductList, '/api/products')
     api.add_resource(ProductDetail, '/api/products/<int:product_id>')
     api.add_resource(ProductSearch, '/api/products/search')
+    api.add_resource(ProductBulkImport, '/api/products/import')
+    api.add_resource(ProductTransition, '/api/products/transitions')
+    api.add_resource(ProductMaterialList, '/api/products/<int:product_id>/materials')
     
     # 追踪相关路由
     api.add_resource(TrackingDataList, '/api/tracking')
     api.add_resource(TrackingDataDetail, '/api/tracking/<int:tracking_id>')
     api.add_resource(QRCodeScan, '/api/tracking/scan')
     api.add_resource(TrackingHistory, '/api/tracking/<int:product_id>/history')
+    api.add_resource(TrackingVerify, '/api/tracking/<int:product_id>/verify')
+    api.add_resource(TrackingEventList, '/api/tracking/events')
+    api.add_resource(TrackingTransition, '/api/tracking/transitions')
+    api.add_resource(QRCodeBatch, '/api/tracking/qrcodes')
+    api.add_resource(QRCodeBatchStatus, '/api/tracking/qrcodes/<string:batch_id>')
+    api.add_resource(QRCodeArchive, '/api/tracking/qrcodes/<string:batch_id>/archive')
     
     # 质量检查相关路由
     api.add_resource(QualityCheckList, '/api/quality-checks')
+    api.add_resource(QualityCheckBatch, '/api/quality-checks/batch')
     api.add_resource(QualityCheckDetail, '/api/quality-checks/<int:check_id>')
     
     # 供应商相关路由
@@ -44,6 +61,19 @@ def register_routes(api, app):
     
     # 仪表盘相关路由
     api.add_resource(DashboardStats, '/api/dashboard/stats')
+    api.add_resource(ActivityFeed, '/api/dashboard/activities')
+    api.add_resource(DashboardChart, '/api/dashboard/charts/<string:chart_name>')
+    api.add_resource(DashboardChartImage, '/api/dashboard/charts/<string:chart_name>/image')
+    api.add_resource(AuditLogMetrics, '/api/system/audit-log')
+    api.add_resource(ExportJobList, '/api/exports/jobs')
+    api.add_resource(ExportJobDetail, '/api/exports/jobs/<string:job_id>')
+    api.add_resource(ExportJobDownload, '/api/exports/jobs/<string:job_id>/download')
+    api.add_resource(DataExport, '/api/exports/<string:dataset>')
+    api.add_resource(ProductTrace, '/api/trace/<int:product_id>')
+    api.add_resource(TraceBatch, '/api/trace/batch')
+    api.add_resource(RecallImpact, '/api/recall/impact')
+    api.add_resource(RecallImpactExport, '/api/recall/impact/export')
+    api.add_resource(RecallExecute, '/api/recall/execute')
     
     # 注册前端页面路由
     app.register_blueprint(web_bp)
@@ -3,6 +3,9 @@ from flask_restful import Resource
 from src.models.database import db_session
 from src.models.supplier import Supplier
 from src.api.auth_middleware import jwt_required, roles_required
+from src.utils.pagination import keyset_paginate, pagination_meta
+from src.utils import http_cache
+from src.utils.serializers import SERIALIZERS
 from datetime import datetime
 
 class SupplierList(Resource):
@@ -10,6 +13,13 @@ class SupplierList(Resource):
     def get(self):
         """获取供应商列表"""
         try:
+            validators = http_cache.collection_validators(db_session, 'suppliers')
+            cached = http_cache.not_modified(*validators)
+            if cached:
+                return cached
+            
+            serializer = SERIALIZERS['suppliers']
+            fields = serializer.parse_fields(request.args.get('fields'))
             page = request.args.get('page', 1, type=int)
             per_page = request.args.get('per_page', 20, type=int)
             status = request.args.get('status')
@@ -19,19 +29,19 @@ class SupplierList(Resource):
             if status:
                 query = query.filter_by(status=status)
             
-            pagination = query.order_by(Supplier.supplier_name).paginate(
-                page=page, per_page=per_page, error_out=False
+            # 只查询需要的列（加上排序列），不构造 ORM 对象
+            order_by = [(Supplier.supplier_name, False), (Supplier.id, False)]
+            result = keyset_paginate(
+                serializer.query(query, fields, [column for column, descending in order_by]), order_by,
+                cursor=request.args.get('cursor'), per_page=per_page,
+                total=request.args.get('total'), page=page
             )
             
-            suppliers = pagination.items
-            total = pagination.total
-            
-            return {
-                'suppliers': [supplier.to_dict() for supplier in suppliers],
-                'total': total,
-                'page': page,
-                'per_page': per_page
-            }, 200
+            response = {'suppliers': serializer.dump_rows(result['items'], fields)}
+            response.update(pagination_meta(result))
+            return response, 200, http_cache.cache_headers(*validators)
+        except ValueError as e:
+            return {'message': str(e)}, 400
         except Exception as e:
             return {'message': '获取供应商列表失败', 'error': str(e)}, 500
     
@@ -63,11 +73,25 @@ class SupplierDetail(Resource):
     @jwt_required
     def get(self, supplier_id):
         """获取供应商详情"""
-        supplier = db_session.query(Supplier).filter_by(id=supplier_id).first()
-        if not supplier:
+        serializer = SERIALIZERS['suppliers']
+        try:
+            fields = serializer.parse_fields(request.args.get('fields'))
+        except ValueError as e:
+            return {'message': str(e)}, 400
+        
+        # 先只查询版本列，条件请求命中时不加载整行
+        validators = http_cache.row_validators(db_session, Supplier, supplier_id)
+        if validators is None:
+            return {'message': '供应商不存在'}, 404
+        cached = http_cache.not_modified(*validators)
+        if cached:
+            return cached
+        
+        row = serializer.query(db_session.query(Supplier), fields).filter(Supplier.id == supplier_id).first()
+        if not row:
             return {'message': '供应商不存在'}, 404
         
-        return {'supplier': supplier.to_dict()}, 200
+        return {'supplier': serializer.dump(row, fields)}, 200, http_cache.cache_headers(*validators)
     
     @roles_required('admin', 'manager')
     def put(self, supplier_id):
@@ -0,0 +1,9 @@
+from flask_restful import Resource
+from src.services.audit_log import audit_sink
+from src.api.auth_middleware import roles_required
+
+class AuditLogMetrics(Resource):
+    @roles_required('admin')
+    def get(self):
+        """获取当前工作进程的操作日志队列指标（队列深度、丢弃数、写入耗时）"""
+        return {'audit_log': audit_sink.metrics()}, 200
@@ -0,0 +1,80 @@
+from flask import request
+from flask_restful import Resource
+from src.models.database import db_session
+from src.models.product import Product
+from src.models.tracking import ProductMaterial
+from src.api.auth_middleware import jwt_required, roles_required, get_current_user_id
+from src.services import trace
+from src.utils.utils import log_operation
+
+class ProductTrace(Resource):
+    @jwt_required
+    def get(self, product_id):
+        """获取单个产品的全链路追溯：生产记录、设备、操作员、质量检查、物料供应商"""
+        try:
+            result = trace.trace_products(db_session, [product_id])
+            if not result['traces']:
+                return {'message': '产品不存在'}, 404
+            
+            return {
+                'trace': result['traces'][0],
+                'devices': result['devices'],
+                'users': result['users'],
+                'suppliers': result['suppliers']
+            }, 200
+        except Exception as e:
+            return {'message': '获取追溯信息失败', 'error': str(e)}, 500
+
+class TraceBatch(Resource):
+    @roles_required('admin', 'manager', 'inspector')
+    def post(self):
+        """批量追溯产品（召回调查），共享的设备、人员、供应商节点只返回一次"""
+        try:
+            data = request.get_json() or {}
+            product_ids = data.get('product_ids')
+            if not isinstance(product_ids, list) or not product_ids:
+                return {'message': '请求体必须包含 product_ids 数组'}, 400
+            
+            result = trace.trace_products(db_session, product_ids)
+            result['count'] = len(result['traces'])
+            return result, 200
+        except (TypeError, ValueError) as e:
+            return {'message': str(e)}, 400
+        except Exception as e:
+            return {'message': '批量追溯失败', 'error': str(e)}, 500
+
+class ProductMaterialList(Resource):
+    @jwt_required
+    def get(self, product_id):
+        """获取产品使用的物料批次"""
+        try:
+            materials = db_session.query(ProductMaterial).filter_by(product_id=product_id).order_by(ProductMaterial.id).all()
+            return {'materials': [material.to_dict() for material in materials]}, 200
+        except Exception as e:
+            return {'message': '获取产品物料失败', 'error': str(e)}, 500
+    
+    @roles_required('admin', 'manager')
+    def post(self, product_id):
+        """登记产品使用的物料批次（单条对象或数组）"""
+        if not db_session.query(Product.id).filter_by(id=product_id).first():
+            return {'message': '产品不存在'}, 404
+        
+        try:
+            data = request.get_json()
+            items = data.get('materials', [data]) if isinstance(data, dict) else data
+            if not isinstance(items, list) or not items:
+                return {'message': '请求体必须包含物料信息'}, 400
+            
+            materials = trace.add_materials(db_session, product_id, items)
+            db_session.commit()
+            log_operation(get_current_user_id(), 'create', 'product_material', product_id, {'count': len(materials)})
+            return {
+                'message': '物料登记成功',
+                'materials': [material.to_dict() for material in materials]
+            }, 201
+        except (TypeError, ValueError) as e:
+            db_session.rollback()
+            return {'message': str(e)}, 400
+        except Exception as e:
+            db_session.rollback()
+            return {'message': '物料登记失败', 'error': str(e)}, 500
@@ -1,41 +1,56 @@
-from flask import request, jsonify
+from flask import request, jsonify, Response
 from flask_restful import Resource
 from src.models.database import db_session
-from src.models.tracking import TrackingData, ProductionRecord, QualityCheck
+from src.models.tracking import TrackingData, ProductionRecord, QualityCheck, TrackingEvent
 from src.models.product import Product
-from src.api.auth_middleware import jwt_required, roles_required
-import qrcode
+from src.api.auth_middleware import jwt_required, roles_required, get_current_user_id
+from src.utils.pagination import keyset_paginate, pagination_meta
+from src.utils import http_cache
+from src.utils.serializers import SERIALIZERS
+from src.services import qr_pipeline, scan_cache, anchoring, tracking_events, transitions
+from src.utils.qr_payload import encode_payload
+from src.utils.utils import log_operation
 import hashlib
+import logging
 import os
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
 class TrackingDataList(Resource):
     @jwt_required
     def get(self):
         """获取追踪数据列表"""
         try:
+            validators = http_cache.collection_validators(db_session, 'tracking_data')
+            cached = http_cache.not_modified(*validators)
+            if cached:
+                return cached
+            
+            serializer = SERIALIZERS['tracking_data']
+            fields = serializer.parse_fields(request.args.get('fields'))
             page = request.args.get('page', 1, type=int)
             per_page = request.args.get('per_page', 20, type=int)
             status = request.args.get('status')
             
-            query = TrackingData.query
+            query = db_session.query(TrackingData)
             
             if status:
                 query = query.filter_by(current_status=status)
             
-            pagination = query.order_by(TrackingData.created_at.desc()).paginate(
-                page=page, per_page=per_page, error_out=False
+            # 只查询需要的列（加上排序列），不构造 ORM 对象
+            order_by = [(TrackingData.created_at, True), (TrackingData.id, True)]
+            result = keyset_paginate(
+                serializer.query(query, fields, [column for column, descending in order_by]), order_by,
+                cursor=request.args.get('cursor'), per_page=per_page,
+                total=request.args.get('total'), page=page
             )
             
-            tracking_data = pagination.items
-            total = pagination.total
-            
-            return {
-                'tracking_data': [td.to_dict() for td in tracking_data],
-                'total': total,
-                'page': page,
-                'per_page': per_page
-            }, 200
+            response = {'tracking_data': serializer.dump_rows(result['items'], fields)}
+            response.update(pagination_meta(result))
+            return response, 200, http_cache.cache_headers(*validators)
+        except ValueError as e:
+            return {'message': str(e)}, 400
         except Exception as e:
             return {'message': '获取追踪数据失败', 'error': str(e)}, 500
     
@@ -49,32 +64,52 @@ class TrackingDataList(Resource):
                 return {'message': '缺少产品ID'}, 400
             
             # 检查产品是否存在
-            product = Product.query.get(data['product_id'])
+            product = db_session.query(Product).filter_by(id=data['product_id']).first()
             if not product:
                 return {'message': '产品不存在'}, 404
             
             # 检查是否已有追踪数据
-            if TrackingData.query.filter_by(product_id=data['product_id']).first():
+            if db_session.query(TrackingData.id).filter_by(product_id=data['product_id']).first():
                 return {'message': '该产品已有追踪数据'}, 400
             
-            # 生成二维码和区块链哈希
-            qr_data = f"PRODUCT:{data['product_id']}:{datetime.utcnow().isoformat()}"
-            blockchain_hash = hashlib.sha256(qr_data.encode()).hexdigest()
-            
-            # 保存二维码图片（在实际应用中实现）
-            # generate_qr_code(qr_data, f"static/qrcodes/{product.product_code}.png")
+            # 生成紧凑二维码内容和区块链哈希
+            qr_data = encode_payload(product.id)
+            blockchain_hash = hashlib.sha256(f"{qr_data}:{datetime.utcnow().isoformat()}".encode()).hexdigest()
             
             # 创建追踪数据
+            now = datetime.utcnow()
             new_tracking = TrackingData(
                 product_id=data['product_id'],
+                creator_id=get_current_user_id(),
                 qr_code=qr_data,
                 blockchain_hash=blockchain_hash,
                 current_location=data.get('location', 'factory'),
-                current_status=data.get('status', 'in_factory')
+                current_status=data.get('status', 'in_factory'),
+                last_updated=now,
+                created_at=now
             )
             
             db_session.add(new_tracking)
+            db_session.flush()
+            
+            # 初始状态作为第一条追踪事件
+            tracking_events.append_events(db_session.connection(), [{
+                'product_id': new_tracking.product_id,
+                'event_type': 'created',
+                'location': new_tracking.current_location,
+                'status': new_tracking.current_status,
+                'operator_id': new_tracking.creator_id,
+                'occurred_at': now,
+                'recorded_at': now
+            }])
             db_session.commit()
+            log_operation(new_tracking.creator_id, 'create', 'tracking', new_tracking.id)
+            
+            # 二维码图片交给后台进程池渲染，不阻塞请求
+            try:
+                qr_pipeline.submit_image(qr_data)
+            except Exception:
+                logger.exception('二维码渲染任务提交失败')
             
             return {'message': '追踪数据创建成功', 'tracking': new_tracking.to_dict()}, 201
         except Exception as e:
@@ -85,30 +120,49 @@ class TrackingDataDetail(Resource):
     @jwt_required
     def get(self, tracking_id):
         """获取追踪数据详情"""
-        tracking = TrackingData.query.get(tracking_id)
-        if not tracking:
+        serializer = SERIALIZERS['tracking_data']
+        try:
+            fields = serializer.parse_fields(request.args.get('fields'))
+        except ValueError as e:
+            return {'message': str(e)}, 400
+        
+        # 先只查询版本列，条件请求命中时不加载整行
+        validators = http_cache.row_validators(db_session, TrackingData, tracking_id)
+        if validators is None:
+            return {'message': '追踪数据不存在'}, 404
+        cached = http_cache.not_modified(*validators)
+        if cached:
+            return cached
+        
+        row = serializer.query(db_session.query(TrackingData), fields).filter(TrackingData.id == tracking_id).first()
+        if not row:
             return {'message': '追踪数据不存在'}, 404
         
-        return {'tracking': tracking.to_dict()}, 200
+        return {'tracking': serializer.dump(row, fields)}, 200, http_cache.cache_headers(*validators)
     
     @roles_required('admin', 'manager')
     def put(self, tracking_id):
         """更新追踪数据"""
-        tracking = TrackingData.query.get(tracking_id)
+        tracking = db_session.query(TrackingData).filter_by(id=tracking_id).first()
         if not tracking:
             return {'message': '追踪数据不存在'}, 404
         
         try:
             data = request.get_json()
             
-            # 更新追踪信息
-            if 'current_location' in data:
-                tracking.current_location = data['current_location']
-            if 'current_status' in data:
-                tracking.current_status = data['current_status']
-            
-            tracking.last_updated = datetime.utcnow()
+            # 变更作为追踪事件追加，tracking_data 由事件投影更新
+            result, = tracking_events.record_events(db_session, [{
+                'product_id': tracking.product_id,
+                'event_type': 'update',
+                'location': data.get('current_location'),
+                'status': data.get('current_status'),
+                'source': 'api'
+            }], operator_id=get_current_user_id())
+            if result['status'] == 'error':
+                db_session.rollback()
+                return {'message': result['error']}, 400
             db_session.commit()
+            log_operation(get_current_user_id(), 'update', 'tracking', tracking_id, {'fields': list(data)})
             
             return {'message': '追踪数据更新成功', 'tracking': tracking.to_dict()}, 200
         except Exception as e:
@@ -125,47 +179,165 @@ class QRCodeScan(Resource):
             if not data or 'qr_code' not in data:
                 return {'message': '缺少二维码数据'}, 400
             
-            # 查找追踪数据
-            tracking = TrackingData.query.filter_by(qr_code=data['qr_code']).first()
-            if not tracking:
+            # 扫描结果按二维码内容缓存，追踪数据、产品或生产记录变更提交后失效
+            result = scan_cache.scan(db_session, data['qr_code'])
+            if not result:
                 return {'message': '未找到对应的产品信息'}, 404
             
-            # 获取关联的产品信息
-            product = Product.query.get(tracking.product_id)
-            
-            # 获取生产记录
-            production_records = ProductionRecord.query.filter_by(product_id=tracking.product_id).all()
-            
-            return {
-                'tracking': tracking.to_dict(),
-                'product': product.to_dict() if product else None,
-                'production_history': [record.to_dict() for record in production_records]
-            }, 200
+            return result, 200
         except Exception as e:
             return {'message': '扫描失败', 'error': str(e)}, 500
 
 class TrackingHistory(Resource):
     @jwt_required
-    def get(self, product_id):
-        """获取产品的完整追踪历史"""
+    def get(self, product_id=None):
+        """获取产品的完整追踪历史（按产品ID，或 /api/tracking/history?product_code= 按产品编码）"""
         try:
             # 检查产品是否存在
-            product = Product.query.get(product_id)
+            if product_id is None:
+                product_code = request.args.get('product_code')
+                if not product_code:
+                    return {'message': '缺少产品ID或产品编码'}, 400
+                product = db_session.query(Product).filter_by(product_code=product_code).first()
+            else:
+                product = db_session.query(Product).filter_by(id=product_id).first()
             if not product:
                 return {'message': '产品不存在'}, 404
+            product_id = product.id
             
             # 获取追踪数据
-            tracking = TrackingData.query.filter_by(product_id=product_id).first()
+            tracking = db_session.query(TrackingData).filter_by(product_id=product_id).first()
             
             # 获取生产记录
-            production_records = ProductionRecord.query.filter_by(product_id=product_id).all()
+            production_records = db_session.query(ProductionRecord).filter_by(product_id=product_id).all()
             
-            # 在实际应用中，这里还可以从MongoDB获取更详细的操作日志
+            # 位置和状态变更事件，按发生时间倒序游标分页
+            result = keyset_paginate(
+                tracking_events.history_query(db_session, product_id),
+                [(TrackingEvent.occurred_at, True), (TrackingEvent.id, True)],
+                cursor=request.args.get('cursor'), per_page=request.args.get('per_page', 50, type=int),
+                total='none'
+            )
             
             return {
                 'product': product.to_dict(),
                 'tracking': tracking.to_dict() if tracking else None,
-                'production_history': [record.to_dict() for record in production_records]
+                'production_history': [record.to_dict() for record in production_records],
+                'events': [event.to_dict() for event in result['items']],
+                'events_next_cursor': result['next_cursor']
+            }, 200
+        except ValueError as e:
+            return {'message': str(e)}, 400
+        except Exception as e:
+            return {'message': '获取追踪历史失败', 'error': str(e)}, 500
+
+class TrackingEventList(Resource):
+    @roles_required('admin', 'manager')
+    def post(self):
+        """批量写入追踪事件（RFID、扫码网关）"""
+        try:
+            data = request.get_json()
+            events = data.get('events') if isinstance(data, dict) else data
+            if not isinstance(events, list) or not events:
+                return {'message': '请求体必须包含事件数组'}, 400
+            
+            results = tracking_events.record_events(db_session, events, operator_id=get_current_user_id())
+            db_session.commit()
+            
+            errors = [result for result in results if result['status'] == 'error']
+            log_operation(get_current_user_id(), 'ingest', 'tracking_events', None, {'accepted': len(results) - len(errors), 'rejected': len(errors)})
+            return {
+                'message': '追踪事件写入完成',
+                'accepted': len(results) - len(errors),
+                'rejected': len(errors),
+                'errors': errors
             }, 200
+        except ValueError as e:
+            db_session.rollback()
+            return {'message': str(e)}, 400
         except Exception as e:
-            return {'message': '获取追踪历史失败', 'error': str(e)}, 500
\ No newline at end of file
+            db_session.rollback()
+            return {'message': '追踪事件写入失败', 'error': str(e)}, 500
+
+class TrackingTransition(Resource):
+    @roles_required('admin', 'manager')
+    def post(self):
+        """按追踪数据ID或追踪状态、位置批量流转对应产品的状态，并批量写入追踪事件"""
+        try:
+            data = request.get_json() or {}
+            condition = transitions.tracking_selection(data.get('tracking_ids'), data.get('filter'))
+            result = transitions.transition(
+                db_session, data.get('status'), condition,
+                location=data.get('location'), operator_id=get_current_user_id(), source='api'
+            )
+            db_session.commit()
+            log_operation(get_current_user_id(), 'transition', 'tracking', None, {
+                'status': result['status'], 'updated': len(result['updated']), 'conflicts': len(result['conflicts'])
+            })
+            return {'message': '追踪状态流转完成', **result}, 200
+        except ValueError as e:
+            db_session.rollback()
+            return {'message': str(e)}, 400
+        except Exception as e:
+            db_session.rollback()
+            return {'message': '追踪状态流转失败', 'error': str(e)}, 500
+
+class TrackingVerify(Resource):
+    @jwt_required
+    def get(self, product_id):
+        """用 Merkle 包含证明校验产品的全部追踪、生产和质检记录"""
+        try:
+            product = db_session.query(Product.id).filter_by(id=product_id).first()
+            if not product:
+                return {'message': '产品不存在'}, 404
+            
+            return anchoring.verify_product(db_session, product_id), 200
+        except Exception as e:
+            return {'message': '校验追踪记录失败', 'error': str(e)}, 500
+
+class QRCodeBatch(Resource):
+    @roles_required('admin', 'manager')
+    def post(self):
+        """按追踪记录批量生成二维码图片"""
+        try:
+            data = request.get_json()
+            tracking_ids = data.get('tracking_ids') if isinstance(data, dict) else None
+            if not isinstance(tracking_ids, list) or not tracking_ids:
+                return {'message': '缺少追踪记录ID列表'}, 400
+            if len(tracking_ids) > qr_pipeline.MAX_BATCH_SIZE:
+                return {'message': f'单个批次最多 {qr_pipeline.MAX_BATCH_SIZE} 个二维码'}, 400
+            
+            items = qr_pipeline.tracking_items(db_session, tracking_ids)
+            if not items:
+                return {'message': '未找到对应的追踪数据'}, 404
+            
+            batch = qr_pipeline.submit_batch(items)
+            return {'message': '二维码生成任务已提交', 'batch': batch.to_dict()}, 202
+        except (TypeError, ValueError) as e:
+            return {'message': '追踪记录ID无效', 'error': str(e)}, 400
+        except Exception as e:
+            return {'message': '二维码生成任务提交失败', 'error': str(e)}, 500
+
+class QRCodeBatchStatus(Resource):
+    @jwt_required
+    def get(self, batch_id):
+        """查询二维码生成批次进度"""
+        batch = qr_pipeline.get_batch(batch_id)
+        if not batch:
+            return {'message': '批次不存在或已过期'}, 404
+        
+        return {'batch': batch}, 200
+
+class QRCodeArchive(Resource):
+    @jwt_required
+    def get(self, batch_id):
+        """以 ZIP 流下载批次中的全部二维码图片"""
+        entries = qr_pipeline.batch_entries(batch_id)
+        if entries is None:
+            return {'message': '批次不存在或已过期'}, 404
+        
+        return Response(
+            qr_pipeline.stream_zip(entries),
+            mimetype='application/zip',
+            headers={'Content-Disposition': f'attachment; filename=qrcodes_{batch_id}.zip'}
+        )
@@ -21,22 +21,48 @@ CORS(app)
 jwt = JWTManager(app)
 
 # 数据库配置
-from src.models.database import init_db, db_session
-init_db()
+from src.models.database import db_session, SessionLocal, init_worker_pool
+import src.models  # noqa: F401  注册全部模型
+
+# 启动时只检查 schema_version 版本号，落后时按 DB_AUTO_MIGRATE 执行迁移（生产环境默认只提示，由部署时运行 migrate.py）
+from src.models.migrations import check_schema
+check_schema()
+
+# 注册仪表盘统计增量更新
+from src.services.dashboard_stats import install_stat_listeners
+install_stat_listeners(SessionLocal)
+
+# 注册产品搜索索引维护
+from src.services.search import install_search_listeners
+install_search_listeners(SessionLocal)
+
+# 注册用户角色缓存刷新
+from src.api.auth_middleware import install_user_cache_listeners
+install_user_cache_listeners(SessionLocal)
+
+# 注册二维码扫描缓存失效
+from src.services.scan_cache import install_scan_cache_listeners
+install_scan_cache_listeners(SessionLocal)
 
 # 注册API路由
 from flask_restful import Api
 from src.api.auth import Register, Login, Logout
-from src.api.products import ProductList, ProductDetail, ProductSearch
-from src.api.tracking import TrackingDataList, TrackingDataDetail, QRCodeScan, TrackingHistory
-from src.api.quality import QualityCheckList, QualityCheckDetail
+from src.api.products import ProductList, ProductDetail, ProductSearch, ProductBulkImport, ProductTransition
+from src.api.tracking import TrackingDataList, TrackingDataDetail, QRCodeScan, TrackingHistory, QRCodeBatch, QRCodeBatchStatus, QRCodeArchive, TrackingVerify, TrackingEventList, TrackingTransition
+from src.api.quality import QualityCheckList, QualityCheckDetail, QualityCheckBatch
 from src.api.suppliers import SupplierList, SupplierDetail
 from src.api.devices import DeviceList, DeviceDetail
-from src.api.dashboard import DashboardStats
+from src.api.dashboard import DashboardStats, ActivityFeed, DashboardChart, DashboardChartImage
+from src.api.system import AuditLogMetrics
+from src.api.exports import DataExport, ExportJobList, ExportJobDetail, ExportJobDownload
+from src.api.trace import ProductTrace, TraceBatch, ProductMaterialList
+from src.api.recall import RecallImpact, RecallImpactExport, RecallExecute
 from src.api.auth_middleware import jwt_required, roles_required
+from src.utils.serializers import install_json_representation
 
 # 初始化API
 api = Api(app)
+install_json_representation(api)
 
 # 注册API资源
 api.add_resource(Register, '/api/auth/register')
@@ -45,17 +71,44 @@ api.add_resource(Logout, '/api/auth/logout')
 api.add_resource(ProductList, '/api/products')
 api.add_resource(ProductDetail, '/api/products/<int:product_id>')
 api.add_resource(ProductSearch, '/api/products/search')
+api.add_resource(ProductBulkImport, '/api/products/import')
+api.add_resource(ProductTransition, '/api/products/transitions')
+api.add_resource(ProductMaterialList, '/api/products/<int:product_id>/materials')
 api.add_resource(TrackingDataList, '/api/tracking')
 api.add_resource(TrackingDataDetail, '/api/tracking/<int:tracking_id>')
 api.add_resource(QRCodeScan, '/api/tracking/qrcode')
-api.add_resource(TrackingHistory, '/api/tracking/history')
+api.add_resource(TrackingHistory, '/api/tracking/<int:product_id>/history', '/api/tracking/history')
+api.add_resource(TrackingVerify, '/api/tracking/<int:product_id>/verify')
+api.add_resource(TrackingEventList, '/api/tracking/events')
+api.add_resource(TrackingTransition, '/api/tracking/transitions')
+api.add_resource(QRCodeBatch, '/api/tracking/qrcodes')
+api.add_resource(QRCodeBatchStatus, '/api/tracking/qrcodes/<string:batch_id>')
+api.add_resource(QRCodeArchive, '/api/tracking/qrcodes/<string:batch_id>/archive')
 api.add_resource(QualityCheckList, '/api/quality')
+api.add_resource(QualityCheckBatch, '/api/quality/batch')
 api.add_resource(QualityCheckDetail, '/api/quality/<int:check_id>')
 api.add_resource(SupplierList, '/api/suppliers')
 api.add_resource(SupplierDetail, '/api/suppliers/<int:supplier_id>')
 api.add_resource(DeviceList, '/api/devices')
 api.add_resource(DeviceDetail, '/api/devices/<int:device_id>')
 api.add_resource(DashboardStats, '/api/dashboard/stats')
+api.add_resource(ActivityFeed, '/api/dashboard/activities')
+api.add_resource(DashboardChart, '/api/dashboard/charts/<string:chart_name>')
+api.add_resource(DashboardChartImage, '/api/dashboard/charts/<string:chart_name>/image')
+api.add_resource(AuditLogMetrics, '/api/system/audit-log')
+api.add_resource(ExportJobList, '/api/exports/jobs')
+api.add_resource(ExportJobDetail, '/api/exports/jobs/<string:job_id>')
+api.add_resource(ExportJobDownload, '/api/exports/jobs/<string:job_id>/download')
+api.add_resource(DataExport, '/api/exports/<string:dataset>')
+api.add_resource(ProductTrace, '/api/trace/<int:product_id>')
+api.add_resource(TraceBatch, '/api/trace/batch')
+api.add_resource(RecallImpact, '/api/recall/impact')
+api.add_resource(RecallImpactExport, '/api/recall/impact/export')
+api.add_resource(RecallExecute, '/api/recall/execute')
+
+# 启动时完成 ORM 映射器配置（默认推迟到首次查询）；gunicorn --preload 时在主进程完成，工作进程直接共享
+from sqlalchemy.orm import configure_mappers
+configure_mappers()
 
 # 前端页面路由
 @app.route('/')
@@ -136,6 +189,11 @@ def inject_user():
     # 这里可以注入全局模板变量
     return {}
 
+# 工作进程处理首个请求前重建并预热连接池（gunicorn.conf.py 已在 post_fork 中完成时不再重复）
+@app.before_first_request
+def warm_database_pool():
+    init_worker_pool()
+
 # 应用启动事件
 @app.before_request
 def before_request():
@@ -144,8 +202,8 @@ def before_request():
 
 @app.teardown_appcontext
 def shutdown_session(exception=None):
-    # 关闭数据库会话
-    db_session.close()
+    # 移除当前请求的数据库会话，连接归还连接池
+    db_session.remove()
 
 # 启动应用
 if __name__ == '__main__':
@@ -154,5 +212,9 @@ if __name__ == '__main__':
     os.makedirs('src/static/js', exist_ok=True)
     os.makedirs('src/templates', exist_ok=True)
     
+    # 按 ANCHOR_INTERVAL_SECONDS 定期锚定新记录（gunicorn 部署时由 post_worker_init 启动）
+    from src.services.anchoring import start_scheduler
+    start_scheduler(SessionLocal)
+
     # 启动开发服务器
-    app.run(host='0.0.0.0', port=int(os.getenv('PORT', 5000)), debug=os.getenv('DEBUG', 'True') == 'True')
\ No newline at end of file
+    app.run(host='0.0.0.0', port=int(os.getenv('PORT', 5000)), debug=os.getenv('DEBUG', 'False') == 'True')
\ No newline at end of file
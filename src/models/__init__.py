@@ -1,7 +1,12 @@
 from .user import User
 from .product import Product
-from .tracking import TrackingData, ProductionRecord, QualityCheck
+from .tracking import TrackingData, ProductionRecord, QualityCheck, TrackingEvent, ProductMaterial
 from .supplier import Supplier
 from .device import Device
+from .dashboard import DashboardStat
+from .search import ProductSearchTerm, ProductSearchPending
+from .idempotency import IdempotencyKey
+from .anchoring import AnchorBatch, AnchorProof
+from .migrations import SchemaVersion
 
-__all__ = ['User', 'Product', 'TrackingData', 'ProductionRecord', 'QualityCheck', 'Supplier', 'Device']
\ No newline at end of file
+__all__ = ['User', 'Product', 'TrackingData', 'ProductionRecord', 'QualityCheck', 'TrackingEvent', 'ProductMaterial', 'Supplier', 'Device', 'DashboardStat', 'ProductSearchTerm', 'ProductSearchPending', 'IdempotencyKey', 'AnchorBatch', 'AnchorProof', 'SchemaVersion']
\ No newline at end of file
@@ -0,0 +1,44 @@
+from datetime import datetime
+from src.models.database import Base
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey, JSON, Index, UniqueConstraint
+
+class AnchorBatch(Base):
+    """锚定批次：一批记录组成的 Merkle 树，根哈希追加写入本地账本文件"""
+    __tablename__ = 'anchor_batches'
+    
+    id = Column(Integer, primary_key=True)
+    merkle_root = Column(String(64), nullable=False)
+    leaf_count = Column(Integer, nullable=False)
+    ledger_hash = Column(String(64), nullable=True)  # 账本条目哈希，写入账本前为空
+    ledger_offset = Column(BigInteger, nullable=True)  # 账本条目在文件中的字节偏移
+    created_at = Column(DateTime, default=datetime.utcnow)
+    anchored_at = Column(DateTime, nullable=True)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'merkle_root': self.merkle_root,
+            'leaf_count': self.leaf_count,
+            'ledger_hash': self.ledger_hash,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'anchored_at': self.anchored_at.isoformat() if self.anchored_at else None
+        }
+
+class AnchorProof(Base):
+    """记录的 Merkle 包含证明"""
+    __tablename__ = 'anchor_proofs'
+    
+    id = Column(Integer, primary_key=True)
+    batch_id = Column(Integer, ForeignKey('anchor_batches.id'), nullable=False)
+    record_type = Column(String(30), nullable=False)  # tracking, tracking_event, production, quality
+    record_id = Column(Integer, nullable=False)
+    product_id = Column(Integer, nullable=True)
+    leaf_index = Column(Integer, nullable=False)
+    leaf_hash = Column(String(64), nullable=False)
+    proof = Column(JSON, nullable=False)  # 自底向上的兄弟节点列表，如 ["L:<hex>", "R:<hex>"]
+    
+    __table_args__ = (
+        UniqueConstraint('record_type', 'record_id', name='uq_anchor_proofs_record'),
+        Index('ix_anchor_proofs_product', 'product_id'),
+        Index('ix_anchor_proofs_batch', 'batch_id'),
+    )
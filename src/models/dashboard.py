@@ -0,0 +1,22 @@
+from datetime import datetime
+from src.models.database import Base
+from sqlalchemy import Column, Integer, String, DateTime
+
+class DashboardStat(Base):
+    __tablename__ = 'dashboard_stats'
+    
+    # 统计项键，如 products.status.produced、quality.checked:2024-01-01
+    stat_key = Column(String(100), primary_key=True)
+    stat_value = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        """将统计项转换为字典"""
+        return {
+            'stat_key': self.stat_key,
+            'stat_value': self.stat_value,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+    
+    def __repr__(self):
+        return f'<DashboardStat {self.stat_key}={self.stat_value}>'
@@ -1,12 +1,15 @@
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, scoped_session
 import os
 from dotenv import load_dotenv
 
 # 加载环境变量
 load_dotenv()
 
+# 运行环境：development / production
+APP_ENV = os.getenv('APP_ENV', 'development')
+
 # 从环境变量获取MySQL数据库配置
 DB_HOST = os.getenv('DB_HOST', 'localhost')
 DB_PORT = os.getenv('DB_PORT', '33060')
@@ -14,18 +17,36 @@ DB_USER = os.getenv('DB_USER', 'kis')
 DB_PASSWORD = os.getenv('DB_PASSWORD', 'Kis9090')
 DB_NAME = os.getenv('DB_NAME', 'kis')
 
-# 构建MySQL连接URL
-DATABASE_URL = f'mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
+# 构建MySQL连接URL（可通过 DATABASE_URL 整体覆盖，便于本地使用SQLite）
+DATABASE_URL = os.getenv('DATABASE_URL') or f'mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
+
+# 连接池配置（每个工作进程独立一个连接池）
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 3600))
+# 工作进程启动后预先建立的连接数
+DB_POOL_WARMUP = int(os.getenv('DB_POOL_WARMUP', 0))
+# 生产环境默认关闭SQL日志
+DB_ECHO = os.getenv('DB_ECHO', 'False' if APP_ENV == 'production' else 'True') == 'True'
+
+def _engine_options():
+    options = {
+        'echo': DB_ECHO,
+        'pool_pre_ping': True
+    }
+    # SQLite 使用 SQLAlchemy 默认的连接池，不支持以下参数
+    if not DATABASE_URL.startswith('sqlite'):
+        options.update(
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT
+        )
+    return options
 
 # 创建数据库引擎
-engine = create_engine(
-    DATABASE_URL, 
-    echo=True,
-    pool_pre_ping=True,
-    pool_recycle=3600,
-    pool_size=5,
-    max_overflow=10
-)
+engine = create_engine(DATABASE_URL, **_engine_options())
 
 # 创建会话工厂
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -33,12 +54,40 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # 创建Base类
 Base = declarative_base()
 
-# 数据库会话实例
-db_session = SessionLocal()
+# 数据库会话注册表：每个线程（请求）获得独立会话，请求结束时调用 db_session.remove() 归还连接
+db_session = scoped_session(SessionLocal)
 
 def init_db():
-    # 简化的初始化
-    Base.metadata.create_all(bind=engine)
+    """执行全部未完成的数据库迁移（见 src/models/migrations.py）"""
+    from src.models.migrations import migrate
+    return migrate(engine)
+
+def warm_up_pool(size=None):
+    """预先建立连接，避免首批请求承担建连开销"""
+    size = DB_POOL_WARMUP if size is None else size
+    connections = []
+    try:
+        for _ in range(min(size, DB_POOL_SIZE)):
+            connections.append(engine.connect())
+    finally:
+        for connection in connections:
+            connection.close()
+
+# 已为其重建连接池的进程号
+_pool_pid = None
+
+def init_worker_pool():
+    """工作进程启动时重建连接池，丢弃从父进程继承的连接后按配置预热（每个进程只执行一次）"""
+    global _pool_pid
+    if _pool_pid == os.getpid():
+        return
+    _pool_pid = os.getpid()
+    try:
+        engine.dispose(close=False)
+    except TypeError:
+        # SQLAlchemy < 1.4.33 不支持 close 参数
+        engine.dispose()
+    warm_up_pool()
 
 def get_db():
     db = SessionLocal()
@@ -1,6 +1,6 @@
 from datetime import datetime
 from src.models.database import Base
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, JSON, Index
 from sqlalchemy.orm import relationship
 
 class Device(Base):
@@ -20,6 +20,13 @@ class Device(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        Index('ix_devices_name_id', 'device_name', 'id'),
+        Index('ix_devices_type_name', 'device_type', 'device_name', 'id'),
+        Index('ix_devices_status_name', 'status', 'device_name', 'id'),
+        Index('ix_devices_location_name', 'location', 'device_name', 'id'),
+    )
+    
     # 关系定义
     production_records = relationship('ProductionRecord', backref='equipment', lazy=True)
     
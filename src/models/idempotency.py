@@ -0,0 +1,21 @@
+from datetime import datetime
+from src.models.database import Base
+from sqlalchemy import Column, Integer, String, DateTime, Index, UniqueConstraint
+
+class IdempotencyKey(Base):
+    """幂等键：记录客户端请求键与已创建资源的对应关系，重试时直接返回原结果"""
+    __tablename__ = 'idempotency_keys'
+    
+    id = Column(Integer, primary_key=True)
+    scope = Column(String(50), nullable=False)  # 资源类型，如 quality_check
+    key = Column(String(128), nullable=False)
+    resource_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        UniqueConstraint('scope', 'key', name='uq_idempotency_keys_scope_key'),
+        Index('ix_idempotency_keys_created_at', 'created_at'),
+    )
+    
+    def __repr__(self):
+        return f'<IdempotencyKey {self.scope}:{self.key} -> {self.resource_id}>'
@@ -0,0 +1,26 @@
+from sqlalchemy import inspect
+from src.models.database import Base
+
+def missing_indexes(bind):
+    """返回模型中已声明但数据库中尚未创建的索引"""
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            # 表尚未创建，create_all 时会一并创建索引
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name not in existing:
+                missing.append(index)
+    return missing
+
+def ensure_indexes(bind, dry_run=False):
+    """为已有数据表补建缺失的索引，返回补建（或待补建）的索引名"""
+    created = []
+    for index in missing_indexes(bind):
+        if not dry_run:
+            index.create(bind=bind)
+        created.append(f'{index.table.name}.{index.name}')
+    return created
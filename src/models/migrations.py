@@ -0,0 +1,252 @@
+"""数据库结构版本与迁移
+
+schema_version 表记录已执行的迁移编号。应用启动时只读取最大版本号
+（一次主键查询），与当前代码要求的版本一致时直接启动，不再对每张表
+执行 create_all 反射；版本落后时按 DB_AUTO_MIGRATE 自动执行或只打印提示。
+生产环境（APP_ENV=production）默认不在启动时迁移，由部署流程先运行 migrate.py，
+避免首次启动时在应用导入阶段对大表建索引、其他进程等待迁移锁。
+
+新增表、列或索引时在 MIGRATIONS 末尾追加一个编号递增的迁移，不要修改
+已发布的迁移。迁移函数接收数据库连接，应可重复执行（先检查再变更），
+以兼容已通过 create_all 建好部分结构的旧库。
+"""
+import os
+import time
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, func, inspect, select
+from sqlalchemy.exc import DBAPIError, OperationalError, ProgrammingError
+from src.models.database import APP_ENV, Base, engine
+
+# 启动时版本落后是否自动迁移（gunicorn --preload 下只在主进程执行一次）；生产环境默认关闭
+AUTO_MIGRATE = os.getenv('DB_AUTO_MIGRATE', 'False' if APP_ENV == 'production' else 'True') == 'True'
+# 启动时读取版本号的重试次数与间隔（秒），数据库短暂不可用时不中断启动
+CHECK_RETRIES = int(os.getenv('DB_SCHEMA_CHECK_RETRIES', 3))
+CHECK_RETRY_DELAY = float(os.getenv('DB_SCHEMA_CHECK_RETRY_DELAY', 1.0))
+# MySQL 迁移锁等待秒数，多个进程同时启动时只有一个执行迁移
+LOCK_TIMEOUT = int(os.getenv('DB_MIGRATE_LOCK_TIMEOUT', 60))
+LOCK_NAME = 'kis_schema_migrate'
+
+
+class SchemaVersion(Base):
+    """已执行的数据库迁移"""
+    __tablename__ = 'schema_version'
+
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    name = Column(String(200), nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<SchemaVersion {self.version} {self.name}>'
+
+
+schema_version_table = SchemaVersion.__table__
+
+
+# 迁移辅助函数（均可重复执行）
+
+def has_table(connection, table_name):
+    return inspect(connection).has_table(table_name)
+
+
+def has_column(connection, table_name, column_name):
+    return any(column['name'] == column_name for column in inspect(connection).get_columns(table_name))
+
+
+def has_index(connection, table_name, index_name):
+    return any(index['name'] == index_name for index in inspect(connection).get_indexes(table_name))
+
+
+def create_tables(connection, *tables):
+    """创建不存在的表（连同表上声明的索引）"""
+    for table in tables:
+        table.create(bind=connection, checkfirst=True)
+
+
+def create_index(connection, index):
+    """创建不存在的索引"""
+    if not has_index(connection, index.table.name, index.name):
+        index.create(bind=connection)
+
+
+def add_column(connection, table_name, column):
+    """为已有表添加不存在的列"""
+    if has_column(connection, table_name, column.name):
+        return
+    column_type = column.type.compile(dialect=connection.dialect)
+    ddl = f'ALTER TABLE {table_name} ADD COLUMN {column.name} {column_type}'
+    if column.server_default is not None:
+        ddl += f' DEFAULT {column.server_default.arg}'
+    if not column.nullable:
+        ddl += ' NOT NULL'
+    connection.exec_driver_sql(ddl)
+
+
+# 迁移定义
+
+def _baseline(connection):
+    """基线：创建当前模型的全部表，并为旧库补建缺失的索引"""
+    from src.models.indexes import ensure_indexes
+    import src.models  # noqa: F401  确保所有模型已注册
+
+    Base.metadata.create_all(bind=connection)
+    ensure_indexes(connection)
+
+
+def _product_materials(connection):
+    """产品物料与供应商批次关联表"""
+    from src.models.tracking import ProductMaterial
+    create_tables(connection, ProductMaterial.__table__)
+
+
+def _recall_indexes(connection):
+    """召回影响分析使用的设备时间段、供应商批次覆盖索引"""
+    from src.models.tracking import ProductionRecord, ProductMaterial
+    for table, name in ((ProductionRecord.__table__, 'ix_production_records_equipment_start'),
+                        (ProductMaterial.__table__, 'ix_product_materials_supplier_batch')):
+        create_index(connection, next(index for index in table.indexes if index.name == name))
+
+
+def _quality_check_version(connection):
+    """质量检查记录的行版本号（没有 updated_at，ETag 使用版本号）"""
+    from src.models.tracking import QualityCheck
+    add_column(connection, 'quality_checks', QualityCheck.__table__.c.version)
+
+
+def _search_pending(connection):
+    """批量导入后待建立搜索索引的产品队列"""
+    from src.models.search import ProductSearchPending
+    create_tables(connection, ProductSearchPending.__table__)
+
+
+def _seed_dashboard_stats(connection):
+    """从业务表填充仪表盘统计（已填充过的库跳过），读取接口不再在请求中重建"""
+    from sqlalchemy.orm import Session
+    from src.services.dashboard_stats import BUILT_KEY, rebuild_stats, stats_table
+
+    if connection.execute(select(stats_table.c.stat_key).where(stats_table.c.stat_key == BUILT_KEY)).first():
+        return
+    session = Session(bind=connection)
+    try:
+        rebuild_stats(session)
+    finally:
+        session.close()
+
+
+def _recall_open_records_index(connection):
+    """召回影响分析查找未结束、超长工序使用的 (equipment_id, end_time) 覆盖索引"""
+    from src.models.tracking import ProductionRecord
+    table = ProductionRecord.__table__
+    create_index(connection, next(index for index in table.indexes if index.name == 'ix_production_records_equipment_end'))
+
+
+def _product_version(connection):
+    """产品行版本号，批量流转以其代替只精确到秒的 updated_at 作为乐观锁"""
+    from src.models.product import Product
+    add_column(connection, 'products', Product.__table__.c.version)
+
+
+# (版本号, 名称, 迁移函数)，版本号从 1 开始连续递增
+MIGRATIONS = [
+    (1, 'baseline', _baseline),
+    (2, 'product_materials', _product_materials),
+    (3, 'recall_indexes', _recall_indexes),
+    (4, 'quality_check_version', _quality_check_version),
+    (5, 'search_pending', _search_pending),
+    (6, 'seed_dashboard_stats', _seed_dashboard_stats),
+    (7, 'recall_open_records_index', _recall_open_records_index),
+    (8, 'product_version', _product_version),
+]
+
+CURRENT_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(connection):
+    """读取数据库结构版本，schema_version 表不存在时返回 0"""
+    try:
+        return connection.execute(select(func.max(schema_version_table.c.version))).scalar() or 0
+    except (ProgrammingError, OperationalError):
+        if has_table(connection, SchemaVersion.__tablename__):
+            raise
+        return 0
+
+
+def pending_migrations(version):
+    return [migration for migration in MIGRATIONS if migration[0] > version]
+
+
+class _MigrationLock:
+    """MySQL 用 GET_LOCK 串行化迁移，其他数据库不加锁"""
+
+    def __init__(self, connection, timeout=LOCK_TIMEOUT):
+        self.connection = connection
+        self.timeout = timeout
+        self.enabled = connection.dialect.name == 'mysql'
+
+    def __enter__(self):
+        if self.enabled:
+            acquired = self.connection.exec_driver_sql(f"SELECT GET_LOCK('{LOCK_NAME}', {self.timeout})").scalar()
+            if acquired != 1:
+                raise RuntimeError('等待数据库迁移锁超时，可能有其他进程正在迁移')
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.enabled:
+            self.connection.exec_driver_sql(f"SELECT RELEASE_LOCK('{LOCK_NAME}')")
+
+
+def migrate(bind=None, target=None, log=print):
+    """执行未完成的迁移直到 target（默认最新版本），返回执行过的版本号列表"""
+    bind = bind if bind is not None else engine
+    target = CURRENT_VERSION if target is None else target
+    applied = []
+    with bind.connect() as lock_connection:
+        with _MigrationLock(lock_connection):
+            with bind.begin() as connection:
+                schema_version_table.create(bind=connection, checkfirst=True)
+            # 拿到锁后重新读取版本，其他进程可能已经完成迁移
+            with bind.connect() as connection:
+                version = current_version(connection)
+            for number, name, upgrade in pending_migrations(version):
+                if number > target:
+                    break
+                started = time.perf_counter()
+                # MySQL 的 DDL 会隐式提交，迁移函数需可重复执行，失败后重新运行即可
+                with bind.begin() as connection:
+                    upgrade(connection)
+                    connection.execute(schema_version_table.insert(), {
+                        'version': number, 'name': name, 'applied_at': datetime.utcnow()
+                    })
+                applied.append(number)
+                log(f'已执行迁移 {number:04d} {name}（{(time.perf_counter() - started) * 1000:.0f} ms）')
+    return applied
+
+
+def check_schema(bind=None, auto_migrate=AUTO_MIGRATE, retries=CHECK_RETRIES, retry_delay=CHECK_RETRY_DELAY, log=print):
+    """启动检查：读取版本号，落后时按配置自动迁移；数据库暂时不可用时只告警不抛出
+
+    返回数据库当前版本，无法连接时返回 None
+    """
+    bind = bind if bind is not None else engine
+    version = None
+    for attempt in range(retries + 1):
+        try:
+            with bind.connect() as connection:
+                version = current_version(connection)
+            break
+        except DBAPIError as e:
+            if attempt == retries:
+                log(f'⚠️ 无法读取数据库结构版本，跳过启动检查: {e}')
+                return None
+            time.sleep(retry_delay * (attempt + 1))
+
+    if version >= CURRENT_VERSION:
+        return version
+    if not auto_migrate:
+        log(f'⚠️ 数据库结构版本 {version} 落后于 {CURRENT_VERSION}，请运行 python migrate.py')
+        return version
+    try:
+        migrate(bind, log=log)
+        return CURRENT_VERSION
+    except Exception as e:
+        log(f'❌ 数据库迁移失败，请检查后运行 python migrate.py: {e}')
+        return version
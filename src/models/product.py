@@ -1,7 +1,7 @@
 from datetime import datetime
 from src.models.database import Base
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON, Index, event
+from sqlalchemy.orm import relationship, object_session
 
 class Product(Base):
     __tablename__ = 'products'
@@ -17,6 +17,15 @@ class Product(Base):
     status = Column(String(20), nullable=False, default='produced')  # produced, shipped, sold, recalled
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # 行版本号：每次更新递增，作为批量流转的乐观锁版本（updated_at 只精确到秒）
+    version = Column(Integer, nullable=False, default=1, server_default='1')
+    
+    # 索引与列表接口的过滤条件 + (created_at, id) 排序一一对应
+    __table_args__ = (
+        Index('ix_products_created_at_id', 'created_at', 'id'),
+        Index('ix_products_status_created_at', 'status', 'created_at', 'id'),
+        Index('ix_products_type_created_at', 'product_type', 'created_at', 'id'),
+    )
     
     # 关系定义
     tracking_data = relationship('TrackingData', backref='product', lazy=True, uselist=False)
@@ -36,8 +45,15 @@ class Product(Base):
             'warranty_period': self.warranty_period,
             'status': self.status,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'version': self.version
         }
     
     def __repr__(self):
-        return f'<Product {self.product_code}: {self.product_name}>'
\ No newline at end of file
+        return f'<Product {self.product_code}: {self.product_name}>'
+
+@event.listens_for(Product, 'before_update')
+def _bump_version(mapper, connection, target):
+    # ORM 更新在数据库中原子递增版本号；没有实际修改的对象不会因此产生 UPDATE
+    if object_session(target).is_modified(target, include_collections=False):
+        target.version = Product.version + 1
\ No newline at end of file
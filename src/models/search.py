@@ -0,0 +1,29 @@
+from src.models.database import Base
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, Index
+
+class ProductSearchTerm(Base):
+    """产品搜索倒排索引：每行表示某产品的某字段包含一个 n-gram 词项"""
+    __tablename__ = 'product_search_terms'
+    
+    term = Column(String(16), primary_key=True)  # 二元组、中文单字或以 ^ 开头的字段前缀词项
+    product_id = Column(Integer, primary_key=True)
+    field = Column(String(16), primary_key=True)  # name, code, type, spec
+    weight = Column(Integer, nullable=False, default=1)
+    
+    __table_args__ = (
+        Index('ix_product_search_terms_product', 'product_id'),
+    )
+    
+    def __repr__(self):
+        return f'<ProductSearchTerm {self.term} -> {self.product_id}.{self.field}>'
+
+class ProductSearchPending(Base):
+    """待建立搜索索引的产品：批量导入时与产品在同一事务内写入，建好索引后删除"""
+    __tablename__ = 'product_search_pending'
+    
+    product_id = Column(Integer, primary_key=True, autoincrement=False)
+    queued_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ProductSearchPending {self.product_id}>'
@@ -1,6 +1,6 @@
 from datetime import datetime
 from src.models.database import Base
-from sqlalchemy import Column, Integer, String, DateTime, Float, Text, Boolean, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Float, Text, Boolean, JSON, Index
 from sqlalchemy.orm import relationship
 
 class Supplier(Base):
@@ -21,6 +21,11 @@ class Supplier(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        Index('ix_suppliers_name_id', 'supplier_name', 'id'),
+        Index('ix_suppliers_status_name', 'status', 'supplier_name', 'id'),
+    )
+    
     def to_dict(self):
         """将供应商信息转换为字典"""
         return {
@@ -1,6 +1,6 @@
 from datetime import datetime
 from src.models.database import Base
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, Text, JSON
+from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime, ForeignKey, Boolean, Text, JSON, Index, event
 from sqlalchemy.orm import relationship
 
 class TrackingData(Base):
@@ -19,6 +19,12 @@ class TrackingData(Base):
     # 操作记录列表（存储在MongoDB中，这里只存储引用ID）
     operation_logs_ref = Column(String(255), nullable=True)
     
+    __table_args__ = (
+        Index('ix_tracking_data_created_at_id', 'created_at', 'id'),
+        Index('ix_tracking_data_status_created_at', 'current_status', 'created_at', 'id'),
+        Index('ix_tracking_data_last_updated_id', 'last_updated', 'id'),
+    )
+    
     def to_dict(self):
         """将追踪数据转换为字典"""
         return {
@@ -46,6 +52,15 @@ class ProductionRecord(Base):
     notes = Column(Text, nullable=True)
     status = Column(String(20), nullable=False, default='completed')  # pending, in_progress, completed, failed
     
+    __table_args__ = (
+        Index('ix_production_records_product_start', 'product_id', 'start_time'),
+        Index('ix_production_records_start_time_id', 'start_time', 'id'),
+        # 召回分析：设备工序时间段 -> 产品（覆盖索引）
+        Index('ix_production_records_equipment_start', 'equipment_id', 'start_time', 'end_time', 'product_id'),
+        # 召回分析：未结束或超长的工序（按结束时间查找）
+        Index('ix_production_records_equipment_end', 'equipment_id', 'end_time', 'start_time', 'product_id'),
+    )
+    
     def to_dict(self):
         """将生产记录转换为字典"""
         return {
@@ -73,6 +88,17 @@ class QualityCheck(Base):
     pass_status = Column(Boolean, nullable=False)
     comments = Column(Text, nullable=True)
     images = Column(JSON, nullable=True)  # 检查图片路径列表
+    # 行版本号：ORM 每次更新自动递增（同时作为乐观锁），用于生成 ETag
+    version = Column(Integer, nullable=False, default=1, server_default='1')
+    
+    __mapper_args__ = {'version_id_col': version}
+    
+    __table_args__ = (
+        Index('ix_quality_checks_check_time_id', 'check_time', 'id'),
+        Index('ix_quality_checks_product_check_time', 'product_id', 'check_time', 'id'),
+        Index('ix_quality_checks_type_check_time', 'check_type', 'check_time', 'id'),
+        Index('ix_quality_checks_pass_check_time', 'pass_status', 'check_time', 'id'),
+    )
     
     def to_dict(self):
         """将质量检查记录转换为字典"""
@@ -86,4 +112,99 @@ class QualityCheck(Base):
             'pass_status': self.pass_status,
             'comments': self.comments,
             'images': self.images
-        }
\ No newline at end of file
+        }
+
+class ProductMaterial(Base):
+    """产品使用的物料及其供应商批次（追溯链：产品 -> 物料 -> 供应商）"""
+    __tablename__ = 'product_materials'
+    
+    id = Column(Integer, primary_key=True)
+    product_id = Column(Integer, ForeignKey('products.id'), nullable=False)
+    supplier_id = Column(Integer, ForeignKey('suppliers.id'), nullable=False)
+    material = Column(String(200), nullable=False)  # 物料名称，对应供应商 supply_materials 中的条目
+    batch_no = Column(String(100), nullable=True)  # 供应商批次号
+    quantity = Column(Float, nullable=True)
+    production_record_id = Column(Integer, ForeignKey('production_records.id'), nullable=True)  # 投料工序
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index('ix_product_materials_product_supplier', 'product_id', 'supplier_id'),
+        Index('ix_product_materials_supplier_product', 'supplier_id', 'product_id'),
+        Index('ix_product_materials_batch', 'batch_no'),
+        # 召回分析：供应商批次 -> 产品（覆盖索引）
+        Index('ix_product_materials_supplier_batch', 'supplier_id', 'batch_no', 'product_id'),
+    )
+    
+    def to_dict(self):
+        """将产品物料转换为字典"""
+        return {
+            'id': self.id,
+            'product_id': self.product_id,
+            'supplier_id': self.supplier_id,
+            'material': self.material,
+            'batch_no': self.batch_no,
+            'quantity': self.quantity,
+            'production_record_id': self.production_record_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class TrackingEvent(Base):
+    """追踪事件：只追加的位置、状态变更和扫描记录，tracking_data 为其最新状态投影"""
+    __tablename__ = 'tracking_events'
+    
+    id = Column(BigInteger().with_variant(Integer, 'sqlite'), primary_key=True, autoincrement=True)
+    # MySQL 分区表不支持外键，product_id 只建索引
+    product_id = Column(Integer, nullable=False)
+    event_type = Column(String(30), nullable=False)  # created, update, scan, move
+    location = Column(String(255), nullable=True)
+    status = Column(String(50), nullable=True)
+    source = Column(String(100), nullable=True)  # 网关、读写器或操作来源
+    operator_id = Column(Integer, nullable=True)
+    occurred_at = Column(DateTime, nullable=False)  # 事件发生时间（由网关上报）
+    recorded_at = Column(DateTime, default=datetime.utcnow)
+    details = Column(JSON, nullable=True)
+    
+    __table_args__ = (
+        Index('ix_tracking_events_product_occurred', 'product_id', 'occurred_at', 'id'),
+        Index('ix_tracking_events_occurred_at_id', 'occurred_at', 'id'),
+    )
+    
+    def to_dict(self):
+        """将追踪事件转换为字典"""
+        return {
+            'id': self.id,
+            'product_id': self.product_id,
+            'event_type': self.event_type,
+            'location': self.location,
+            'status': self.status,
+            'source': self.source,
+            'operator_id': self.operator_id,
+            'occurred_at': self.occurred_at.isoformat() if self.occurred_at else None,
+            'recorded_at': self.recorded_at.isoformat() if self.recorded_at else None,
+            'details': self.details
+        }
+
+def monthly_partitions(start, months):
+    """从 start 所在月份起连续 months 个月的分区 [(分区名, 上界日期)]"""
+    partitions = []
+    year, month = start.year, start.month
+    for _ in range(months):
+        next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+        partitions.append((f'p{year:04d}{month:02d}', f'{next_year:04d}-{next_month:02d}-01'))
+        year, month = next_year, next_month
+    return partitions
+
+def partition_clause(partitions):
+    parts = [f"PARTITION {name} VALUES LESS THAN ('{bound}')" for name, bound in partitions]
+    parts.append('PARTITION pmax VALUES LESS THAN (MAXVALUE)')
+    return ', '.join(parts)
+
+@event.listens_for(TrackingEvent.__table__, 'after_create')
+def _partition_tracking_events(target, connection, **kw):
+    """MySQL 下按 occurred_at 按月分区；分区键必须包含在主键中"""
+    if connection.dialect.name != 'mysql':
+        return
+    connection.exec_driver_sql(
+        'ALTER TABLE tracking_events DROP PRIMARY KEY, ADD PRIMARY KEY (id, occurred_at) '
+        f'PARTITION BY RANGE COLUMNS(occurred_at) ({partition_clause(monthly_partitions(datetime.utcnow(), 4))})'
+    )
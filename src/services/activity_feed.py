@@ -0,0 +1,132 @@
+"""近期活动流
+
+合并质量检查、追踪事件和生产记录三类活动，每类活动通过一次联表查询
+同时取出产品名称和编码；按 (时间, 类型, ID) 倒序做键集分页，
+翻页深度不影响单页查询次数。
+"""
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import and_, or_
+from src.models.product import Product
+from src.models.tracking import TrackingEvent, ProductionRecord, QualityCheck
+from src.utils.pagination import encode_cursor, decode_cursor
+
+DEFAULT_WINDOW_DAYS = int(os.getenv('DASHBOARD_WINDOW_DAYS', 7))
+MAX_WINDOW_DAYS = 90
+MAX_LIMIT = 100
+
+
+def _quality_check_query(session):
+    return session.query(
+        QualityCheck.id, QualityCheck.check_time, QualityCheck.check_type, QualityCheck.pass_status,
+        Product.product_name, Product.product_code
+    ).outerjoin(Product, Product.id == QualityCheck.product_id)
+
+
+def _quality_check_item(row):
+    return {
+        'check_type': row.check_type,
+        'result': '合格' if row.pass_status else '不合格'
+    }
+
+
+def _tracking_query(session):
+    return session.query(
+        TrackingEvent.id, TrackingEvent.occurred_at, TrackingEvent.event_type, TrackingEvent.status, TrackingEvent.location,
+        Product.product_name, Product.product_code
+    ).outerjoin(Product, Product.id == TrackingEvent.product_id)
+
+
+def _tracking_item(row):
+    return {
+        'event_type': row.event_type,
+        'status': row.status,
+        'location': row.location
+    }
+
+
+def _production_query(session):
+    return session.query(
+        ProductionRecord.id, ProductionRecord.start_time, ProductionRecord.process_step, ProductionRecord.status,
+        Product.product_name, Product.product_code
+    ).outerjoin(Product, Product.id == ProductionRecord.product_id)
+
+
+def _production_item(row):
+    return {
+        'process_step': row.process_step,
+        'status': row.status
+    }
+
+
+# 活动类型 -> (ID列, 时间列, 查询构造函数, 明细字段函数)；列表顺序即同一时刻的排序优先级
+SOURCES = [
+    ('production', ProductionRecord.id, ProductionRecord.start_time, _production_query, _production_item),
+    ('tracking_update', TrackingEvent.id, TrackingEvent.occurred_at, _tracking_query, _tracking_item),
+    ('quality_check', QualityCheck.id, QualityCheck.check_time, _quality_check_query, _quality_check_item),
+]
+SOURCE_RANKS = {source[0]: rank for rank, source in enumerate(SOURCES)}
+
+
+def _after_cursor(id_col, time_col, rank, cursor):
+    """构造排在游标之后的过滤条件（倒序）"""
+    cursor_time, cursor_type, cursor_id = cursor
+    cursor_rank = SOURCE_RANKS[cursor_type]
+    if rank < cursor_rank:
+        return time_col <= cursor_time
+    if rank > cursor_rank:
+        return time_col < cursor_time
+    return or_(time_col < cursor_time, and_(time_col == cursor_time, id_col < cursor_id))
+
+
+def parse_window_days(value):
+    """解析统计窗口天数，限制在允许范围内"""
+    if value is None:
+        return DEFAULT_WINDOW_DAYS
+    return max(1, min(int(value), MAX_WINDOW_DAYS))
+
+
+def get_activity_feed(session, days=DEFAULT_WINDOW_DAYS, limit=10, cursor=None, types=None):
+    """获取近期活动，返回活动列表和下一页游标"""
+    limit = max(1, min(limit, MAX_LIMIT))
+    start_date = datetime.utcnow() - timedelta(days=days)
+
+    if cursor:
+        cursor = decode_cursor(cursor, size=3)
+        if cursor[1] not in SOURCE_RANKS or not isinstance(cursor[0], datetime) or type(cursor[2]) is not int:
+            raise ValueError('无效的游标')
+
+    rows = []
+    for rank, (activity_type, id_col, time_col, build_query, build_item) in enumerate(SOURCES):
+        if types and activity_type not in types:
+            continue
+
+        query = build_query(session).filter(time_col >= start_date)
+        if cursor:
+            query = query.filter(_after_cursor(id_col, time_col, rank, cursor))
+
+        # 每类活动最多取 limit + 1 行，合并后即可判断是否还有下一页
+        for row in query.order_by(time_col.desc(), id_col.desc()).limit(limit + 1):
+            rows.append((row[1], rank, row.id, activity_type, row, build_item))
+
+    rows.sort(key=lambda item: item[:3], reverse=True)
+    page = rows[:limit]
+
+    activities = []
+    for time, rank, row_id, activity_type, row, build_item in page:
+        activity = {
+            'type': activity_type,
+            'id': row_id,
+            'product_name': row.product_name or '未知产品',
+            'product_code': row.product_code or 'N/A',
+            'time': time.isoformat()
+        }
+        activity.update(build_item(row))
+        activities.append(activity)
+
+    next_cursor = None
+    if len(rows) > limit:
+        time, rank, row_id, activity_type = page[-1][:4]
+        next_cursor = encode_cursor(time, activity_type, row_id)
+
+    return {'activities': activities, 'next_cursor': next_cursor}
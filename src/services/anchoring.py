@@ -0,0 +1,334 @@
+"""追踪记录锚定
+
+把追踪数据、追踪事件、生产记录和质量检查按批组成 Merkle 树：叶子为记录关键字段的
+规范 JSON 哈希（前缀 0x00），内部节点为左右子节点拼接后的哈希（前缀 0x01），
+奇数个节点时末尾节点直接提升到上一层。每批只向本地追加式账本写一行根哈希，
+账本每行包含上一行的哈希形成链；每条记录保存自己的包含证明，
+校验一个产品的全部历史只需每条记录 O(log n) 次哈希和每批一次账本读取。
+"""
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from sqlalchemy import and_
+from src.models.anchoring import AnchorBatch, AnchorProof
+from src.models.tracking import TrackingData, ProductionRecord, QualityCheck, TrackingEvent
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+LEDGER_PATH = os.getenv('ANCHOR_LEDGER_PATH', os.path.join(PROJECT_ROOT, 'data', 'anchor_ledger.ndjson'))
+BATCH_SIZE = int(os.getenv('ANCHOR_BATCH_SIZE', 50000))
+INTERVAL_SECONDS = int(os.getenv('ANCHOR_INTERVAL_SECONDS', 0))
+# 回看水位线以下的ID数，补上提交顺序晚于更大ID的记录
+LOOKBACK_IDS = 1000
+GENESIS_HASH = '0' * 64
+FAILED_STATUSES = ('modified', 'invalid_proof', 'ledger_mismatch', 'deleted')
+
+# 记录类型 -> (模型, 参与哈希的字段)；字段一经使用不可修改，否则已有证明全部失效
+ANCHORED_TYPES = {
+    'tracking': (TrackingData, ('id', 'product_id', 'qr_code', 'created_at')),
+    'production': (ProductionRecord, ('id', 'product_id', 'process_step', 'equipment_id', 'operator_id',
+                                      'start_time', 'end_time', 'parameters', 'notes', 'status')),
+    'quality': (QualityCheck, ('id', 'product_id', 'inspector_id', 'check_time', 'check_type',
+                               'check_items', 'pass_status', 'comments', 'images')),
+    'tracking_event': (TrackingEvent, ('id', 'product_id', 'event_type', 'location', 'status', 'source',
+                                       'operator_id', 'occurred_at', 'details')),
+}
+
+_run_lock = threading.Lock()
+
+logger = logging.getLogger(__name__)
+
+
+def _canonical(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def leaf_hash(record_type, values):
+    """记录的叶子哈希"""
+    data = json.dumps(
+        [record_type, {key: _canonical(value) for key, value in values.items()}],
+        sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(b'\x00' + data.encode('utf-8')).hexdigest()
+
+
+def _node_hash(left, right):
+    return hashlib.sha256(b'\x01' + bytes.fromhex(left) + bytes.fromhex(right)).hexdigest()
+
+
+def build_tree(leaves):
+    """由叶子哈希列表构建 Merkle 树，返回 (根哈希, 每个叶子的证明)"""
+    proofs = [[] for _ in leaves]
+    positions = list(range(len(leaves)))
+    level = list(leaves)
+    while len(level) > 1:
+        for leaf, position in enumerate(positions):
+            sibling = position ^ 1
+            if sibling < len(level):
+                proofs[leaf].append(('R:' if position % 2 == 0 else 'L:') + level[sibling])
+            positions[leaf] = position // 2
+        level = [
+            _node_hash(level[i], level[i + 1]) if i + 1 < len(level) else level[i]
+            for i in range(0, len(level), 2)
+        ]
+    return level[0], proofs
+
+
+def proof_root(leaf, proof):
+    """沿证明路径计算根哈希"""
+    node = leaf
+    for step in proof:
+        side, sibling = step.split(':', 1)
+        node = _node_hash(sibling, node) if side == 'L' else _node_hash(node, sibling)
+    return node
+
+
+def _entry_hash(prev_hash, batch_id, root, leaf_count, anchored_at):
+    return hashlib.sha256(f'{prev_hash}|{batch_id}|{root}|{leaf_count}|{anchored_at}'.encode('utf-8')).hexdigest()
+
+
+def _last_entry_hash(ledger):
+    """读取账本最后一行的哈希"""
+    ledger.seek(0, os.SEEK_END)
+    size = ledger.tell()
+    if not size:
+        return GENESIS_HASH
+    ledger.seek(max(0, size - 4096))
+    lines = ledger.read().splitlines()
+    return json.loads(lines[-1])['hash']
+
+
+def append_ledger(batch):
+    """把批次根哈希追加到账本，返回 (条目哈希, 字节偏移)"""
+    os.makedirs(os.path.dirname(LEDGER_PATH), exist_ok=True)
+    with open(LEDGER_PATH, 'a+b') as ledger:
+        fcntl.flock(ledger, fcntl.LOCK_EX)
+        try:
+            prev_hash = _last_entry_hash(ledger)
+            anchored_at = datetime.utcnow().isoformat()
+            entry = {
+                'batch_id': batch.id,
+                'root': batch.merkle_root,
+                'leaf_count': batch.leaf_count,
+                'anchored_at': anchored_at,
+                'prev_hash': prev_hash,
+                'hash': _entry_hash(prev_hash, batch.id, batch.merkle_root, batch.leaf_count, anchored_at)
+            }
+            ledger.seek(0, os.SEEK_END)
+            offset = ledger.tell()
+            ledger.write((json.dumps(entry, sort_keys=True) + '\n').encode('utf-8'))
+            ledger.flush()
+            os.fsync(ledger.fileno())
+            return entry['hash'], offset
+        finally:
+            fcntl.flock(ledger, fcntl.LOCK_UN)
+
+
+def read_ledger_entry(offset):
+    with open(LEDGER_PATH, 'rb') as ledger:
+        ledger.seek(offset)
+        return json.loads(ledger.readline())
+
+
+def _entry_valid(entry):
+    return entry['hash'] == _entry_hash(entry['prev_hash'], entry['batch_id'], entry['root'], entry['leaf_count'], entry['anchored_at'])
+
+
+def verify_ledger():
+    """逐行校验账本哈希链，返回 (条目数, 错误列表)"""
+    if not os.path.exists(LEDGER_PATH):
+        return 0, []
+    errors = []
+    prev_hash = GENESIS_HASH
+    count = 0
+    with open(LEDGER_PATH, 'rb') as ledger:
+        for number, line in enumerate(ledger, start=1):
+            entry = json.loads(line)
+            count += 1
+            if entry['prev_hash'] != prev_hash:
+                errors.append(f'第 {number} 行: 与上一行哈希不连续')
+            if not _entry_valid(entry):
+                errors.append(f'第 {number} 行: 条目哈希不符')
+            prev_hash = entry['hash']
+    return count, errors
+
+
+@contextmanager
+def _exclusive_run():
+    """同一主机上的多个进程、线程不会同时锚定"""
+    os.makedirs(os.path.dirname(LEDGER_PATH), exist_ok=True)
+    with _run_lock, open(LEDGER_PATH + '.lock', 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _pending_records(session, record_type, limit):
+    """水位线附近及以上、尚无证明的记录"""
+    model, fields = ANCHORED_TYPES[record_type]
+    watermark = session.query(AnchorProof.record_id).filter(
+        AnchorProof.record_type == record_type
+    ).order_by(AnchorProof.record_id.desc()).limit(1).scalar() or 0
+
+    columns = [getattr(model, field) for field in fields]
+    rows = session.query(*columns).outerjoin(
+        AnchorProof, and_(AnchorProof.record_type == record_type, AnchorProof.record_id == model.id)
+    ).filter(
+        model.id > watermark - LOOKBACK_IDS, AnchorProof.id.is_(None)
+    ).order_by(model.id).limit(limit).all()
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def _record_ledger(session, batch):
+    batch.ledger_hash, batch.ledger_offset = append_ledger(batch)
+    batch.anchored_at = datetime.utcnow()
+    session.commit()
+
+
+def _anchor_batch(session, batch_size):
+    leaves = []
+    for record_type in ANCHORED_TYPES:
+        remaining = batch_size - len(leaves)
+        if remaining <= 0:
+            break
+        for values in _pending_records(session, record_type, remaining):
+            leaves.append((record_type, values['id'], values.get('product_id'), leaf_hash(record_type, values)))
+    if not leaves:
+        return None
+
+    root, proofs = build_tree([leaf for record_type, record_id, product_id, leaf in leaves])
+    batch = AnchorBatch(merkle_root=root, leaf_count=len(leaves))
+    session.add(batch)
+    session.flush()
+    session.execute(AnchorProof.__table__.insert(), [
+        {
+            'batch_id': batch.id,
+            'record_type': record_type,
+            'record_id': record_id,
+            'product_id': product_id,
+            'leaf_index': index,
+            'leaf_hash': leaf,
+            'proof': proof
+        }
+        for index, ((record_type, record_id, product_id, leaf), proof) in enumerate(zip(leaves, proofs))
+    ])
+    session.commit()
+
+    _record_ledger(session, batch)
+    return batch
+
+
+def anchor_pending(session, batch_size=BATCH_SIZE):
+    """锚定全部尚未锚定的记录，返回本次创建的批次列表"""
+    with _exclusive_run():
+        # 上次写入账本前中断的批次先补写
+        for batch in session.query(AnchorBatch).filter(AnchorBatch.ledger_hash.is_(None)).order_by(AnchorBatch.id).all():
+            _record_ledger(session, batch)
+
+        batches = []
+        while True:
+            batch = _anchor_batch(session, batch_size)
+            if batch is None:
+                return batches
+            batches.append(batch)
+
+
+def verify_product(session, product_id):
+    """校验产品的全部已锚定记录"""
+    proofs = {(proof.record_type, proof.record_id): proof for proof in session.query(AnchorProof).filter_by(product_id=product_id)}
+    batch_ids = {proof.batch_id for proof in proofs.values()}
+    batches = {batch.id: batch for batch in session.query(AnchorBatch).filter(AnchorBatch.id.in_(batch_ids))} if batch_ids else {}
+
+    # 每个批次只读取一次账本条目：None 表示账本一致
+    ledger_status = {}
+    for batch in batches.values():
+        if batch.ledger_hash is None:
+            ledger_status[batch.id] = 'unanchored'
+            continue
+        try:
+            entry = read_ledger_entry(batch.ledger_offset)
+            valid = entry['root'] == batch.merkle_root and entry['hash'] == batch.ledger_hash and _entry_valid(entry)
+        except (OSError, ValueError, KeyError):
+            valid = False
+        ledger_status[batch.id] = None if valid else 'ledger_mismatch'
+
+    records = []
+    for record_type, (model, fields) in ANCHORED_TYPES.items():
+        columns = [getattr(model, field) for field in fields]
+        for row in session.query(*columns).filter(model.product_id == product_id).order_by(model.id):
+            values = dict(zip(fields, row))
+            proof = proofs.pop((record_type, values['id']), None)
+            if proof is None:
+                status = 'pending'
+            elif leaf_hash(record_type, values) != proof.leaf_hash:
+                status = 'modified'
+            elif proof_root(proof.leaf_hash, proof.proof) != batches[proof.batch_id].merkle_root:
+                status = 'invalid_proof'
+            else:
+                status = ledger_status[proof.batch_id] or 'verified'
+            records.append({'type': record_type, 'id': values['id'], 'status': status, 'batch_id': proof.batch_id if proof else None})
+
+    # 有证明但记录已不存在
+    for (record_type, record_id), proof in proofs.items():
+        records.append({'type': record_type, 'id': record_id, 'status': 'deleted', 'batch_id': proof.batch_id})
+
+    # pending 和 unanchored 只是尚未完成锚定，不算校验失败
+    failed = [record for record in records if record['status'] in FAILED_STATUSES]
+    return {
+        'product_id': product_id,
+        'verified': not failed,
+        'records': records,
+        'batches': [batch.to_dict() for batch in sorted(batches.values(), key=lambda batch: batch.id)]
+    }
+
+
+def _try_scheduler_lock():
+    """非阻塞地获取定期锚定的调度锁，成功返回持有锁的文件，已被其他进程持有时返回 None"""
+    os.makedirs(os.path.dirname(LEDGER_PATH), exist_ok=True)
+    lock_file = open(LEDGER_PATH + '.scheduler.lock', 'w')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+def start_scheduler(session_factory, interval=INTERVAL_SECONDS):
+    """启动后台锚定线程，interval 不大于 0 时不启动
+
+    由 gunicorn 的 post_worker_init 在每个工作进程中调用；调度锁在进程存活期间一直持有，
+    同一主机上只有一个工作进程定期锚定，该进程退出后由其他工作进程接替
+    """
+    if interval <= 0:
+        return None
+
+    def run():
+        scheduler_lock = None
+        while True:
+            time.sleep(interval)
+            if scheduler_lock is None:
+                scheduler_lock = _try_scheduler_lock()
+                if scheduler_lock is None:
+                    continue
+            session = session_factory()
+            try:
+                anchor_pending(session)
+            except Exception:
+                session.rollback()
+                logger.exception('记录锚定失败')
+            finally:
+                session.close()
+
+    thread = threading.Thread(target=run, name='record-anchor', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,252 @@
+"""操作日志异步写入
+
+log_operation 只把日志放入有界内存队列，后台线程按批取出写入后端：
+本地按大小滚动的 NDJSON 分段文件，以及可选的 MongoDB。队列满时按
+AUDIT_OVERFLOW 阻塞等待最多 AUDIT_ENQUEUE_TIMEOUT 秒（block，默认，操作日志
+不应静默丢失）或立即丢弃（drop）；丢弃数、队列深度、写入失败数和写入耗时等
+指标通过 metrics() 暴露，用于观察背压。
+"""
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+QUEUE_SIZE = int(os.getenv('AUDIT_QUEUE_SIZE', 10000))
+BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', 500))
+FLUSH_INTERVAL = float(os.getenv('AUDIT_FLUSH_INTERVAL', 1.0))
+OVERFLOW = os.getenv('AUDIT_OVERFLOW', 'block')  # block 或 drop
+ENQUEUE_TIMEOUT = float(os.getenv('AUDIT_ENQUEUE_TIMEOUT', 1.0))
+BACKENDS = os.getenv('AUDIT_LOG_BACKENDS', 'file')  # 逗号分隔：file, mongo
+LOG_DIR = os.getenv('AUDIT_LOG_DIR', os.path.join(PROJECT_ROOT, 'data', 'audit'))
+SEGMENT_BYTES = int(os.getenv('AUDIT_SEGMENT_BYTES', 64 * 1024 * 1024))
+MAX_SEGMENTS = int(os.getenv('AUDIT_MAX_SEGMENTS', 0))  # 0 表示不清理旧分段
+MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017')
+MONGO_DB = os.getenv('MONGO_DB', 'kiss')
+MONGO_COLLECTION = os.getenv('MONGO_LOG_COLLECTION', 'operation_logs')
+WRITE_RETRIES = 2
+
+
+class SegmentWriter:
+    """按大小滚动的本地 NDJSON 分段文件，每个进程写自己的分段"""
+
+    def __init__(self, directory=LOG_DIR, segment_bytes=SEGMENT_BYTES, max_segments=MAX_SEGMENTS):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_segments = max_segments
+        self.file = None
+        self.size = 0
+
+    def _open_segment(self):
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"audit-{datetime.utcnow().strftime('%Y%m%d-%H%M%S-%f')}-{os.getpid()}.ndjson"
+        self.file = open(os.path.join(self.directory, name), 'ab')
+        self.size = 0
+        self._prune()
+
+    def _prune(self):
+        if self.max_segments <= 0:
+            return
+        segments = sorted(name for name in os.listdir(self.directory) if name.startswith('audit-') and name.endswith('.ndjson'))
+        for name in segments[:-self.max_segments]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def write_batch(self, entries):
+        if self.file is None or self.size >= self.segment_bytes:
+            self.close()
+            self._open_segment()
+        data = b''.join(
+            json.dumps(entry, ensure_ascii=False, default=str).encode('utf-8') + b'\n' for entry in entries
+        )
+        self.file.write(data)
+        self.file.flush()
+        self.size += len(data)
+
+    def after_fork(self):
+        # 父进程的分段文件留给父进程，子进程按需打开自己的分段
+        self.file = None
+        self.size = 0
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class MongoWriter:
+    """写入 MongoDB 集合，pymongo 在首次写入时才导入"""
+
+    def __init__(self, uri=MONGO_URI, database=MONGO_DB, collection=MONGO_COLLECTION):
+        self.uri = uri
+        self.database = database
+        self.collection_name = collection
+        self.collection = None
+
+    def write_batch(self, entries):
+        if self.collection is None:
+            from pymongo import MongoClient
+            client = MongoClient(self.uri, serverSelectionTimeoutMS=2000)
+            self.collection = client[self.database][self.collection_name]
+        # insert_many 会给字典添加 _id，传入副本
+        self.collection.insert_many([dict(entry) for entry in entries], ordered=False)
+
+    def after_fork(self):
+        # MongoClient 不能跨 fork 使用
+        self.collection = None
+
+    def close(self):
+        if self.collection is not None:
+            self.collection.database.client.close()
+            self.collection = None
+
+
+WRITERS = {'file': SegmentWriter, 'mongo': MongoWriter}
+
+
+class AuditLogSink:
+    def __init__(self, writers=None, maxsize=QUEUE_SIZE, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL,
+                 overflow=OVERFLOW, enqueue_timeout=ENQUEUE_TIMEOUT):
+        self.writers = writers if writers is not None else [WRITERS[name.strip()]() for name in BACKENDS.split(',') if name.strip()]
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.enqueue_timeout = enqueue_timeout
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.pid = None
+        self.queue = None
+        self.thread = None
+        self.stopping = threading.Event()
+        # 计数在多个请求线程中无锁累加，只作为近似指标
+        self.counters = {
+            'enqueued': 0, 'dropped': 0, 'flushed': 0, 'write_errors': 0,
+            'batches': 0, 'max_depth': 0, 'last_batch_size': 0, 'last_flush_ms': 0.0
+        }
+        self.last_error = None
+
+    def add_writer(self, writer):
+        """注册额外的写入后端（需实现 write_batch(entries)、after_fork() 和 close()）"""
+        self.writers.append(writer)
+
+    def _ensure_started(self):
+        # fork 出的工作进程不会继承后台线程，按进程号重新启动
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            if self.pid is not None:
+                for writer in self.writers:
+                    writer.after_fork()
+            self.queue = queue.Queue(maxsize=self.maxsize)
+            self.stopping.clear()
+            self.thread = threading.Thread(target=self._run, name='audit-log-flusher', daemon=True)
+            self.thread.start()
+            self.pid = os.getpid()
+
+    def enqueue(self, entry):
+        """放入队列，返回是否成功；请求路径上只有这一步开销"""
+        self._ensure_started()
+        try:
+            if self.overflow == 'block':
+                self.queue.put(entry, timeout=self.enqueue_timeout)
+            else:
+                self.queue.put_nowait(entry)
+        except queue.Full:
+            self.counters['dropped'] += 1
+            return False
+        self.counters['enqueued'] += 1
+        depth = self.queue.qsize()
+        if depth > self.counters['max_depth']:
+            self.counters['max_depth'] = depth
+        return True
+
+    def _drain(self, first):
+        batch = [first]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        with self.write_lock:
+            self._write_locked(batch)
+
+    def _write_locked(self, batch):
+        started = time.perf_counter()
+        written = True
+        for writer in self.writers:
+            for attempt in range(WRITE_RETRIES + 1):
+                try:
+                    writer.write_batch(batch)
+                    break
+                except Exception as e:
+                    self.last_error = f'{type(writer).__name__}: {e}'
+                    if attempt == WRITE_RETRIES:
+                        self.counters['write_errors'] += len(batch)
+                        written = False
+                    else:
+                        time.sleep(0.1 * (attempt + 1))
+        # 只统计所有后端都写入成功的日志
+        if written:
+            self.counters['flushed'] += len(batch)
+        self.counters['batches'] += 1
+        self.counters['last_batch_size'] = len(batch)
+        self.counters['last_flush_ms'] = round((time.perf_counter() - started) * 1000, 3)
+
+    def _run(self):
+        work = self.queue
+        while True:
+            try:
+                first = work.get(timeout=self.flush_interval)
+            except queue.Empty:
+                if self.stopping.is_set():
+                    return
+                continue
+            self._write(self._drain(first))
+
+    def flush(self, timeout=5.0):
+        """在当前线程写出队列中剩余的日志（进程退出时调用）"""
+        if self.pid != os.getpid():
+            return
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                first = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            self._write(self._drain(first))
+
+    def close(self):
+        self.stopping.set()
+        self.flush()
+        for writer in self.writers:
+            try:
+                writer.close()
+            except Exception:
+                pass
+
+    def metrics(self):
+        depth = self.queue.qsize() if self.queue is not None and self.pid == os.getpid() else 0
+        return dict(
+            self.counters,
+            queue_depth=depth,
+            queue_capacity=self.maxsize,
+            queue_utilization=round(depth / self.maxsize, 4) if self.maxsize else 0,
+            overflow_policy=self.overflow,
+            backends=[type(writer).__name__ for writer in self.writers],
+            last_error=self.last_error
+        )
+
+
+audit_sink = AuditLogSink()
+atexit.register(audit_sink.close)
@@ -0,0 +1,262 @@
+"""产品批量导入
+
+支持 JSON 数组、NDJSON 和 CSV 三种输入，按批处理：每批一次 IN 查询检查
+编码重复，一次 executemany 插入，并同步更新仪表盘统计和搜索索引（或把新产品
+写入待索引队列，由后台建立索引）；
+每累计 commit_size 行提交一次。单行错误只记录不会中断整个导入。
+"""
+import csv
+import io
+import json
+import os
+import time
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy.exc import SQLAlchemyError
+from src.models.product import Product
+from src.services.dashboard_stats import PRODUCT_STATUSES, apply_deltas, day_key, version_key
+from src.services.search import index_products, queue_products
+
+REQUIRED_FIELDS = ['product_code', 'product_name', 'product_type', 'manufacturer', 'production_date']
+
+BATCH_SIZE = int(os.getenv('BULK_IMPORT_BATCH_SIZE', 1000))
+COMMIT_SIZE = int(os.getenv('BULK_IMPORT_COMMIT_SIZE', 5000))
+# 报告中最多返回的错误行数
+MAX_REPORTED_ERRORS = 1000
+
+products_table = Product.__table__
+
+
+def iter_json_rows(data):
+    """JSON 数组（或 {"products": [...]}）"""
+    if isinstance(data, dict):
+        data = data.get('products')
+    if not isinstance(data, list):
+        raise ValueError('请求体必须是产品数组')
+    for number, row in enumerate(data, start=1):
+        yield number, row, None
+
+
+def iter_ndjson_rows(stream):
+    """逐行读取 NDJSON 流"""
+    for number, line in enumerate(io.TextIOWrapper(stream, encoding='utf-8'), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield number, json.loads(line), None
+        except ValueError:
+            yield number, None, '无法解析的JSON行'
+
+
+def iter_csv_rows(stream):
+    """逐行读取带表头的 CSV 流，specifications 列为 JSON 字符串"""
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    for number, row in enumerate(reader, start=1):
+        yield number, {key: value for key, value in row.items() if key and value not in (None, '')}, None
+
+
+def _parse_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value).replace('Z', '+00:00')).replace(tzinfo=None)
+
+
+def normalize_row(data, now):
+    """校验并转换一行产品数据，返回可直接插入的字典"""
+    if not isinstance(data, dict):
+        raise ValueError('数据行必须是对象')
+    missing = [field for field in REQUIRED_FIELDS if not data.get(field)]
+    if missing:
+        raise ValueError(f"缺少必要字段: {', '.join(missing)}")
+
+    try:
+        production_date = _parse_datetime(data['production_date'])
+    except ValueError:
+        raise ValueError('production_date 格式错误')
+
+    specifications = data.get('specifications')
+    if isinstance(specifications, str):
+        try:
+            specifications = json.loads(specifications)
+        except ValueError:
+            raise ValueError('specifications 不是合法的JSON')
+
+    warranty_period = data.get('warranty_period')
+    if warranty_period not in (None, ''):
+        try:
+            warranty_period = int(warranty_period)
+        except (TypeError, ValueError):
+            raise ValueError('warranty_period 必须是整数')
+    else:
+        warranty_period = None
+
+    status = data.get('status') or 'produced'
+    if status not in PRODUCT_STATUSES:
+        raise ValueError(f'无效的产品状态: {status}')
+
+    # executemany 要求每行字段一致，因此显式给出全部列
+    return {
+        'product_code': str(data['product_code']),
+        'product_name': str(data['product_name']),
+        'product_type': str(data['product_type']),
+        'manufacturer': str(data['manufacturer']),
+        'production_date': production_date,
+        'specifications': specifications,
+        'warranty_period': warranty_period,
+        'status': status,
+        'created_at': now,
+        'updated_at': now
+    }
+
+
+def _insert_rows(session, rows, index_search, inserted_ids):
+    """插入一批产品并同步统计、搜索索引"""
+    connection = session.connection()
+    connection.execute(products_table.insert(), rows)
+
+    deltas = defaultdict(int)
+    for row in rows:
+        deltas['products.total'] += 1
+        deltas[f"products.status.{row['status']}"] += 1
+        deltas[day_key('products.created', row['created_at'])] += 1
+    deltas[version_key('products')] = 1
+    apply_deltas(connection, deltas)
+
+    # executemany 无法返回自增ID，按编码回查一次
+    by_code = {row['product_code']: row for row in rows}
+    ids = session.query(Product.id, Product.product_code).filter(Product.product_code.in_(list(by_code))).all()
+    if inserted_ids is not None:
+        inserted_ids.extend(product_id for product_id, code in ids)
+    if index_search:
+        index_products(connection, [(product_id, by_code[code]) for product_id, code in ids], replace=False)
+    else:
+        queue_products(connection, [product_id for product_id, code in ids], rows[0]['created_at'])
+
+
+class ImportReport:
+    def __init__(self):
+        self.total = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.failed = 0
+        self.errors = []
+        self.started = time.perf_counter()
+
+    def error(self, number, code, message, duplicate=False):
+        if duplicate:
+            self.duplicates += 1
+        else:
+            self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': number, 'product_code': code, 'error': message})
+
+    def to_dict(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            'total': self.total,
+            'inserted': self.inserted,
+            'duplicates': self.duplicates,
+            'failed': self.failed,
+            'errors': sorted(self.errors, key=lambda error: error['row']),
+            'errors_truncated': self.duplicates + self.failed > len(self.errors),
+            'elapsed_seconds': round(elapsed, 3),
+            'rows_per_second': round(self.inserted / elapsed, 1) if elapsed else None
+        }
+
+
+def _flush_batch(session, batch, report, seen_codes, index_search, inserted_ids):
+    """处理一批已校验的行：IN 查询去重后批量插入"""
+    codes = [row['product_code'] for number, row in batch]
+    existing = {code for code, in session.query(Product.product_code).filter(Product.product_code.in_(codes))}
+
+    rows = []
+    numbers = []
+    # 批内重复的编码暂缓处理：首行写入失败时后续同编码的行仍可写入
+    deferred = []
+    batch_codes = set()
+    for number, row in batch:
+        code = row['product_code']
+        if code in existing or code in seen_codes:
+            report.error(number, code, '产品编码已存在', duplicate=True)
+        elif code in batch_codes:
+            deferred.append((number, row))
+        else:
+            batch_codes.add(code)
+            rows.append(row)
+            numbers.append(number)
+    if not rows:
+        return 0
+
+    try:
+        with session.begin_nested():
+            _insert_rows(session, rows, index_search, inserted_ids)
+        seen_codes.update(batch_codes)
+        inserted = len(rows)
+        pending = []
+    except SQLAlchemyError:
+        # 整批失败时逐行重试，定位出错的行
+        inserted = 0
+        pending = list(zip(numbers, rows))
+
+    # 编码只在所在行写入成功后计入 seen_codes
+    for number, row in sorted(pending + deferred, key=lambda item: item[0]):
+        code = row['product_code']
+        if code in seen_codes:
+            report.error(number, code, '产品编码已存在', duplicate=True)
+            continue
+        try:
+            with session.begin_nested():
+                _insert_rows(session, [row], index_search, inserted_ids)
+            seen_codes.add(code)
+            inserted += 1
+        except SQLAlchemyError as e:
+            report.error(number, code, str(getattr(e, 'orig', e)))
+    return inserted
+
+
+def import_products(session, rows, batch_size=BATCH_SIZE, commit_size=COMMIT_SIZE, index_search=True, inserted_ids=None):
+    """批量导入产品，rows 为 (行号, 数据, 解析错误) 迭代器，返回导入报告
+
+    index_search=False 时不在导入事务内建立搜索索引，新产品在同一事务内写入待索引
+    队列，ID 追加到 inserted_ids，由调用方随后建立索引（索引写入约占同步导入耗时的八成）。
+    """
+    batch_size = max(1, batch_size)
+    report = ImportReport()
+    seen_codes = set()
+    batch = []
+    uncommitted = 0
+    now = datetime.utcnow()
+
+    def flush():
+        nonlocal uncommitted
+        inserted = _flush_batch(session, batch, report, seen_codes, index_search, inserted_ids)
+        report.inserted += inserted
+        uncommitted += inserted
+        batch.clear()
+        if uncommitted >= commit_size:
+            session.commit()
+            uncommitted = 0
+
+    try:
+        for number, data, parse_error in rows:
+            report.total += 1
+            if parse_error:
+                report.error(number, None, parse_error)
+                continue
+            try:
+                row = normalize_row(data, now)
+            except ValueError as e:
+                report.error(number, data.get('product_code') if isinstance(data, dict) else None, str(e))
+                continue
+            batch.append((number, row))
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+    return report.to_dict()
@@ -0,0 +1,196 @@
+"""仪表盘图表
+
+仪表盘通过 chart_data 获取 JSON 数据在浏览器端绘制；报告需要的 PNG/SVG
+图片在独立的进程池中用 Figure + Agg 渲染，不占用请求线程，也不触碰
+pyplot 的全局状态。图片按 (数据, 图表类型, 标题与坐标轴标签, 格式) 的
+sha256 命名缓存在 CHART_CACHE_DIR，相同输入直接返回已有文件。
+缓存命中时刷新文件修改时间；渲染新图片前清理超过 CHART_CACHE_RETENTION_HOURS
+未被使用的图片，并在数量超过 CHART_CACHE_MAX_FILES 时删除最久未使用的部分。
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from src.services.dashboard_stats import PRODUCT_STATUSES, DEVICE_STATUSES, day_key, read_counts, window_days
+from src.utils.utils import generate_chart
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+CACHE_DIR = os.getenv('CHART_CACHE_DIR', os.path.join(PROJECT_ROOT, 'data', 'charts'))
+WORKERS = int(os.getenv('CHART_WORKERS', 2))
+RENDER_TIMEOUT = float(os.getenv('CHART_RENDER_TIMEOUT', 30))
+CACHE_RETENTION_HOURS = float(os.getenv('CHART_CACHE_RETENTION_HOURS', 24))
+CACHE_MAX_FILES = int(os.getenv('CHART_CACHE_MAX_FILES', 1000))
+# 两次清理缓存目录的最小间隔秒数
+PURGE_INTERVAL = 60
+FORMATS = ('png', 'svg')
+CHART_TYPES = ('bar', 'pie', 'line')
+
+_executor = None
+_executor_lock = threading.Lock()
+# 缓存键 -> 进行中的渲染任务，同一图表的并发请求只渲染一次
+_inflight = {}
+_inflight_lock = threading.Lock()
+_last_purge = 0
+
+
+def _product_status(counts, days):
+    return OrderedDict((status, counts.get(f'products.status.{status}', 0)) for status in PRODUCT_STATUSES)
+
+
+def _device_status(counts, days):
+    return OrderedDict((status, counts.get(f'devices.status.{status}', 0)) for status in DEVICE_STATUSES)
+
+
+def _quality_result(counts, days):
+    return OrderedDict([('passed', counts.get('quality.passed', 0)), ('failed', counts.get('quality.failed', 0))])
+
+
+def _daily(prefix):
+    def build(counts, days):
+        return OrderedDict(
+            (day.isoformat(), counts.get(day_key(prefix, day), 0)) for day in reversed(window_days(days))
+        )
+    return build
+
+
+# 图表名 -> (类型, 标题, 横轴标签, 纵轴标签, 数据构建函数)
+CHARTS = {
+    'product_status': ('pie', '产品状态分布', '', '', _product_status),
+    'quality_trend': ('line', '质量检查趋势', '日期', '检查数', _daily('quality.checked')),
+    'product_trend': ('line', '新增产品趋势', '日期', '产品数', _daily('products.created')),
+    'quality_result': ('pie', '质量检查结果', '', '', _quality_result),
+    'device_status': ('bar', '设备状态分布', '状态', '设备数', _device_status),
+}
+
+
+def chart_data(session, name, days=7):
+    """从统计汇总表组装图表数据，供前端绘制或服务端渲染"""
+    if name not in CHARTS:
+        raise ValueError(f"不支持的图表: {name}，可选 {', '.join(CHARTS)}")
+    chart_type, title, x_label, y_label, build = CHARTS[name]
+    data = build(read_counts(session, days), days)
+    return {
+        'chart': name,
+        'type': chart_type,
+        'title': title,
+        'x_label': x_label,
+        'y_label': y_label,
+        'labels': list(data.keys()),
+        'values': list(data.values())
+    }
+
+
+def chart_key(data, chart_type, title='', x_label='', y_label='', fmt='png'):
+    """图表缓存键：输入的规范 JSON（保留数据顺序）的 sha256"""
+    canonical = json.dumps(
+        [list(data.items()), chart_type, title, x_label, y_label, fmt],
+        ensure_ascii=False, separators=(',', ':'), default=str
+    )
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def chart_path(key, fmt):
+    return os.path.join(CACHE_DIR, key[:2], f'{key}.{fmt}')
+
+
+def _render(data, chart_type, path, title, x_label, y_label):
+    """进程池任务：渲染到临时文件后原子替换"""
+    if os.path.exists(path):
+        return path
+    base, ext = os.path.splitext(path)
+    tmp_path = f'{base}.{os.getpid()}.tmp{ext}'
+    generate_chart(data, chart_type, tmp_path, title, x_label, y_label)
+    os.replace(tmp_path, path)
+    return path
+
+
+def purge_cache(retention_hours=CACHE_RETENTION_HOURS, max_files=CACHE_MAX_FILES):
+    """删除超过保留时间未使用的图片，数量仍超过 max_files 时按修改时间删除最旧的"""
+    if not os.path.isdir(CACHE_DIR):
+        return 0
+    files = []
+    for root, dirs, names in os.walk(CACHE_DIR):
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                files.append((os.path.getmtime(path), path))
+            except OSError:
+                pass
+    files.sort()
+    cutoff = time.time() - retention_hours * 3600
+    excess = len(files) - max_files
+    removed = 0
+    for index, (mtime, path) in enumerate(files):
+        if mtime >= cutoff and index >= excess:
+            break
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+def _purge_cache_periodically():
+    global _last_purge
+    now = time.time()
+    with _inflight_lock:
+        if now - _last_purge < PURGE_INTERVAL:
+            return
+        _last_purge = now
+    purge_cache()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=WORKERS)
+        return _executor
+
+
+def shutdown(wait=True):
+    """关闭渲染进程池（测试或进程退出时调用）"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=wait)
+            _executor = None
+
+
+def render_chart(data, chart_type, fmt='png', title='', x_label='', y_label='', timeout=RENDER_TIMEOUT):
+    """返回图表图片路径；已缓存时直接返回，否则提交进程池渲染并等待结果"""
+    if chart_type not in CHART_TYPES:
+        raise ValueError(f"不支持的图表类型: {chart_type}，可选 {', '.join(CHART_TYPES)}")
+    if fmt not in FORMATS:
+        raise ValueError(f"不支持的图片格式: {fmt}，可选 {', '.join(FORMATS)}")
+
+    data = OrderedDict(data)
+    key = chart_key(data, chart_type, title, x_label, y_label, fmt)
+    path = chart_path(key, fmt)
+    try:
+        # 刷新修改时间，常用图表不会被清理
+        os.utime(path)
+        return path
+    except OSError:
+        pass
+
+    _purge_cache_periodically()
+    with _inflight_lock:
+        future = _inflight.get(key)
+        if future is None:
+            future = _get_executor().submit(_render, data, chart_type, path, title, x_label, y_label)
+            _inflight[key] = future
+            future.add_done_callback(lambda done: _inflight.pop(key, None))
+    return future.result(timeout=timeout)
+
+
+def render_named_chart(session, name, days=7, fmt='png'):
+    """渲染仪表盘图表（报告使用），返回 (图表数据, 图片路径)"""
+    chart = chart_data(session, name, days)
+    data = OrderedDict(zip(chart['labels'], chart['values']))
+    path = render_chart(data, chart['type'], fmt, chart['title'], chart['x_label'], chart['y_label'])
+    return chart, path
@@ -0,0 +1,327 @@
+"""仪表盘统计聚合引擎
+
+所有概览、状态分布和合格率数据都汇总在 dashboard_stats 表中，
+产品、质量检查、设备和追踪数据的写入通过会话事件增量更新该表，
+仪表盘读取时只需一次按主键的 IN 查询，耗时与业务表规模无关。
+统计表由迁移初次填充，之后可用 rebuild_dashboard_stats.py 全量校正，读取时不会重建。
+同一张表还保存各业务表的变更计数（version.<表名>），供列表接口生成 ETag。
+
+每个统计项分散在 STAT_SHARDS 行上（stat_key、stat_key#1 ...），每个数据库连接
+固定累加到其中一行，读取时求和；并发写入同一张表的事务不再争用同一行的行锁。
+"""
+import itertools
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import bindparam, event, func, inspect, select
+from sqlalchemy.exc import IntegrityError
+from src.models.dashboard import DashboardStat
+from src.models.product import Product
+from src.models.tracking import TrackingData, QualityCheck
+from src.models.device import Device
+from src.models.supplier import Supplier
+
+PRODUCT_STATUSES = ['produced', 'shipped', 'sold', 'recalled']
+DEVICE_STATUSES = ['active', 'maintenance', 'inactive']
+
+# 列表接口 ETag 使用的各表变更计数，写入事务内递增，全量重建时保留
+VERSIONED_MODELS = (Product, QualityCheck, Device, TrackingData, Supplier)
+VERSION_PREFIX = 'version.'
+
+# 标记统计表已完成全量构建
+BUILT_KEY = 'stats.built'
+
+# 全量重建时回溯的按日统计天数
+REBUILD_DAYS = 90
+
+# 每个统计项的分片行数；全量重建把各分片合并回主行（分片 0）
+STAT_SHARDS = max(1, int(os.getenv('DASHBOARD_STAT_SHARDS', 8)))
+SHARD_SEPARATOR = '#'
+_next_shard = itertools.count()
+
+stats_table = DashboardStat.__table__
+
+
+def day_key(prefix, value):
+    """生成按日统计项的键"""
+    if isinstance(value, datetime):
+        value = value.date()
+    return f'{prefix}:{value.isoformat()}'
+
+
+def window_days(days, today=None):
+    """返回统计窗口内的日期列表（含今天）"""
+    today = today or datetime.utcnow().date()
+    return [today - timedelta(days=offset) for offset in range(days)]
+
+
+def version_key(table_name):
+    """表变更计数的统计项键"""
+    return f'{VERSION_PREFIX}{table_name}'
+
+
+def _product_keys(values):
+    keys = ['products.total', f"products.status.{values['status']}"]
+    if values.get('created_at'):
+        keys.append(day_key('products.created', values['created_at']))
+    return keys
+
+
+def _quality_keys(values):
+    keys = ['quality.total', 'quality.passed' if values['pass_status'] else 'quality.failed']
+    if values.get('check_time'):
+        keys.append(day_key('quality.checked', values['check_time']))
+    return keys
+
+
+def _device_keys(values):
+    return ['devices.total', f"devices.status.{values['status']}"]
+
+
+def _tracking_keys(values):
+    return ['tracking.total']
+
+
+# 模型 -> (参与统计的字段, 统计项键生成函数)
+TRACKED_MODELS = {
+    Product: (('status', 'created_at'), _product_keys),
+    QualityCheck: (('pass_status', 'check_time'), _quality_keys),
+    Device: (('status',), _device_keys),
+    TrackingData: ((), _tracking_keys),
+}
+
+
+def _current_values(obj, attrs):
+    values = {attr: getattr(obj, attr) for attr in attrs}
+    # 新增对象的时间字段在插入时才由默认值填充
+    for attr in ('created_at', 'check_time'):
+        if attr in values and values[attr] is None:
+            values[attr] = datetime.utcnow()
+    return values
+
+
+def _previous_values(obj, attrs):
+    state = inspect(obj)
+    values = {}
+    for attr in attrs:
+        history = state.attrs[attr].history
+        values[attr] = history.deleted[0] if history.deleted else getattr(obj, attr)
+    return values
+
+
+def collect_deltas(session):
+    """根据会话中待提交的新增、修改、删除对象计算统计增量"""
+    deltas = defaultdict(int)
+
+    for obj in session.new:
+        tracked = TRACKED_MODELS.get(type(obj))
+        if tracked:
+            attrs, keys_for = tracked
+            for key in keys_for(_current_values(obj, attrs)):
+                deltas[key] += 1
+
+    for obj in session.deleted:
+        tracked = TRACKED_MODELS.get(type(obj))
+        if tracked:
+            attrs, keys_for = tracked
+            for key in keys_for(_current_values(obj, attrs)):
+                deltas[key] -= 1
+
+    for obj in session.dirty:
+        tracked = TRACKED_MODELS.get(type(obj))
+        if not tracked or not tracked[0]:
+            continue
+        attrs, keys_for = tracked
+        state = inspect(obj)
+        if not any(state.attrs[attr].history.has_changes() for attr in attrs):
+            continue
+        for key in keys_for(_previous_values(obj, attrs)):
+            deltas[key] -= 1
+        for key in keys_for(_current_values(obj, attrs)):
+            deltas[key] += 1
+
+    # 有新增、删除或实际修改的表各递增一次变更计数
+    for obj in session.new | session.deleted | session.dirty:
+        if isinstance(obj, VERSIONED_MODELS) and (obj not in session.dirty or session.is_modified(obj)):
+            deltas[version_key(obj.__tablename__)] = 1
+
+    return {key: delta for key, delta in deltas.items() if delta}
+
+
+def shard_keys(key):
+    """统计项的全部分片行键"""
+    return [key] + [f'{key}{SHARD_SEPARATOR}{shard}' for shard in range(1, STAT_SHARDS)]
+
+
+def _connection_shard(connection):
+    """每个数据库连接轮流分配一个固定分片，同一事务内的增量总落在同一分片"""
+    info = connection.connection.info
+    if 'dashboard_stats_shard' not in info:
+        info['dashboard_stats_shard'] = next(_next_shard) % STAT_SHARDS
+    return info['dashboard_stats_shard']
+
+
+def _read_sharded(session, keys):
+    """读取统计项（各分片求和）{统计项键: 值}"""
+    wanted = [shard_key for key in keys for shard_key in shard_keys(key)]
+    counts = defaultdict(int)
+    rows = session.query(DashboardStat.stat_key, DashboardStat.stat_value).filter(DashboardStat.stat_key.in_(wanted))
+    for stat_key, value in rows:
+        counts[stat_key.split(SHARD_SEPARATOR, 1)[0]] += value
+    return dict(counts)
+
+
+def apply_deltas(connection, deltas):
+    """将统计增量累加到 dashboard_stats 表（当前连接对应的分片行）"""
+    now = datetime.utcnow()
+    shard = _connection_shard(connection)
+    # 固定加锁顺序，避免并发写入时死锁
+    for key in sorted(deltas):
+        delta = deltas[key]
+        key = shard_keys(key)[shard]
+        update = stats_table.update().where(stats_table.c.stat_key == key).values(
+            stat_value=stats_table.c.stat_value + delta, updated_at=now
+        )
+        if connection.execute(update).rowcount:
+            continue
+        try:
+            with connection.begin_nested():
+                connection.execute(stats_table.insert().values(stat_key=key, stat_value=delta, updated_at=now))
+        except IntegrityError:
+            # 并发写入已插入同一统计项，改为累加
+            connection.execute(update)
+
+
+def _after_flush(session, flush_context):
+    deltas = collect_deltas(session)
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+
+def install_stat_listeners(session_factory):
+    """为会话工厂注册统计增量更新事件"""
+    if not event.contains(session_factory, 'after_flush', _after_flush):
+        event.listen(session_factory, 'after_flush', _after_flush)
+
+
+def aggregate_counts(session, days=REBUILD_DAYS):
+    """通过分组查询从业务表计算全部统计项"""
+    counts = defaultdict(int)
+    since = datetime.combine(window_days(days)[-1], datetime.min.time())
+
+    for status, count in session.query(Product.status, func.count(Product.id)).group_by(Product.status):
+        counts['products.total'] += count
+        counts[f'products.status.{status}'] += count
+
+    created_day = func.date(Product.created_at)
+    for day, count in session.query(created_day, func.count(Product.id)).filter(
+        Product.created_at >= since
+    ).group_by(created_day):
+        counts[f'products.created:{day}'] += count
+
+    for passed, count in session.query(QualityCheck.pass_status, func.count(QualityCheck.id)).group_by(QualityCheck.pass_status):
+        counts['quality.total'] += count
+        counts['quality.passed' if passed else 'quality.failed'] += count
+
+    checked_day = func.date(QualityCheck.check_time)
+    for day, count in session.query(checked_day, func.count(QualityCheck.id)).filter(
+        QualityCheck.check_time >= since
+    ).group_by(checked_day):
+        counts[f'quality.checked:{day}'] += count
+
+    for status, count in session.query(Device.status, func.count(Device.id)).group_by(Device.status):
+        counts['devices.total'] += count
+        counts[f'devices.status.{status}'] += count
+
+    counts['tracking.total'] = session.query(func.count(TrackingData.id)).scalar() or 0
+
+    return dict(counts)
+
+
+def rebuild_stats(session, days=REBUILD_DAYS):
+    """全量重建统计表（由调用方提交事务）
+
+    先锁定现有统计行再聚合：并发写入的统计增量会等待本事务提交后再累加到
+    重建后的行上，不会丢失也不会重复。统计项原地更新到主行，分片行和不再出现的统计项删除。
+    """
+    connection = session.connection()
+    existing = {key for key, in connection.execute(
+        select(stats_table.c.stat_key).where(~stats_table.c.stat_key.startswith(VERSION_PREFIX)).with_for_update()
+    )}
+    counts = aggregate_counts(session, days)
+    counts[BUILT_KEY] = 1
+    now = datetime.utcnow()
+
+    stale = existing - set(counts)
+    if stale:
+        connection.execute(stats_table.delete().where(stats_table.c.stat_key.in_(stale)))
+    updates = [{'key': key, 'value': value, 'now': now} for key, value in counts.items() if key in existing]
+    if updates:
+        connection.execute(stats_table.update().where(stats_table.c.stat_key == bindparam('key')).values(
+            stat_value=bindparam('value'), updated_at=bindparam('now')
+        ), updates)
+    inserts = [{'stat_key': key, 'stat_value': value, 'updated_at': now} for key, value in counts.items() if key not in existing]
+    if inserts:
+        connection.execute(stats_table.insert(), inserts)
+    return counts
+
+
+def _stat_keys(days):
+    keys = [BUILT_KEY, 'products.total', 'quality.total', 'quality.passed', 'quality.failed',
+            'devices.total', 'tracking.total']
+    keys += [f'products.status.{status}' for status in PRODUCT_STATUSES]
+    keys += [f'devices.status.{status}' for status in DEVICE_STATUSES]
+    for day in window_days(days):
+        keys.append(day_key('products.created', day))
+        keys.append(day_key('quality.checked', day))
+    return keys
+
+
+def read_counts(session, days=7):
+    """一次查询读取仪表盘所需的全部统计项（各分片求和）
+
+    统计表由迁移填充；尚未填充（缺少 stats.built）时按 0 返回，需运行 rebuild_dashboard_stats.py
+    """
+    return _read_sharded(session, _stat_keys(days))
+
+
+def read_versions(session, table_names):
+    """读取各表变更计数 {表名: 计数}，从未写入过的表不返回"""
+    keys = {version_key(table_name): table_name for table_name in table_names}
+    return {keys[key]: value for key, value in _read_sharded(session, keys).items()}
+
+
+def build_stats(counts, days=7):
+    """将统计项组装为仪表盘接口的返回结构"""
+    get = lambda key: counts.get(key, 0)
+    window = window_days(days)
+
+    total_checks = get('quality.total')
+    passed = get('quality.passed')
+    total_devices = get('devices.total')
+    active_devices = get('devices.status.active')
+    maintenance_devices = get('devices.status.maintenance')
+
+    return {
+        'overview': {
+            'total_products': get('products.total'),
+            'new_products_7d': sum(get(day_key('products.created', day)) for day in window),
+            'total_quality_checks': total_checks,
+            'total_devices': total_devices,
+            'total_tracking': get('tracking.total')
+        },
+        'products': {
+            'by_status': {status: get(f'products.status.{status}') for status in PRODUCT_STATUSES}
+        },
+        'quality': {
+            'passed': passed,
+            'failed': get('quality.failed'),
+            'recent_checks_7d': sum(get(day_key('quality.checked', day)) for day in window),
+            'pass_rate': passed / total_checks * 100 if total_checks > 0 else 0
+        },
+        'devices': {
+            'active': active_devices,
+            'maintenance': maintenance_devices,
+            'inactive': total_devices - active_devices - maintenance_devices
+        }
+    }
@@ -0,0 +1,390 @@
+"""数据流式导出
+
+按数据集只查询导出需要的列，用服务端游标（stream_results + yield_per）
+逐块读取，按 (时间, id) 索引顺序输出，内存占用与导出的总行数无关。
+CSV 直接作为分块 HTTP 响应边查边写；xlsx 需要在结尾写入 ZIP 目录，
+由后台任务用 openpyxl 的 write_only 模式写入 EXPORT_DIR，完成后下载。
+任务状态写在导出文件旁的 JSON 文件中，同一主机的任意工作进程都能查询。
+任务记录执行进程和心跳时间，进程退出（重启、worker 回收）或心跳超时的任务
+在查询时标记为失败，不会一直停留在 running。
+"""
+import csv
+import io
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from src.models.database import SessionLocal
+from src.models.product import Product
+from src.models.tracking import ProductionRecord, QualityCheck, TrackingEvent
+from src.utils.utils import format_datetime, process_alive
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+EXPORT_DIR = os.getenv('EXPORT_DIR', os.path.join(PROJECT_ROOT, 'data', 'exports'))
+# 每次从游标取出的行数，也是 CSV 响应每块包含的行数
+CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 2000))
+WORKERS = int(os.getenv('EXPORT_WORKERS', 2))
+RETENTION_HOURS = float(os.getenv('EXPORT_RETENTION_HOURS', 24))
+FORMATS = ('csv', 'xlsx')
+# 运行中任务的心跳间隔与超时（秒）
+HEARTBEAT_SECONDS = 15
+HEARTBEAT_TIMEOUT = int(os.getenv('EXPORT_HEARTBEAT_TIMEOUT', 300))
+JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+# 数据集：模型、时间列（过滤与排序）、导出列 (表头, 列)
+DATASETS = {
+    'products': {
+        'model': Product,
+        'time_column': Product.created_at,
+        'columns': [
+            ('ID', Product.id),
+            ('产品编码', Product.product_code),
+            ('产品名称', Product.product_name),
+            ('产品类型', Product.product_type),
+            ('制造商', Product.manufacturer),
+            ('生产日期', Product.production_date),
+            ('保修期限(天)', Product.warranty_period),
+            ('状态', Product.status),
+            ('规格参数', Product.specifications),
+            ('创建时间', Product.created_at)
+        ]
+    },
+    'quality_checks': {
+        'model': QualityCheck,
+        'time_column': QualityCheck.check_time,
+        'columns': [
+            ('ID', QualityCheck.id),
+            ('产品ID', QualityCheck.product_id),
+            ('检验员ID', QualityCheck.inspector_id),
+            ('检查时间', QualityCheck.check_time),
+            ('检查类型', QualityCheck.check_type),
+            ('是否合格', QualityCheck.pass_status),
+            ('检查项', QualityCheck.check_items),
+            ('备注', QualityCheck.comments)
+        ]
+    },
+    'production_records': {
+        'model': ProductionRecord,
+        'time_column': ProductionRecord.start_time,
+        'columns': [
+            ('ID', ProductionRecord.id),
+            ('产品ID', ProductionRecord.product_id),
+            ('工序', ProductionRecord.process_step),
+            ('设备ID', ProductionRecord.equipment_id),
+            ('操作员ID', ProductionRecord.operator_id),
+            ('开始时间', ProductionRecord.start_time),
+            ('结束时间', ProductionRecord.end_time),
+            ('状态', ProductionRecord.status),
+            ('生产参数', ProductionRecord.parameters),
+            ('备注', ProductionRecord.notes)
+        ]
+    },
+    'tracking_events': {
+        'model': TrackingEvent,
+        'time_column': TrackingEvent.occurred_at,
+        'columns': [
+            ('ID', TrackingEvent.id),
+            ('产品ID', TrackingEvent.product_id),
+            ('事件类型', TrackingEvent.event_type),
+            ('位置', TrackingEvent.location),
+            ('状态', TrackingEvent.status),
+            ('来源', TrackingEvent.source),
+            ('操作员ID', TrackingEvent.operator_id),
+            ('发生时间', TrackingEvent.occurred_at),
+            ('记录时间', TrackingEvent.recorded_at),
+            ('详情', TrackingEvent.details)
+        ]
+    }
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _parse_time(value, name):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError:
+        raise ValueError(f'{name} 格式错误')
+
+
+def parse_filters(args):
+    """从请求参数解析导出过滤条件：since、until（按数据集时间列）和 product_id"""
+    filters = {
+        'since': _parse_time(args.get('since'), 'since'),
+        'until': _parse_time(args.get('until'), 'until'),
+        'product_id': None
+    }
+    if args.get('product_id') not in (None, ''):
+        try:
+            filters['product_id'] = int(args.get('product_id'))
+        except (TypeError, ValueError):
+            raise ValueError('product_id 必须是整数')
+    return filters
+
+
+def get_dataset(name):
+    dataset = DATASETS.get(name)
+    if dataset is None:
+        raise ValueError(f"不支持的数据集: {name}，可选 {', '.join(DATASETS)}")
+    return dataset
+
+
+def headers(name):
+    return [header for header, column in get_dataset(name)['columns']]
+
+
+def build_query(session, name, filters=None):
+    """只选择导出列，按 (时间列, id) 排序以走对应的复合索引"""
+    dataset = get_dataset(name)
+    model = dataset['model']
+    time_column = dataset['time_column']
+    filters = filters or {}
+
+    query = session.query(*[column for header, column in dataset['columns']])
+    if filters.get('since'):
+        query = query.filter(time_column >= filters['since'])
+    if filters.get('until'):
+        query = query.filter(time_column < filters['until'])
+    if filters.get('product_id') is not None:
+        product_column = model.id if model is Product else model.product_id
+        query = query.filter(product_column == filters['product_id'])
+    return query.order_by(time_column, model.id)
+
+
+def iter_rows(session, name, filters=None, chunk_size=CHUNK_SIZE):
+    """逐行返回导出数据（元组）；MySQL 下使用非缓冲游标，驱动不会一次读入全部结果"""
+    query = build_query(session, name, filters).execution_options(stream_results=True)
+    return query.yield_per(chunk_size)
+
+
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return format_datetime(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def _xlsx_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def write_csv_chunks(rows, columns, chunk_size=CHUNK_SIZE):
+    """把行迭代器编码为 CSV 字节块；开头带 BOM，Excel 打开中文不乱码"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow(columns)
+    count = 0
+    for row in rows:
+        writer.writerow([_csv_value(value) for value in row])
+        count += 1
+        if count % chunk_size == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def write_xlsx(rows, columns, path, sheet_name='Sheet1'):
+    """以 write_only 模式逐行写入 xlsx，先写临时文件再原子替换，返回写入行数"""
+    from openpyxl import Workbook
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=sheet_name)
+    sheet.append(columns)
+    count = 0
+    for row in rows:
+        sheet.append([_xlsx_value(value) for value in row])
+        count += 1
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    workbook.save(tmp_path)
+    os.replace(tmp_path, path)
+    return count
+
+
+def stream_csv(name, filters=None, chunk_size=CHUNK_SIZE):
+    """CSV 响应生成器；请求返回后才开始迭代，因此使用自己的会话，结束时归还连接"""
+    columns = headers(name)
+
+    def generate():
+        session = SessionLocal()
+        try:
+            yield from write_csv_chunks(iter_rows(session, name, filters, chunk_size), columns, chunk_size)
+        finally:
+            session.close()
+
+    return generate()
+
+
+# 后台导出任务
+
+def _job_meta_path(job_id):
+    return os.path.join(EXPORT_DIR, f'{job_id}.json')
+
+
+def job_file_path(job):
+    return os.path.join(EXPORT_DIR, f"{job['id']}.{job['format']}")
+
+
+def _save_job(job):
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    path = _job_meta_path(job['id'])
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(job, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _orphaned(job):
+    """任务所在进程已退出，或运行中的任务心跳超时"""
+    if job['status'] not in ('pending', 'running') or job.get('pid') is None:
+        return False
+    if not process_alive(job['pid']):
+        return True
+    if job['status'] == 'running':
+        heartbeat_at = datetime.fromisoformat(job.get('heartbeat_at') or job['started_at'])
+        return (datetime.utcnow() - heartbeat_at).total_seconds() > HEARTBEAT_TIMEOUT
+    return False
+
+
+def get_job(job_id):
+    """读取任务状态，不存在或编号非法时返回 None；遗留的未完成任务标记为失败"""
+    if not JOB_ID_PATTERN.match(job_id or ''):
+        return None
+    try:
+        with open(_job_meta_path(job_id), encoding='utf-8') as f:
+            job = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if _orphaned(job):
+        job['status'] = 'failed'
+        job['error'] = '导出任务所在进程已退出或长时间无响应，请重新提交'
+        job['finished_at'] = datetime.utcnow().isoformat()
+        _save_job(job)
+    return job
+
+
+def purge_expired_jobs(retention_hours=RETENTION_HOURS):
+    """删除超过保留时间的导出文件和任务状态"""
+    if not os.path.isdir(EXPORT_DIR):
+        return 0
+    cutoff = time.time() - retention_hours * 3600
+    removed = 0
+    for name in os.listdir(EXPORT_DIR):
+        path = os.path.join(EXPORT_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='export')
+        return _executor
+
+
+class _CountingRows:
+    """统计行数，并每隔 HEARTBEAT_SECONDS 秒写一次任务心跳"""
+
+    def __init__(self, rows, job=None):
+        self.rows = rows
+        self.job = job
+        self.count = 0
+
+    def __iter__(self):
+        beat_at = time.monotonic()
+        for row in self.rows:
+            self.count += 1
+            if self.job is not None and not self.count % CHUNK_SIZE and time.monotonic() - beat_at >= HEARTBEAT_SECONDS:
+                beat_at = time.monotonic()
+                self.job['heartbeat_at'] = datetime.utcnow().isoformat()
+                self.job['rows'] = self.count
+                _save_job(self.job)
+            yield row
+
+
+def _run_job(job, filters):
+    job['status'] = 'running'
+    job['pid'] = os.getpid()
+    job['started_at'] = job['heartbeat_at'] = datetime.utcnow().isoformat()
+    _save_job(job)
+
+    session = SessionLocal()
+    path = job_file_path(job)
+    try:
+        counted = _CountingRows(iter_rows(session, job['dataset'], filters), job)
+        columns = headers(job['dataset'])
+        if job['format'] == 'xlsx':
+            job['rows'] = write_xlsx(counted, columns, path, sheet_name=job['dataset'])
+        else:
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                for chunk in write_csv_chunks(counted, columns):
+                    f.write(chunk)
+            os.replace(tmp_path, path)
+            job['rows'] = counted.count
+        job['status'] = 'done'
+        job['size'] = os.path.getsize(path)
+    except Exception as e:
+        job['status'] = 'failed'
+        job['error'] = str(e)
+    finally:
+        session.close()
+    job['finished_at'] = datetime.utcnow().isoformat()
+    _save_job(job)
+
+
+def submit_job(name, export_format, filters=None, user_id=None):
+    """提交后台导出任务，返回任务状态字典"""
+    get_dataset(name)
+    if export_format not in FORMATS:
+        raise ValueError(f"不支持的导出格式: {export_format}，可选 {', '.join(FORMATS)}")
+    purge_expired_jobs()
+
+    filters = filters or {}
+    job = {
+        'id': uuid.uuid4().hex,
+        'dataset': name,
+        'format': export_format,
+        'filters': {key: value.isoformat() if isinstance(value, datetime) else value for key, value in filters.items()},
+        'user_id': user_id,
+        'status': 'pending',
+        'pid': os.getpid(),
+        'heartbeat_at': None,
+        'rows': 0,
+        'size': None,
+        'error': None,
+        'created_at': datetime.utcnow().isoformat(),
+        'started_at': None,
+        'finished_at': None
+    }
+    _save_job(job)
+    _get_executor().submit(_run_job, job, filters)
+    return job
+
+
+def shutdown(wait=True):
+    """关闭后台导出线程池（测试或进程退出时调用）"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=wait)
+            _executor = None
@@ -0,0 +1,98 @@
+"""索引顾问
+
+对各接口实际执行的查询运行 EXPLAIN，找出全表扫描和额外排序。
+ENDPOINT_QUERIES 中的查询需与 src/api 中的过滤、排序保持一致。
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import or_
+from src.models.product import Product
+from src.models.tracking import TrackingData, ProductionRecord, QualityCheck, TrackingEvent, ProductMaterial
+from src.models.supplier import Supplier
+from src.models.device import Device
+
+PAGE_LIMIT = 21
+
+
+def _since():
+    return datetime.utcnow() - timedelta(days=7)
+
+
+# (接口, 查询构造函数)
+ENDPOINT_QUERIES = [
+    ('GET /api/products', lambda s: s.query(Product).order_by(Product.created_at.desc(), Product.id.desc()).limit(PAGE_LIMIT)),
+    ('GET /api/products?status=', lambda s: s.query(Product).filter_by(status='produced').order_by(Product.created_at.desc(), Product.id.desc()).limit(PAGE_LIMIT)),
+    ('GET /api/products?type=', lambda s: s.query(Product).filter_by(product_type='电池').order_by(Product.created_at.desc(), Product.id.desc()).limit(PAGE_LIMIT)),
+    ('GET /api/tracking', lambda s: s.query(TrackingData).order_by(TrackingData.created_at.desc(), TrackingData.id.desc()).limit(PAGE_LIMIT)),
+    ('GET /api/tracking?status=', lambda s: s.query(TrackingData).filter_by(current_status='in_factory').order_by(TrackingData.created_at.desc(), TrackingData.id.desc()).limit(PAGE_LIMIT)),
+    ('POST /api/tracking/qrcode', lambda s: s.query(ProductionRecord).filter_by(product_id=1)),
+    ('GET /api/tracking/<id>/history', lambda s: s.query(TrackingEvent).filter_by(product_id=1).order_by(TrackingEvent.occurred_at.desc(), TrackingEvent.id.desc()).limit(PAGE_LIMIT)),
+    ('GET /api/quality', lambda s: s.query(QualityCheck).order_by(QualityCheck.check_time.desc(), QualityCheck.id.desc()).limit(PAGE_LIMIT)),
+    ('GET /api/quality?product_id=', lambda s: s.query(QualityCheck).filter_by(product_id=1).order_by(QualityCheck.check_time.desc(), QualityCheck.id.desc()).limit(PAGE_LIMIT)),
+    ('GET /api/quality?type=', lambda s: s.query(QualityCheck).filter_by(check_type='final').order_by(QualityCheck.check_time.desc(), QualityCheck.id.desc()).limit(PAGE_LIMIT)),
+    ('GET /api/quality?pass=', lambda s: s.query(QualityCheck).filter_by(pass_status=False).order_by(QualityCheck.check_time.desc(), QualityCheck.id.desc()).limit(PAGE_LIMIT)),
+    ('GET /api/suppliers', lambda s: s.query(Supplier).order_by(Supplier.supplier_name, Supplier.id).limit(PAGE_LIMIT)),
+    ('GET /api/suppliers?status=', lambda s: s.query(Supplier).filter_by(status='active').order_by(Supplier.supplier_name, Supplier.id).limit(PAGE_LIMIT)),
+    ('GET /api/devices', lambda s: s.query(Device).order_by(Device.device_name, Device.id).limit(PAGE_LIMIT)),
+    ('GET /api/devices?status=', lambda s: s.query(Device).filter_by(status='active').order_by(Device.device_name, Device.id).limit(PAGE_LIMIT)),
+    ('GET /api/devices?type=', lambda s: s.query(Device).filter_by(device_type='检测设备').order_by(Device.device_name, Device.id).limit(PAGE_LIMIT)),
+    ('GET /api/devices?location=', lambda s: s.query(Device).filter_by(location='A1').order_by(Device.device_name, Device.id).limit(PAGE_LIMIT)),
+    ('GET /api/dashboard/activities (quality)', lambda s: s.query(QualityCheck).filter(QualityCheck.check_time >= _since()).order_by(QualityCheck.check_time.desc(), QualityCheck.id.desc()).limit(PAGE_LIMIT)),
+    ('GET /api/dashboard/activities (tracking)', lambda s: s.query(TrackingEvent).filter(TrackingEvent.occurred_at >= _since()).order_by(TrackingEvent.occurred_at.desc(), TrackingEvent.id.desc()).limit(PAGE_LIMIT)),
+    ('GET /api/recall/impact?device_id=', lambda s: s.query(ProductionRecord.product_id).filter(ProductionRecord.equipment_id == 1, ProductionRecord.start_time >= _since(), ProductionRecord.start_time < datetime.utcnow())),
+    ('GET /api/recall/impact?device_id= (long-running)', lambda s: s.query(ProductionRecord.product_id).filter(ProductionRecord.equipment_id == 1, or_(ProductionRecord.end_time.is_(None), ProductionRecord.end_time >= _since()), ProductionRecord.start_time < _since())),
+    ('GET /api/recall/impact?supplier_id=', lambda s: s.query(ProductMaterial.product_id).filter(ProductMaterial.supplier_id == 1, ProductMaterial.batch_no == 'B1')),
+    ('GET /api/dashboard/activities (production)', lambda s: s.query(ProductionRecord).filter(ProductionRecord.start_time >= _since()).order_by(ProductionRecord.start_time.desc(), ProductionRecord.id.desc()).limit(PAGE_LIMIT)),
+]
+
+
+def _explain(session, query):
+    """执行 EXPLAIN，返回 (方言名, 执行计划行列表)"""
+    connection = session.connection()
+    dialect = connection.dialect
+    compiled = query.statement.compile(dialect=dialect)
+    if compiled.positional:
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+    else:
+        params = compiled.params
+
+    prefix = 'EXPLAIN QUERY PLAN ' if dialect.name == 'sqlite' else 'EXPLAIN '
+    result = connection.exec_driver_sql(prefix + str(compiled), params)
+    return dialect.name, [dict(row._mapping) for row in result]
+
+
+def _find_issues(dialect_name, plan):
+    """从执行计划中找出全表扫描和额外排序"""
+    issues = []
+    for row in plan:
+        if dialect_name == 'sqlite':
+            detail = row.get('detail', '')
+            if detail.startswith('SCAN') and 'USING' not in detail:
+                issues.append(f'全表扫描: {detail}')
+            elif 'TEMP B-TREE' in detail:
+                issues.append(f'额外排序: {detail}')
+        else:
+            table = row.get('table')
+            if row.get('type') == 'ALL':
+                issues.append(f'全表扫描: {table}（约 {row.get("rows")} 行）')
+            if 'filesort' in (row.get('Extra') or ''):
+                issues.append(f'额外排序: {table}')
+    return issues
+
+
+def _summarize(dialect_name, plan):
+    if dialect_name == 'sqlite':
+        return '; '.join(row.get('detail', '') for row in plan)
+    return '; '.join(f"{row.get('table')}:{row.get('type')}:{row.get('key') or '-'}" for row in plan)
+
+
+def advise(session):
+    """对每个接口查询运行 EXPLAIN，返回诊断报告"""
+    report = []
+    for endpoint, build_query in ENDPOINT_QUERIES:
+        dialect_name, plan = _explain(session, build_query(session))
+        report.append({
+            'endpoint': endpoint,
+            'plan': _summarize(dialect_name, plan),
+            'issues': _find_issues(dialect_name, plan)
+        })
+    return report
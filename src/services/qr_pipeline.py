@@ -0,0 +1,348 @@
+"""二维码图片后台生成
+
+单条追踪记录的二维码直接提交到进程池渲染；批量生成时按批提交，图片写入以内容寻址的存储目录：
+文件名为二维码内容的 sha256，已存在的图片直接跳过。批次进度和文件清单以
+JSON 保存在 BATCH_DIR 中，任一 worker 进程都能查询和下载；打包下载时逐个文件
+流式写出 ZIP，不会把整批图片读入内存，未渲染完的图片在下载时补齐。
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from src.utils.utils import generate_qr_code, process_alive
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+STORE_DIR = os.getenv('QR_STORE_DIR', os.path.join(PROJECT_ROOT, 'data', 'qrcodes'))
+WORKERS = int(os.getenv('QR_WORKERS', max(1, (os.cpu_count() or 2) - 1)))
+# 每个进程池任务渲染的图片数，减少进程间通信次数
+CHUNK_SIZE = int(os.getenv('QR_CHUNK_SIZE', 100))
+MAX_BATCH_SIZE = 10000
+BATCH_DIR = os.getenv('QR_BATCH_DIR', os.path.join(STORE_DIR, '_batches'))
+# 批次状态保留时长（小时）
+BATCH_RETENTION_HOURS = float(os.getenv('QR_BATCH_RETENTION_HOURS', 24))
+BATCH_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+# 两次清理过期批次的最小间隔秒数
+PURGE_INTERVAL = 60
+
+_executor = None
+_executor_lock = threading.Lock()
+_last_purge = 0
+
+logger = logging.getLogger(__name__)
+
+
+def payload_digest(payload):
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def image_path(digest):
+    """按摘要前两位分目录，避免单个目录文件过多"""
+    return os.path.join(STORE_DIR, digest[:2], f'{digest}.png')
+
+
+def render_image(payload, path):
+    """渲染单张二维码，先写临时文件再原子替换，并发渲染同一内容也不会读到半个文件"""
+    if os.path.exists(path):
+        return False
+    tmp_path = f'{path[:-4]}.{os.getpid()}.{threading.get_ident()}.tmp.png'
+    generate_qr_code(payload, tmp_path)
+    os.replace(tmp_path, path)
+    return True
+
+
+def _render_chunk(jobs):
+    """进程池任务：渲染一组 (payload, path)，返回 (渲染数, 跳过数, 失败列表)"""
+    rendered = skipped = 0
+    failures = []
+    for payload, path in jobs:
+        try:
+            if render_image(payload, path):
+                rendered += 1
+            else:
+                skipped += 1
+        except Exception as e:
+            failures.append(str(e))
+    return rendered, skipped, failures
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=WORKERS)
+        return _executor
+
+
+def shutdown(wait=True):
+    """关闭进程池（测试或进程退出时调用）"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=wait)
+            _executor = None
+
+
+class QRBatch:
+    def __init__(self, entries):
+        self.id = uuid.uuid4().hex
+        # [(归档文件名, 摘要, 二维码内容)]
+        self.entries = entries
+        self.total = len(entries)
+        self.rendered = 0
+        self.skipped = 0
+        self.failed = 0
+        self.errors = []
+        self.pending_chunks = 0
+        self.created_at = datetime.utcnow()
+        self.finished_at = None
+        self.lock = threading.Lock()
+
+    @property
+    def status(self):
+        if self.pending_chunks:
+            return 'running'
+        return 'failed' if self.failed else 'done'
+
+    def _chunk_done(self, future):
+        with self.lock:
+            try:
+                rendered, skipped, failures = future.result()
+            except Exception as e:
+                rendered, skipped, failures = 0, 0, [str(e)] * future.size
+            self.rendered += rendered
+            self.skipped += skipped
+            self.failed += len(failures)
+            self.errors.extend(failures[:max(0, 10 - len(self.errors))])
+            self.pending_chunks -= 1
+            if not self.pending_chunks:
+                self.finished_at = datetime.utcnow()
+        self.save()
+
+    def to_dict(self):
+        with self.lock:
+            return self._state()
+
+    def _state(self):
+        return {
+            'batch_id': self.id,
+            'status': self.status,
+            'total': self.total,
+            'rendered': self.rendered,
+            'skipped': self.skipped,
+            'failed': self.failed,
+            'errors': list(self.errors),
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+    def save(self):
+        """写入批次状态，记录所在进程以便识别进程退出后中断的批次"""
+        with self.lock:
+            _write_json(_state_path(self.id), {**self._state(), 'pid': os.getpid()})
+
+
+def _state_path(batch_id):
+    return os.path.join(BATCH_DIR, f'{batch_id}.json')
+
+
+def _entries_path(batch_id):
+    return os.path.join(BATCH_DIR, f'{batch_id}.entries.json')
+
+
+def _write_json(path, data):
+    os.makedirs(BATCH_DIR, exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _read_json(batch_id, path):
+    if not BATCH_ID_PATTERN.match(batch_id or ''):
+        return None
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def purge_expired_batches(retention_hours=BATCH_RETENTION_HOURS):
+    """删除超过保留时间的批次状态和文件清单（图片按内容寻址共享，不删除）"""
+    if not os.path.isdir(BATCH_DIR):
+        return 0
+    cutoff = time.time() - retention_hours * 3600
+    removed = 0
+    for name in os.listdir(BATCH_DIR):
+        path = os.path.join(BATCH_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+def _purge_batches_periodically():
+    global _last_purge
+    now = time.time()
+    with _executor_lock:
+        if now - _last_purge < PURGE_INTERVAL:
+            return
+        _last_purge = now
+    purge_expired_batches()
+
+
+def _image_done(future):
+    try:
+        rendered, skipped, failures = future.result()
+    except Exception as e:
+        failures = [str(e)]
+    for failure in failures:
+        logger.error('二维码渲染失败: %s', failure)
+
+
+def submit_image(payload):
+    """提交单张二维码渲染（不记录批次），返回图片路径；图片已存在时不提交"""
+    path = image_path(payload_digest(payload))
+    if os.path.exists(path):
+        return path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _get_executor().submit(_render_chunk, [(payload, path)]).add_done_callback(_image_done)
+    return path
+
+
+def submit_batch(items):
+    """提交一批二维码渲染，items 为 [(归档文件名, 二维码内容)]，返回批次对象"""
+    if len(items) > MAX_BATCH_SIZE:
+        raise ValueError(f'单个批次最多 {MAX_BATCH_SIZE} 个二维码')
+    _purge_batches_periodically()
+
+    entries = [(name, payload_digest(payload), payload) for name, payload in items]
+    batch = QRBatch(entries)
+
+    jobs = []
+    queued = set()
+    for name, digest, payload in entries:
+        path = image_path(digest)
+        if digest in queued or os.path.exists(path):
+            batch.skipped += 1
+            continue
+        queued.add(digest)
+        jobs.append((payload, path))
+
+    for digest in queued:
+        os.makedirs(os.path.dirname(image_path(digest)), exist_ok=True)
+
+    _write_json(_entries_path(batch.id), entries)
+    if not jobs:
+        batch.finished_at = datetime.utcnow()
+        batch.save()
+        return batch
+
+    executor = _get_executor()
+    chunks = [jobs[start:start + CHUNK_SIZE] for start in range(0, len(jobs), CHUNK_SIZE)]
+    batch.pending_chunks = len(chunks)
+    batch.save()
+    for chunk in chunks:
+        future = executor.submit(_render_chunk, chunk)
+        future.size = len(chunk)
+        future.add_done_callback(batch._chunk_done)
+    return batch
+
+
+def get_batch(batch_id):
+    """读取批次状态，不存在、已过期或编号非法时返回 None
+
+    提交批次的进程已退出（重启或 worker 回收）而渲染未完成时状态为 interrupted，
+    下载时会同步补齐未渲染的图片
+    """
+    state = _read_json(batch_id, _state_path(batch_id))
+    if state is None:
+        return None
+    pid = state.pop('pid', None)
+    if state['status'] == 'running' and pid is not None and not process_alive(pid):
+        state['status'] = 'interrupted'
+    return state
+
+
+def batch_entries(batch_id):
+    """批次的文件清单 [(归档文件名, 摘要, 二维码内容)]，不存在时返回 None"""
+    entries = _read_json(batch_id, _entries_path(batch_id))
+    return [tuple(entry) for entry in entries] if entries is not None else None
+
+
+def tracking_items(session, tracking_ids):
+    """按追踪记录ID读取 (归档文件名, 二维码内容)，文件名使用产品编码"""
+    from src.models.product import Product
+    from src.models.tracking import TrackingData
+
+    items = []
+    tracking_ids = sorted(set(tracking_ids))
+    for start in range(0, len(tracking_ids), 1000):
+        chunk = tracking_ids[start:start + 1000]
+        rows = session.query(TrackingData.id, TrackingData.qr_code, Product.product_code).outerjoin(
+            Product, Product.id == TrackingData.product_id
+        ).filter(TrackingData.id.in_(chunk)).order_by(TrackingData.id)
+        for tracking_id, qr_code, product_code in rows:
+            if qr_code:
+                items.append((f'{product_code or tracking_id}.png', qr_code))
+    return items
+
+
+class _StreamBuffer:
+    """zipfile 的只写输出：不支持 seek，写入的数据由生成器取走后清空"""
+
+    def __init__(self):
+        self.chunks = []
+        self.offset = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_zip(entries):
+    """逐个文件生成 ZIP 数据块；尚未渲染的图片在此同步补齐"""
+    buffer = _StreamBuffer()
+    names = set()
+    # PNG 已经压缩，直接存储即可
+    with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_STORED) as archive:
+        for name, digest, payload in entries:
+            if name in names:
+                name = f'{digest[:12]}_{name}'
+            names.add(name)
+
+            path = image_path(digest)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                render_image(payload, path)
+
+            with archive.open(name, mode='w') as target, open(path, 'rb') as source:
+                while True:
+                    block = source.read(64 * 1024)
+                    if not block:
+                        break
+                    target.write(block)
+            yield buffer.drain()
+    yield buffer.drain()
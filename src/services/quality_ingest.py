@@ -0,0 +1,184 @@
+"""质量检查批量录入
+
+面向自动检测工位：一次请求提交多条检查结果，产品存在性和幂等键
+各用一次 IN 查询校验，检查记录按块由 ORM 写入并取回各行主键，按块提交，
+统计增量由会话事件累加。每条结果可带
+idempotency_key（或由请求头 Idempotency-Key 加序号派生），工位重试时
+已写入的条目直接返回原记录ID，不会重复创建。过期幂等键在每次录入时顺带
+分批清理。
+"""
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from src.models.idempotency import IdempotencyKey
+from src.models.product import Product
+from src.models.tracking import QualityCheck
+
+SCOPE = 'quality_check'
+CHUNK_SIZE = int(os.getenv('QUALITY_INGEST_CHUNK_SIZE', 500))
+MAX_BATCH_SIZE = 5000
+# 幂等键最大长度（与 idempotency_keys.key 列一致）
+MAX_KEY_LENGTH = 128
+# IN 查询每次最多携带的参数数
+LOOKUP_CHUNK = 1000
+# 幂等键保留天数
+KEY_RETENTION_DAYS = int(os.getenv('IDEMPOTENCY_KEY_RETENTION_DAYS', 7))
+# 每次录入顺带清理的过期幂等键上限，避免单次删除过多行
+PURGE_LIMIT = 1000
+
+keys_table = IdempotencyKey.__table__
+
+REQUIRED_FIELDS = ['product_id', 'check_type', 'check_items', 'pass_status']
+
+
+def _chunks(values, size):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _validate(item):
+    if not isinstance(item, dict):
+        raise ValueError('检查记录必须是对象')
+    missing = [field for field in REQUIRED_FIELDS if field not in item]
+    if missing:
+        raise ValueError(f"缺少必要字段: {', '.join(missing)}")
+    if not isinstance(item['pass_status'], bool):
+        raise ValueError('pass_status 必须是布尔值')
+    check_time = item.get('check_time')
+    if check_time:
+        try:
+            check_time = datetime.fromisoformat(str(check_time).replace('Z', '+00:00')).replace(tzinfo=None)
+        except ValueError:
+            raise ValueError('check_time 格式错误')
+    try:
+        product_id = int(item['product_id'])
+    except (TypeError, ValueError):
+        raise ValueError('product_id 必须是整数')
+    return {
+        'product_id': product_id,
+        'check_type': item['check_type'],
+        'check_items': item['check_items'],
+        'pass_status': item['pass_status'],
+        'comments': item.get('comments'),
+        'images': item.get('images'),
+        'check_time': check_time or None
+    }
+
+
+def _existing_keys(session, keys):
+    found = {}
+    for chunk in _chunks(list(keys), LOOKUP_CHUNK):
+        for key, resource_id in session.query(IdempotencyKey.key, IdempotencyKey.resource_id).filter(
+            IdempotencyKey.scope == SCOPE, IdempotencyKey.key.in_(chunk)
+        ):
+            found[key] = resource_id
+    return found
+
+
+def _existing_products(session, product_ids):
+    found = set()
+    for chunk in _chunks(sorted(product_ids), LOOKUP_CHUNK):
+        found.update(product_id for product_id, in session.query(Product.id).filter(Product.id.in_(chunk)))
+    return found
+
+
+def _write_chunk(session, entries, inspector_id, now):
+    """写入一块检查记录及其幂等键，返回 [(序号, 记录ID)]
+
+    逐行取回数据库分配的主键：并发插入时一条多行 INSERT 的自增ID不保证连续，
+    不能由 lastrowid 推算
+    """
+    checks = [QualityCheck(**{
+        **values,
+        'inspector_id': inspector_id,
+        'check_time': values['check_time'] or now
+    }) for index, key, values in entries]
+    session.add_all(checks)
+    session.flush()
+
+    keyed = [
+        {'scope': SCOPE, 'key': key, 'resource_id': check.id, 'created_at': now}
+        for (index, key, values), check in zip(entries, checks) if key
+    ]
+    if keyed:
+        session.execute(keys_table.insert(), keyed)
+    return [(index, check.id) for (index, key, values), check in zip(entries, checks)]
+
+
+def ingest_quality_checks(session, items, inspector_id, batch_key=None, chunk_size=CHUNK_SIZE):
+    """批量写入质量检查记录，返回与输入顺序一致的逐条结果"""
+    if len(items) > MAX_BATCH_SIZE:
+        raise ValueError(f'单次最多提交 {MAX_BATCH_SIZE} 条检查记录')
+
+    # 顺带清理过期幂等键（与导出任务提交时清理过期文件相同）
+    if purge_idempotency_keys(session):
+        session.commit()
+
+    results = [None] * len(items)
+    pending = []
+    for index, item in enumerate(items):
+        key = item.get('idempotency_key') if isinstance(item, dict) else None
+        if not key and batch_key:
+            key = f'{batch_key}:{index}'
+        try:
+            if key and len(str(key)) > MAX_KEY_LENGTH:
+                raise ValueError(f'幂等键长度不能超过 {MAX_KEY_LENGTH} 个字符')
+            pending.append((index, str(key) if key else None, _validate(item)))
+        except ValueError as e:
+            results[index] = {'index': index, 'status': 'error', 'error': str(e)}
+
+    # 已处理过的幂等键直接返回原记录
+    existing = _existing_keys(session, {key for index, key, values in pending if key})
+    products = _existing_products(session, {values['product_id'] for index, key, values in pending})
+
+    entries = []
+    seen_keys = set()
+    for index, key, values in pending:
+        if key in existing:
+            results[index] = {'index': index, 'status': 'duplicate', 'id': existing[key]}
+        elif key and key in seen_keys:
+            results[index] = {'index': index, 'status': 'error', 'error': '同一批次中幂等键重复'}
+        elif values['product_id'] not in products:
+            results[index] = {'index': index, 'status': 'error', 'error': '产品不存在'}
+        else:
+            if key:
+                seen_keys.add(key)
+            entries.append((index, key, values))
+
+    now = datetime.utcnow()
+    for chunk in _chunks(entries, max(1, chunk_size)):
+        try:
+            written = _write_chunk(session, chunk, inspector_id, now)
+            session.commit()
+        except IntegrityError:
+            # 并发重试已写入同一幂等键：回滚本块后逐条处理
+            session.rollback()
+            written = []
+            for entry in chunk:
+                index, key, values = entry
+                duplicate = _existing_keys(session, [key]) if key else {}
+                if key in duplicate:
+                    results[index] = {'index': index, 'status': 'duplicate', 'id': duplicate[key]}
+                    continue
+                try:
+                    written.extend(_write_chunk(session, [entry], inspector_id, now))
+                    session.commit()
+                except IntegrityError as e:
+                    session.rollback()
+                    results[index] = {'index': index, 'status': 'error', 'error': str(e.orig)}
+        for index, check_id in written:
+            results[index] = {'index': index, 'status': 'created', 'id': check_id}
+
+    return results
+
+
+def purge_idempotency_keys(session, days=KEY_RETENTION_DAYS, limit=PURGE_LIMIT):
+    """清理最多 limit 个过期的幂等键（由调用方提交事务），返回删除数"""
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    expired = [key_id for key_id, in session.query(IdempotencyKey.id).filter(
+        IdempotencyKey.created_at < cutoff
+    ).order_by(IdempotencyKey.created_at).limit(limit)]
+    if not expired:
+        return 0
+    return session.execute(keys_table.delete().where(keys_table.c.id.in_(expired))).rowcount
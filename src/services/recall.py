@@ -0,0 +1,246 @@
+"""召回影响分析
+
+正向：给定设备和时间段，或供应商（可限定批次、物料），找出受影响的产品；
+反向：给定问题产品，取它经过的设备工序时间段和使用的物料批次，再正向展开。
+设备维度依赖 production_records 上的 (equipment_id, start_time, end_time, product_id)
+覆盖索引，供应商维度依赖 product_materials 上的 (supplier_id, batch_no, product_id)
+覆盖索引，这两个索引就是预先建好的设备/供应商 -> 产品邻接表，查询只做索引范围扫描。
+工序与时间段相交分两次索引范围扫描：开始时间不早于 since - MAX_PROCESS_HOURS
+的工序走 (equipment_id, start_time) 索引；更早开始但尚未结束或结束于 since 之后的
+（进行中或超长工序）走 (equipment_id, end_time) 索引，两者合并，不会漏掉记录。
+
+影响范围以产品ID子查询表示，可直接用于分页、导出和批量召回，不在内存中展开；
+批量召回按 ID 顺序分块加锁流转，必须全部成功，否则整体回滚。
+"""
+import os
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import func, or_, select, union_all
+from src.models.database import SessionLocal
+from src.models.product import Product
+from src.models.supplier import Supplier
+from src.models.tracking import ProductionRecord, ProductMaterial
+from src.services import transitions
+from src.services.export import DATASETS, write_csv_chunks, CHUNK_SIZE
+
+# 单道工序的通常最长持续时间，用于划分设备时间段查询的两次索引扫描
+MAX_PROCESS_HOURS = float(os.getenv('RECALL_MAX_PROCESS_HOURS', 24))
+# 反向分析时单个产品最多展开的来源（工序时间段 + 物料批次）数
+MAX_SOURCES = 200
+RECALLED = 'recalled'
+# 批量召回每次锁定并流转的产品数，冲突行的重试次数
+RECALL_CHUNK = 1000
+CONFLICT_RETRIES = 3
+
+records_table = ProductionRecord.__table__
+materials_table = ProductMaterial.__table__
+
+
+def _parse_time(value, name):
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError:
+        raise ValueError(f'{name} 格式错误')
+
+
+def _parse_int(value, name):
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} 必须是整数')
+
+
+def parse_criteria(args):
+    """解析影响分析条件：device_id + since/until、supplier_id/batch_no/material、product_id + window_hours"""
+    criteria = {
+        'device_id': _parse_int(args.get('device_id'), 'device_id'),
+        'since': _parse_time(args.get('since'), 'since'),
+        'until': _parse_time(args.get('until'), 'until'),
+        'supplier_id': _parse_int(args.get('supplier_id'), 'supplier_id'),
+        'batch_no': args.get('batch_no') or None,
+        'material': args.get('material') or None,
+        'product_id': _parse_int(args.get('product_id'), 'product_id'),
+        'window_hours': float(args.get('window_hours') or 0)
+    }
+    if not any(criteria[key] is not None for key in ('device_id', 'supplier_id', 'material', 'product_id')):
+        raise ValueError('需要指定 device_id、supplier_id、material 或 product_id')
+    if criteria['device_id'] is not None and not (criteria['since'] and criteria['until']):
+        raise ValueError('按设备分析时需要指定 since 和 until')
+    if criteria['since'] and criteria['until'] and criteria['since'] >= criteria['until']:
+        raise ValueError('since 必须早于 until')
+    return criteria
+
+
+def device_products(device_id, since, until):
+    """在 [since, until) 内使用过设备的产品ID子查询（工序时间段与之相交）
+
+    开始时间在 since - MAX_PROCESS_HOURS 之后的按开始时间扫描；更早开始的只可能是
+    进行中或超长的工序，按结束时间（为空或不早于 since）扫描
+    """
+    cutoff = since - timedelta(hours=MAX_PROCESS_HOURS)
+    intersects = or_(records_table.c.end_time.is_(None), records_table.c.end_time >= since)
+    recent = select(records_table.c.product_id).where(
+        records_table.c.equipment_id == device_id,
+        records_table.c.start_time >= cutoff,
+        records_table.c.start_time < until,
+        intersects
+    )
+    long_running = select(records_table.c.product_id).where(
+        records_table.c.equipment_id == device_id,
+        intersects,
+        records_table.c.start_time < cutoff
+    )
+    return union_all(recent, long_running)
+
+
+def suppliers_of_material(session, material):
+    """供应材料列表（supply_materials）中包含该物料的供应商ID"""
+    suppliers = session.query(Supplier.id, Supplier.supply_materials).filter(Supplier.supply_materials.isnot(None))
+    return sorted(supplier_id for supplier_id, materials in suppliers if material in (materials or []))
+
+
+def supplier_products(supplier_ids, batch_no=None, material=None):
+    """使用了指定供应商（批次、物料）物料的产品ID子查询"""
+    query = select(materials_table.c.product_id).where(materials_table.c.supplier_id.in_(supplier_ids))
+    if batch_no:
+        query = query.where(materials_table.c.batch_no == batch_no)
+    if material:
+        query = query.where(materials_table.c.material == material)
+    return query
+
+
+def product_sources(session, product_id, window_hours=0):
+    """反向分析：问题产品经过的设备时间段（前后各扩展 window_hours）和使用的物料批次
+
+    返回 (device_windows, batches)，device_windows 为 (device_id, since, until) 列表，
+    batches 为 (supplier_id, batch_no, material) 列表
+    """
+    window = timedelta(hours=window_hours)
+    # 尚未结束的工序持续到当前时间
+    now = datetime.utcnow()
+    device_windows = [
+        (equipment_id, start_time - window, (end_time or max(start_time, now)) + window)
+        for equipment_id, start_time, end_time in session.query(
+            ProductionRecord.equipment_id, ProductionRecord.start_time, ProductionRecord.end_time
+        ).filter(ProductionRecord.product_id == product_id, ProductionRecord.equipment_id.isnot(None))
+    ]
+    batches = [tuple(row) for row in session.query(
+        ProductMaterial.supplier_id, ProductMaterial.batch_no, ProductMaterial.material
+    ).filter(ProductMaterial.product_id == product_id).distinct()]
+    if len(device_windows) + len(batches) > MAX_SOURCES:
+        raise ValueError(f'产品的来源超过 {MAX_SOURCES} 个，请按设备或供应商分别分析')
+    return device_windows, batches
+
+
+def describe_sources(device_windows, batches):
+    """反向分析来源的 JSON 表示"""
+    return {
+        'devices': [{'device_id': device_id, 'since': since.isoformat(), 'until': until.isoformat()}
+                    for device_id, since, until in device_windows],
+        'materials': [{'supplier_id': supplier_id, 'batch_no': batch_no, 'material': material}
+                      for supplier_id, batch_no, material in batches]
+    }
+
+
+def impact_condition(session, criteria):
+    """把分析条件转换为 Product.id 上的过滤条件"""
+    subqueries = []
+    if criteria.get('device_id') is not None:
+        subqueries.append(device_products(criteria['device_id'], criteria['since'], criteria['until']))
+
+    if criteria.get('supplier_id') is not None:
+        subqueries.append(supplier_products([criteria['supplier_id']], criteria.get('batch_no'), criteria.get('material')))
+    elif criteria.get('material'):
+        supplier_ids = suppliers_of_material(session, criteria['material'])
+        subqueries.append(supplier_products(supplier_ids, criteria.get('batch_no'), criteria['material']))
+
+    if criteria.get('product_id') is not None:
+        device_windows, batches = product_sources(session, criteria['product_id'], criteria.get('window_hours') or 0)
+        for device_id, since, until in device_windows:
+            subqueries.append(device_products(device_id, since, until))
+        for supplier_id, batch_no, material in batches:
+            subqueries.append(supplier_products([supplier_id], batch_no, material))
+
+    if not subqueries:
+        return Product.id.in_([])
+    return or_(*[Product.id.in_(subquery) for subquery in subqueries])
+
+
+def impact_query(session, criteria, *entities):
+    """受影响产品查询（默认返回 Product 对象）"""
+    return session.query(*(entities or (Product,))).filter(impact_condition(session, criteria))
+
+
+def impact_summary(session, criteria):
+    """受影响产品按状态统计"""
+    counts = dict(impact_query(session, criteria, Product.status, func.count(Product.id)).group_by(Product.status))
+    return {'total': sum(counts.values()), 'by_status': counts}
+
+
+def stream_impact_csv(criteria, chunk_size=CHUNK_SIZE):
+    """受影响产品 CSV 生成器（使用自己的会话，服务端游标逐块读取）"""
+    columns = DATASETS['products']['columns']
+
+    def generate():
+        session = SessionLocal()
+        try:
+            rows = impact_query(session, criteria, *[column for header, column in columns]).order_by(Product.id)
+            yield from write_csv_chunks(
+                rows.execution_options(stream_results=True).yield_per(chunk_size),
+                [header for header, column in columns], chunk_size
+            )
+        finally:
+            session.close()
+
+    return generate()
+
+
+class RecallIncomplete(Exception):
+    """重试后仍有产品因并发修改未能召回，事务应回滚"""
+
+    def __init__(self, conflicts):
+        super().__init__(f'{len(conflicts)} 个产品未能召回')
+        self.conflicts = conflicts
+
+
+def recall_products(session, criteria, operator_id=None):
+    """把受影响且尚未召回的产品全部流转为 recalled（由调用方提交事务），返回统计
+
+    按 ID 顺序每次锁定 RECALL_CHUNK 行再流转，内存占用与影响范围大小无关；
+    冲突的行重试 CONFLICT_RETRIES 次，仍有冲突时抛出 RecallIncomplete；
+    状态不能流转为 recalled 的产品不会因重试而改变，作为 skipped 返回，不影响其余产品召回
+    """
+    condition = impact_condition(session, criteria)
+    previous = Counter()
+    recalled = 0
+    conflicts, invalid = [], []
+    last_id = 0
+    while True:
+        ids = [product_id for product_id, in session.query(Product.id).filter(
+            condition, Product.status != RECALLED, Product.id > last_id
+        ).order_by(Product.id).limit(RECALL_CHUNK)]
+        if not ids:
+            break
+        last_id = ids[-1]
+        for attempt in range(CONFLICT_RETRIES + 1):
+            result = transitions.transition(
+                session, RECALLED, Product.id.in_(ids),
+                operator_id=operator_id, source='recall', max_rows=None, lock=True
+            )
+            recalled += len(result['updated'])
+            previous.update(result['previous_status'])
+            invalid.extend(result['invalid'])
+            ids = result['conflicts']
+            if not ids:
+                break
+        conflicts.extend(ids)
+
+    if conflicts:
+        raise RecallIncomplete(conflicts)
+    return {'recalled': recalled, 'previous_status': dict(previous), 'skipped': invalid}
@@ -0,0 +1,265 @@
+"""二维码扫描结果缓存
+
+仓库现场同一批二维码会被反复扫描。扫描结果（追踪数据、产品、生产记录）
+序列化后按二维码内容的摘要缓存在进程内 LRU 中，配置 SCAN_CACHE_REDIS_URL
+时再加一层 Redis 共享缓存。追踪数据、产品或生产记录写入提交后，按产品ID
+清除对应条目；其他进程的进程内缓存最多延迟 SCAN_CACHE_TTL 秒失效。
+
+每次清除递增一个失效序号并记在产品上。读取未命中时先取得当前序号，从数据库
+加载完写入缓存前，若该产品在此之后被清除过（加载的可能是提交前的旧数据），
+则不写入缓存。Redis 中的序号检查和写入在一个 Lua 脚本内原子完成。
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from sqlalchemy import event
+from src.models.product import Product
+from src.models.tracking import TrackingData, ProductionRecord
+from src.utils.cache import TTLCache
+from src.utils.qr_payload import product_id_from_payload
+
+LOCAL_TTL = int(os.getenv('SCAN_CACHE_TTL', 30))
+LOCAL_SIZE = int(os.getenv('SCAN_CACHE_SIZE', 50000))
+REDIS_URL = os.getenv('SCAN_CACHE_REDIS_URL')
+REDIS_TTL = int(os.getenv('SCAN_CACHE_REDIS_TTL', 300))
+REDIS_PREFIX = 'scan:v1:'
+REDIS_SEQ_KEY = REDIS_PREFIX + 'seq'
+# Redis 不可用时同类错误日志的最小间隔（秒）
+ERROR_LOG_INTERVAL = 60
+
+logger = logging.getLogger(__name__)
+
+# 缓存键 -> 扫描结果
+_local = TTLCache(maxsize=LOCAL_SIZE, ttl=LOCAL_TTL)
+# 产品ID -> 该产品的缓存键集合，用于按产品失效
+_product_keys = TTLCache(maxsize=LOCAL_SIZE, ttl=LOCAL_TTL)
+_product_keys_lock = threading.Lock()
+# 进程内失效序号；产品ID -> 最近一次清除时的序号
+_seq = 0
+_invalidated = TTLCache(maxsize=LOCAL_SIZE, ttl=LOCAL_TTL)
+# 操作 -> (上次记录日志的时间, 之后被抑制的次数)
+_error_log = {}
+_error_log_lock = threading.Lock()
+
+# 产品在读取之后被清除过时不写入：KEYS = [结果键, 产品键集合, 产品失效序号键]，
+# ARGV = [读取时的失效序号, 结果JSON, 有效期, 结果键摘要]
+_PUT_SCRIPT = """
+if tonumber(redis.call('GET', KEYS[3]) or '0') > tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+redis.call('SADD', KEYS[2], ARGV[4])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+return 1
+"""
+
+_redis = None
+_redis_lock = threading.Lock()
+
+
+def _get_redis():
+    """按需连接 Redis，未配置时返回 None"""
+    global _redis
+    if not REDIS_URL:
+        return None
+    with _redis_lock:
+        if _redis is None:
+            import redis
+            _redis = redis.Redis.from_url(REDIS_URL, socket_timeout=0.2, socket_connect_timeout=0.2)
+        return _redis
+
+
+def _log_redis_error(action, error):
+    """记录 Redis 错误，同一操作每 ERROR_LOG_INTERVAL 秒最多一条，避免故障时每个请求都写日志"""
+    now = time.monotonic()
+    with _error_log_lock:
+        logged_at, suppressed = _error_log.get(action, (None, 0))
+        if logged_at is not None and now - logged_at < ERROR_LOG_INTERVAL:
+            _error_log[action] = (logged_at, suppressed + 1)
+            return
+        _error_log[action] = (now, 0)
+    logger.warning('扫描缓存%sRedis失败: %s（此前 %d 次同类错误未记录）', action, error, suppressed)
+
+
+def cache_key(qr_code):
+    return hashlib.sha256(qr_code.encode('utf-8')).hexdigest()
+
+
+def _remember(product_id, key):
+    with _product_keys_lock:
+        keys = _product_keys.get(product_id, frozenset())
+        if key not in keys:
+            _product_keys.set(product_id, keys | {key})
+
+
+def _lookup(qr_code):
+    """读取缓存，返回 (扫描结果或 None, 读取时的失效序号)
+
+    失效序号为 (进程内序号, Redis 序号)，Redis 未配置或不可用时后者为 None
+    """
+    key = cache_key(qr_code)
+    local_seq = _seq
+    result = _local.get(key)
+    if result is not None:
+        return result, (local_seq, None)
+
+    client = _get_redis()
+    if client is None:
+        return None, (local_seq, None)
+    try:
+        data, redis_seq = client.mget(REDIS_PREFIX + key, REDIS_SEQ_KEY)
+    except Exception as e:
+        _log_redis_error('读取', e)
+        return None, (local_seq, None)
+    redis_seq = int(redis_seq or 0)
+    if data is None:
+        return None, (local_seq, redis_seq)
+    result = json.loads(data)
+    _put_local(key, result, local_seq)
+    return result, (local_seq, redis_seq)
+
+
+def get(qr_code):
+    """读取缓存的扫描结果，未命中返回 None"""
+    return _lookup(qr_code)[0]
+
+
+def _put_local(key, result, seq):
+    product_id = result['tracking']['product_id']
+    with _product_keys_lock:
+        if _invalidated.get(product_id, 0) > seq:
+            return
+        _local.set(key, result)
+    _remember(product_id, key)
+
+
+def put(qr_code, result, token=None):
+    """写入扫描结果；token 为读取时 _lookup 返回的失效序号，产品在此之后被清除过时不写入"""
+    key = cache_key(qr_code)
+    product_id = result['tracking']['product_id']
+    local_seq, redis_seq = token if token is not None else (_seq, None)
+    _put_local(key, result, local_seq)
+
+    client = _get_redis()
+    if client is None:
+        return
+    try:
+        if redis_seq is None:
+            redis_seq = int(client.get(REDIS_SEQ_KEY) or 0)
+        client.eval(
+            _PUT_SCRIPT, 3,
+            REDIS_PREFIX + key, f'{REDIS_PREFIX}product:{product_id}', f'{REDIS_PREFIX}invalidated:{product_id}',
+            redis_seq, json.dumps(result, ensure_ascii=False), REDIS_TTL, key
+        )
+    except Exception as e:
+        _log_redis_error('写入', e)
+
+
+def invalidate_products(product_ids):
+    """清除指定产品的扫描缓存"""
+    global _seq
+    product_ids = {product_id for product_id in product_ids if product_id is not None}
+    if not product_ids:
+        return
+
+    with _product_keys_lock:
+        _seq += 1
+        for product_id in product_ids:
+            _invalidated.set(product_id, _seq)
+            for key in _product_keys.get(product_id, ()):
+                _local.delete(key)
+            _product_keys.delete(product_id)
+
+    client = _get_redis()
+    if client is None:
+        return
+    try:
+        product_sets = [f'{REDIS_PREFIX}product:{product_id}' for product_id in product_ids]
+        seq = client.incr(REDIS_SEQ_KEY)
+        pipe = client.pipeline()
+        for product_id in product_ids:
+            pipe.set(f'{REDIS_PREFIX}invalidated:{product_id}', seq, ex=REDIS_TTL)
+        for product_set in product_sets:
+            pipe.smembers(product_set)
+        members = pipe.execute()[len(product_ids):]
+        keys = [REDIS_PREFIX + key.decode() for keys in members for key in keys]
+        client.delete(*(keys + product_sets))
+    except Exception as e:
+        _log_redis_error('清除', e)
+
+
+def clear():
+    _local.clear()
+    _product_keys.clear()
+    _invalidated.clear()
+
+
+def load_scan_result(session, qr_code):
+    """从数据库读取扫描结果，二维码不存在时返回 None"""
+    query = session.query(TrackingData, Product).outerjoin(Product, Product.id == TrackingData.product_id)
+    # 紧凑格式直接解出产品ID走整数唯一索引，旧格式按二维码字符串匹配
+    product_id = product_id_from_payload(qr_code)
+    if product_id is not None:
+        row = query.filter(TrackingData.product_id == product_id).first()
+    else:
+        row = query.filter(TrackingData.qr_code == qr_code).first()
+    if not row:
+        return None
+
+    tracking, product = row
+    production_records = session.query(ProductionRecord).filter_by(product_id=tracking.product_id).order_by(
+        ProductionRecord.start_time, ProductionRecord.id
+    ).all()
+    return {
+        'tracking': tracking.to_dict(),
+        'product': product.to_dict() if product else None,
+        'production_history': [record.to_dict() for record in production_records]
+    }
+
+
+def scan(session, qr_code):
+    """带缓存的扫描查询"""
+    result, token = _lookup(qr_code)
+    if result is None:
+        result = load_scan_result(session, qr_code)
+        if result is not None:
+            put(qr_code, result, token)
+    return result
+
+
+# 影响扫描结果的模型
+WATCHED_MODELS = (TrackingData, Product, ProductionRecord)
+
+
+def _product_id_of(obj):
+    return obj.id if isinstance(obj, Product) else obj.product_id
+
+
+def _after_flush(session, flush_context):
+    pending = session.info.setdefault('scan_cache_pending', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, WATCHED_MODELS):
+            pending.add(_product_id_of(obj))
+
+
+def _after_commit(session):
+    invalidate_products(session.info.pop('scan_cache_pending', ()))
+
+
+def _after_rollback(session):
+    session.info.pop('scan_cache_pending', None)
+
+
+def mark_stale(session, product_ids):
+    """Core 语句绕过了 ORM 事件，批量更新后调用此函数，提交时清除缓存"""
+    session.info.setdefault('scan_cache_pending', set()).update(product_ids)
+
+
+def install_scan_cache_listeners(session_factory):
+    """为会话工厂注册提交后清除扫描缓存的事件"""
+    for name, listener in (('after_flush', _after_flush), ('after_commit', _after_commit), ('after_rollback', _after_rollback)):
+        if not event.contains(session_factory, name, listener):
+            event.listen(session_factory, name, listener)
@@ -0,0 +1,343 @@
+"""产品搜索
+
+在 product_search_terms 表中维护产品名称、编码、类型和规格参数键的 n-gram
+倒排索引：连续两个字符组成一个二元组，中文字符额外作为单字词项，
+每个字段的开头额外记录一个 ^ 前缀词项用于前缀匹配加权。
+查询时要求同一字段包含关键词的全部词项，按字段权重汇总得分排序，
+全程走 term 主键索引，不再对 products 做 LIKE '%kw%' 全表扫描。
+
+批量导入的产品在导入事务内写入 product_search_pending，由后台线程建立索引后
+删除；后台失败或进程退出时留下的产品由 rebuild_search_index.py --pending 补建。
+"""
+import logging
+import re
+import threading
+import time
+import unicodedata
+from datetime import datetime
+from sqlalchemy import and_, case, event, func, inspect, literal, or_
+from src.models.database import SessionLocal
+from src.models.product import Product
+from src.models.search import ProductSearchTerm, ProductSearchPending
+from src.utils.pagination import encode_cursor, decode_cursor, count_total, DEFAULT_PER_PAGE, MAX_PER_PAGE, TOTAL_MODES
+
+# 字段 -> 权重
+FIELD_WEIGHTS = {'name': 3, 'code': 3, 'type': 1, 'spec': 1}
+SEARCH_FIELDS = ('name', 'code', 'type')
+PREFIX_MARK = '^'
+PREFIX_WEIGHT = 5
+MAX_QUERY_TERMS = 32
+# 后台建立索引失败时的重试次数
+INDEX_RETRIES = 3
+
+terms_table = ProductSearchTerm.__table__
+pending_table = ProductSearchPending.__table__
+
+logger = logging.getLogger(__name__)
+
+_CJK = re.compile(r'[㐀-鿿豈-﫿]')
+# 被索引的产品字段，变化时需要重建该产品的词项
+INDEXED_ATTRS = ('product_name', 'product_code', 'product_type', 'specifications')
+
+
+def normalize(text):
+    """全角转半角并转小写"""
+    return unicodedata.normalize('NFKC', str(text)).lower().strip()
+
+
+def tokenize(text):
+    """将文本切分为 n-gram 词项集合"""
+    terms = set()
+    for token in normalize(text).split():
+        if len(token) == 1:
+            terms.add(token)
+        for i in range(len(token) - 1):
+            terms.add(token[i:i + 2])
+        terms.update(char for char in token if _CJK.match(char))
+    return terms
+
+
+def prefix_term(text):
+    """字段开头的前缀词项"""
+    token = normalize(text)
+    if not token:
+        return None
+    return PREFIX_MARK + token[:2]
+
+
+def _spec_keys(specifications):
+    if not isinstance(specifications, dict):
+        return []
+    keys = []
+    for key, value in specifications.items():
+        keys.append(str(key))
+        keys.extend(_spec_keys(value))
+    return keys
+
+
+def product_terms(product_id, values):
+    """根据产品字段值生成倒排索引行"""
+    fields = {
+        'name': [values.get('product_name')],
+        'code': [values.get('product_code')],
+        'type': [values.get('product_type')],
+        'spec': _spec_keys(values.get('specifications')),
+    }
+    rows = {}
+    for field, texts in fields.items():
+        weight = FIELD_WEIGHTS[field]
+        for text in texts:
+            if not text:
+                continue
+            for term in tokenize(text):
+                rows[(term, field)] = weight
+            prefix = prefix_term(text)
+            if prefix:
+                rows[(prefix, field)] = PREFIX_WEIGHT
+    return [
+        {'term': term, 'product_id': product_id, 'field': field, 'weight': weight}
+        for (term, field), weight in rows.items()
+    ]
+
+
+def _insert_terms(connection, rows):
+    """词项只包含字符串和整数，直接交给驱动 executemany，跳过逐行参数处理"""
+    compiled = terms_table.insert().compile(dialect=connection.dialect, column_keys=['term', 'product_id', 'field', 'weight'])
+    if compiled.positional:
+        params = [tuple(row[key] for key in compiled.positiontup) for row in rows]
+    else:
+        params = rows
+    connection.exec_driver_sql(str(compiled), params)
+
+
+def index_products(connection, products, replace=True):
+    """为一批产品重建倒排索引，products 为 [(product_id, 字段值字典), ...]
+
+    新插入的产品没有旧词项，可传 replace=False 省去删除。
+    """
+    products = list(products)
+    if not products:
+        return 0
+    if replace:
+        connection.execute(terms_table.delete().where(
+            terms_table.c.product_id.in_([product_id for product_id, values in products])
+        ))
+    rows = []
+    for product_id, values in products:
+        rows.extend(product_terms(product_id, values))
+    if rows:
+        _insert_terms(connection, rows)
+    return len(rows)
+
+
+def remove_products(connection, product_ids):
+    """删除产品的倒排索引"""
+    if product_ids:
+        connection.execute(terms_table.delete().where(terms_table.c.product_id.in_(list(product_ids))))
+
+
+def _product_values(product):
+    return {attr: getattr(product, attr) for attr in INDEXED_ATTRS}
+
+
+def _after_flush(session, flush_context):
+    created = [obj for obj in session.new if isinstance(obj, Product)]
+    changed = []
+    for obj in session.dirty:
+        if isinstance(obj, Product):
+            state = inspect(obj)
+            if any(state.attrs[attr].history.has_changes() for attr in INDEXED_ATTRS):
+                changed.append(obj)
+    deleted = [obj.id for obj in session.deleted if isinstance(obj, Product)]
+
+    if created or changed or deleted:
+        connection = session.connection()
+        index_products(connection, [(obj.id, _product_values(obj)) for obj in created], replace=False)
+        index_products(connection, [(obj.id, _product_values(obj)) for obj in changed])
+        remove_products(connection, deleted)
+
+
+def install_search_listeners(session_factory):
+    """为会话工厂注册产品写入时的索引维护事件"""
+    if not event.contains(session_factory, 'after_flush', _after_flush):
+        event.listen(session_factory, 'after_flush', _after_flush)
+
+
+def _index_batches(session, query, batch_size, replace):
+    """按主键分批读取产品并建立索引"""
+    connection = session.connection()
+    columns = [Product.id] + [getattr(Product, attr) for attr in INDEXED_ATTRS]
+    last_id = 0
+    total = 0
+    while True:
+        rows = query.with_entities(*columns).filter(Product.id > last_id).order_by(Product.id).limit(batch_size).all()
+        if not rows:
+            return total
+        index_products(connection, [(row.id, {attr: getattr(row, attr) for attr in INDEXED_ATTRS}) for row in rows], replace=replace)
+        last_id = rows[-1].id
+        total += len(rows)
+
+
+def rebuild_search_index(session, batch_size=1000):
+    """按主键分批为全部产品重建倒排索引（由调用方提交事务）"""
+    session.connection().execute(terms_table.delete())
+    session.connection().execute(pending_table.delete())
+    return _index_batches(session, session.query(Product), batch_size, replace=False)
+
+
+def index_product_ids(session, product_ids, batch_size=1000):
+    """为指定产品重建倒排索引（由调用方提交事务）"""
+    product_ids = sorted(set(product_ids))
+    total = 0
+    for start in range(0, len(product_ids), batch_size):
+        chunk = product_ids[start:start + batch_size]
+        total += _index_batches(session, session.query(Product).filter(Product.id.in_(chunk)), batch_size, replace=True)
+    return total
+
+
+def queue_products(connection, product_ids, now=None):
+    """记录待建立索引的产品（在写入产品的同一事务内调用）"""
+    now = now or datetime.utcnow()
+    if product_ids:
+        connection.execute(pending_table.insert(), [{'product_id': product_id, 'queued_at': now} for product_id in product_ids])
+
+
+def _index_and_dequeue(session, product_ids):
+    index_product_ids(session, product_ids)
+    session.connection().execute(pending_table.delete().where(pending_table.c.product_id.in_(product_ids)))
+    session.commit()
+
+
+def index_pending(session, batch_size=1000):
+    """为待索引队列中的全部产品建立索引，每批建好后即提交并出队，返回产品数"""
+    total = 0
+    last_id = 0
+    while True:
+        product_ids = [product_id for product_id, in session.query(ProductSearchPending.product_id).filter(
+            ProductSearchPending.product_id > last_id
+        ).order_by(ProductSearchPending.product_id).limit(batch_size)]
+        if not product_ids:
+            return total
+        _index_and_dequeue(session, product_ids)
+        last_id = product_ids[-1]
+        total += len(product_ids)
+
+
+def index_in_background(product_ids, batch_size=1000):
+    """在后台线程中为批量导入的产品建立索引，不占用导入请求的时间
+
+    产品已在导入事务内入队，这里失败时重试，仍失败则留在队列中等待补建
+    """
+    product_ids = sorted(set(product_ids))
+    if not product_ids:
+        return None
+
+    def run():
+        session = SessionLocal()
+        try:
+            for start in range(0, len(product_ids), batch_size):
+                chunk = product_ids[start:start + batch_size]
+                for attempt in range(INDEX_RETRIES):
+                    try:
+                        _index_and_dequeue(session, chunk)
+                        break
+                    except Exception:
+                        session.rollback()
+                        if attempt + 1 == INDEX_RETRIES:
+                            raise
+                        time.sleep(2 ** attempt)
+        except Exception:
+            logger.exception('产品搜索索引后台构建失败，未完成的产品留在待索引队列中，可运行 rebuild_search_index.py --pending 补建')
+        finally:
+            session.close()
+
+    thread = threading.Thread(target=run, name='search-indexer', daemon=True)
+    thread.start()
+    return thread
+
+
+def _ranked_query(session, terms, prefix, fields):
+    """按字段匹配全部词项的产品及其得分"""
+    Term = ProductSearchTerm
+    wanted = list(terms) + ([prefix] if prefix else [])
+
+    # 第一层：同一字段必须包含全部词项
+    field_matches = session.query(
+        Term.product_id.label('product_id'),
+        func.sum(Term.weight).label('score')
+    ).filter(
+        Term.term.in_(wanted), Term.field.in_(fields)
+    ).group_by(
+        Term.product_id, Term.field
+    ).having(
+        func.count(func.distinct(case((Term.term.in_(terms), Term.term)))) == len(terms)
+    ).subquery()
+
+    # 第二层：汇总各字段得分
+    product_id = field_matches.c.product_id
+    score = func.sum(field_matches.c.score).label('score')
+    return session.query(product_id, score).group_by(product_id), product_id, score
+
+
+def _escape_like(value):
+    """转义 LIKE 通配符，使关键字按字面匹配"""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _prefix_query(session, keyword):
+    """单个非中文字符无法组成二元组，退回产品编码前缀匹配（可走唯一索引）"""
+    score = literal(FIELD_WEIGHTS['code']).label('score')
+    query = session.query(Product.id.label('product_id'), score).filter(
+        Product.product_code.like(f'{_escape_like(keyword)}%', escape='\\')
+    )
+    return query, Product.id, score
+
+
+def search_products(session, keyword, fields=SEARCH_FIELDS, per_page=DEFAULT_PER_PAGE, cursor=None, total=None):
+    """搜索产品，按相关度排序并以游标分页
+
+    total 与 keyset_paginate 相同：未指定时首页按 estimate 估算匹配总数，带游标的后续页不计数
+    """
+    per_page = max(1, min(per_page or DEFAULT_PER_PAGE, MAX_PER_PAGE))
+    if total is None:
+        total = 'none' if cursor else 'estimate'
+    if total not in TOTAL_MODES:
+        raise ValueError('total 参数只能为 exact、estimate 或 none')
+    fields = [field for field in fields if field in FIELD_WEIGHTS] or list(SEARCH_FIELDS)
+    terms = sorted(tokenize(keyword))[:MAX_QUERY_TERMS]
+
+    if not terms:
+        return {'products': [], 'next_cursor': None, 'has_more': False,
+                'total': 0 if total != 'none' else None, 'total_is_estimate': False}
+
+    keyword = normalize(keyword)
+    if len(keyword) == 1 and not _CJK.match(keyword):
+        ranked, product_id, score = _prefix_query(session, keyword)
+        after = ranked.filter
+    else:
+        ranked, product_id, score = _ranked_query(session, terms, prefix_term(keyword), fields)
+        after = ranked.having
+
+    total_count, total_is_estimate = count_total(ranked, product_id, total)
+
+    if cursor:
+        last_score, last_id = decode_cursor(cursor, size=2)
+        if type(last_score) is not int or type(last_id) is not int:
+            raise ValueError('无效的游标')
+        ranked = after(or_(score < last_score, and_(score == last_score, product_id < last_id)))
+
+    rows = ranked.order_by(score.desc(), product_id.desc()).limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    scores = {row.product_id: int(row.score) for row in rows}
+    products = {product.id: product for product in session.query(Product).filter(Product.id.in_(list(scores)))} if scores else {}
+
+    next_cursor = encode_cursor(scores[rows[-1].product_id], rows[-1].product_id) if has_more else None
+    return {
+        'products': [(products[row.product_id], scores[row.product_id]) for row in rows if row.product_id in products],
+        'next_cursor': next_cursor,
+        'has_more': has_more,
+        'total': total_count,
+        'total_is_estimate': total_is_estimate
+    }
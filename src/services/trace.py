@@ -0,0 +1,136 @@
+"""产品全链路追溯
+
+一次加载一批产品的完整追溯图：产品 -> 追踪数据 -> 生产记录 -> 设备、
+操作员 -> 质量检查（检验员）-> 物料 -> 供应商。每类节点一条 IN 查询
+（每 LOOKUP_CHUNK 个 ID 一块），查询次数只与节点类型数和批量大小有关，
+与产品数量、记录数量无关。设备、人员、供应商等共享节点只返回一次，
+产品树中按 ID 引用，批量追溯数千个产品时不会重复序列化。
+"""
+from collections import defaultdict
+from src.models.product import Product
+from src.models.tracking import TrackingData, ProductionRecord, QualityCheck, ProductMaterial
+from src.models.device import Device
+from src.models.supplier import Supplier
+from src.models.user import User
+
+MAX_BATCH_SIZE = 5000
+LOOKUP_CHUNK = 1000
+
+
+def _chunks(ids):
+    ids = sorted(ids)
+    for start in range(0, len(ids), LOOKUP_CHUNK):
+        yield ids[start:start + LOOKUP_CHUNK]
+
+
+def _load(query_factory, column, ids):
+    """按 ID 分块执行 IN 查询，返回全部结果"""
+    rows = []
+    for chunk in _chunks(ids):
+        rows.extend(query_factory().filter(column.in_(chunk)))
+    return rows
+
+
+def _group(rows, key):
+    grouped = defaultdict(list)
+    for row in rows:
+        grouped[getattr(row, key)].append(row)
+    return grouped
+
+
+def _user_node(user):
+    # 只返回追溯需要的字段，不包含密码哈希等敏感信息
+    return {'id': user.id, 'username': user.username, 'role': user.role, 'department': user.department}
+
+
+def trace_products(session, product_ids):
+    """追溯一批产品，返回产品树列表、共享节点和未找到的产品ID"""
+    try:
+        product_ids = {int(product_id) for product_id in product_ids}
+    except (TypeError, ValueError):
+        raise ValueError('product_ids 必须是整数数组')
+    if len(product_ids) > MAX_BATCH_SIZE:
+        raise ValueError(f'单次最多追溯 {MAX_BATCH_SIZE} 个产品')
+
+    products = _load(lambda: session.query(Product), Product.id, product_ids)
+    found = {product.id for product in products}
+
+    tracking = {row.product_id: row for row in _load(lambda: session.query(TrackingData), TrackingData.product_id, found)}
+    records = _group(_load(
+        lambda: session.query(ProductionRecord).order_by(ProductionRecord.product_id, ProductionRecord.start_time, ProductionRecord.id),
+        ProductionRecord.product_id, found
+    ), 'product_id')
+    checks = _group(_load(
+        lambda: session.query(QualityCheck).order_by(QualityCheck.product_id, QualityCheck.check_time, QualityCheck.id),
+        QualityCheck.product_id, found
+    ), 'product_id')
+    materials = _group(_load(
+        lambda: session.query(ProductMaterial).order_by(ProductMaterial.product_id, ProductMaterial.id),
+        ProductMaterial.product_id, found
+    ), 'product_id')
+
+    # 共享节点：从上一层结果收集ID后各一次查询
+    device_ids = {record.equipment_id for rows in records.values() for record in rows if record.equipment_id}
+    user_ids = {record.operator_id for rows in records.values() for record in rows if record.operator_id}
+    user_ids |= {check.inspector_id for rows in checks.values() for check in rows if check.inspector_id}
+    supplier_ids = {material.supplier_id for rows in materials.values() for material in rows}
+
+    devices = {device.id: device.to_dict() for device in _load(lambda: session.query(Device), Device.id, device_ids)}
+    users = {user.id: _user_node(user) for user in _load(
+        lambda: session.query(User.id, User.username, User.role, User.department), User.id, user_ids
+    )}
+    suppliers = {supplier.id: supplier.to_dict() for supplier in _load(lambda: session.query(Supplier), Supplier.id, supplier_ids)}
+
+    traces = []
+    for product in sorted(products, key=lambda product: product.id):
+        product_checks = checks.get(product.id, [])
+        passed = sum(1 for check in product_checks if check.pass_status)
+        traces.append({
+            'product': product.to_dict(),
+            'tracking': tracking[product.id].to_dict() if product.id in tracking else None,
+            'production_records': [record.to_dict() for record in records.get(product.id, [])],
+            'quality_checks': [check.to_dict() for check in product_checks],
+            'materials': [material.to_dict() for material in materials.get(product.id, [])],
+            'summary': {
+                'devices': sorted({record.equipment_id for record in records.get(product.id, []) if record.equipment_id}),
+                'operators': sorted({record.operator_id for record in records.get(product.id, []) if record.operator_id}),
+                'suppliers': sorted({material.supplier_id for material in materials.get(product.id, [])}),
+                'quality_passed': passed,
+                'quality_failed': len(product_checks) - passed
+            }
+        })
+
+    return {
+        'traces': traces,
+        'devices': devices,
+        'users': users,
+        'suppliers': suppliers,
+        'not_found': sorted(product_ids - found)
+    }
+
+
+def add_materials(session, product_id, items):
+    """为产品登记物料批次（由调用方提交事务），返回新建的记录"""
+    supplier_ids = set()
+    materials = []
+    for item in items:
+        if not isinstance(item, dict) or not item.get('supplier_id') or not item.get('material'):
+            raise ValueError('每条物料必须包含 supplier_id 和 material')
+        supplier_ids.add(int(item['supplier_id']))
+        materials.append(ProductMaterial(
+            product_id=product_id,
+            supplier_id=int(item['supplier_id']),
+            material=item['material'],
+            batch_no=item.get('batch_no'),
+            quantity=item.get('quantity'),
+            production_record_id=item.get('production_record_id')
+        ))
+
+    existing = {supplier_id for supplier_id, in session.query(Supplier.id).filter(Supplier.id.in_(supplier_ids))}
+    missing = supplier_ids - existing
+    if missing:
+        raise ValueError(f'供应商不存在: {sorted(missing)}')
+
+    session.add_all(materials)
+    session.flush()
+    return materials
@@ -0,0 +1,202 @@
+"""追踪事件日志
+
+位置、状态变更和网关扫描都作为事件追加写入 tracking_events（MySQL 下按月
+分区），tracking_data 只保存每个产品的最新状态投影。一批事件只需一次
+产品查询、一次 executemany 插入和一次 executemany 投影更新；乱序到达的
+旧事件只追加历史，不会覆盖更新的状态。
+
+每条事件单独校验（字段类型、列长度、发生时间不晚于当前时间加允许的时钟偏差），
+不合法的事件只在逐条结果中报错，不会让整批写入失败；操作人始终为当前登录用户。
+"""
+import os
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import bindparam, case, func, or_, text, update
+from src.models.tracking import TrackingData, TrackingEvent, monthly_partitions, partition_clause
+from src.services import scan_cache
+from src.services.dashboard_stats import apply_deltas, version_key
+
+MAX_BATCH_SIZE = 10000
+LOOKUP_CHUNK = 1000
+# 网关上报的发生时间允许超前服务器时间的秒数，更晚的视为时钟错误而拒绝
+MAX_CLOCK_SKEW_SECONDS = int(os.getenv('TRACKING_MAX_CLOCK_SKEW_SECONDS', 300))
+MAX_PRODUCT_ID = 2 ** 31 - 1
+EVENT_FIELDS = ('product_id', 'event_type', 'location', 'status', 'source', 'operator_id', 'occurred_at', 'recorded_at', 'details')
+
+events_table = TrackingEvent.__table__
+tracking_table = TrackingData.__table__
+
+
+def _parse_time(value, default):
+    if not value:
+        return default
+    if isinstance(value, datetime):
+        return value
+    try:
+        value = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError('occurred_at 格式错误')
+    # 带时区的时间换算为 UTC 再与服务器时间比较
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def text_value(value, name, column):
+    """校验可选的字符串字段：必须是字符串且不超过列长度"""
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f'{name} 必须是字符串')
+    if len(value) > column.type.length:
+        raise ValueError(f'{name} 不能超过 {column.type.length} 个字符')
+    return value
+
+
+def normalize_event(data, now, operator_id=None):
+    """校验并转换一条事件，返回可直接插入的字典；operator_id 为当前用户，不接受事件中携带的操作人"""
+    if not isinstance(data, dict):
+        raise ValueError('事件必须是对象')
+    try:
+        product_id = int(data['product_id'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('缺少有效的 product_id')
+    if not 0 < product_id <= MAX_PRODUCT_ID:
+        raise ValueError('缺少有效的 product_id')
+    location = text_value(data.get('location'), 'location', tracking_table.c.current_location)
+    status = text_value(data.get('status'), 'status', tracking_table.c.current_status)
+    event_type = text_value(data.get('event_type'), 'event_type', events_table.c.event_type)
+    occurred_at = _parse_time(data.get('occurred_at'), now)
+    if occurred_at > now + timedelta(seconds=MAX_CLOCK_SKEW_SECONDS):
+        raise ValueError('occurred_at 晚于服务器当前时间，请检查设备时钟')
+    return {
+        'product_id': product_id,
+        'event_type': event_type or ('move' if location or status else 'scan'),
+        'location': location,
+        'status': status,
+        'source': text_value(data.get('source'), 'source', events_table.c.source),
+        'operator_id': operator_id,
+        'occurred_at': occurred_at,
+        'recorded_at': now,
+        'details': data.get('details')
+    }
+
+
+def append_events(connection, rows):
+    """只追加事件，不更新投影（调用方已同步写入 tracking_data 时使用）"""
+    if rows:
+        connection.execute(events_table.insert(), [{field: row.get(field) for field in EVENT_FIELDS} for row in rows])
+
+
+def _latest_states(rows, projected, authoritative=False):
+    """每个产品批内最新的位置、状态（按发生时间），早于当前投影的事件不参与（authoritative 时全部参与）"""
+    latest = {}
+    for row in sorted(rows, key=lambda row: row['occurred_at']):
+        if row['location'] is None and row['status'] is None:
+            continue
+        last_updated = projected.get(row['product_id'])
+        if not authoritative and last_updated is not None and row['occurred_at'] < last_updated:
+            continue
+        state = latest.setdefault(row['product_id'], {'pid': row['product_id'], 'location': None, 'status': None})
+        if row['location'] is not None:
+            state['location'] = row['location']
+        if row['status'] is not None:
+            state['status'] = row['status']
+        state['occurred_at'] = row['occurred_at']
+    return list(latest.values())
+
+
+def _project(connection, rows, projected, authoritative=False):
+    """把最新状态写回 tracking_data；投影时间更新的行不会被旧事件覆盖
+
+    authoritative 为 True（服务端产生的状态流转事件）时总是投影，
+    last_updated 取原值与事件时间中较晚的一个
+    """
+    states = _latest_states(rows, projected, authoritative)
+    if not states:
+        return
+    last_updated = tracking_table.c.last_updated
+    if authoritative:
+        statement = update(tracking_table).where(tracking_table.c.product_id == bindparam('pid')).values(
+            last_updated=case((last_updated > bindparam('occurred_at'), last_updated), else_=bindparam('occurred_at'))
+        )
+    else:
+        statement = update(tracking_table).where(
+            tracking_table.c.product_id == bindparam('pid'),
+            or_(last_updated.is_(None), last_updated <= bindparam('occurred_at'))
+        ).values(last_updated=bindparam('occurred_at'))
+    statement = statement.values(
+        current_location=func.coalesce(bindparam('location'), tracking_table.c.current_location),
+        current_status=func.coalesce(bindparam('status'), tracking_table.c.current_status)
+    )
+    connection.execute(statement, states)
+    # Core 更新不触发会话事件，手动递增列表接口 ETag 使用的变更计数
+    apply_deltas(connection, {version_key('tracking_data'): 1})
+
+
+def record_events(session, events, operator_id=None, authoritative=False):
+    """写入一批事件并更新最新状态投影（由调用方提交事务），返回逐条结果
+
+    authoritative=True 用于服务端产生的事件（如批量状态流转），不受投影时间限制
+    """
+    if len(events) > MAX_BATCH_SIZE:
+        raise ValueError(f'单次最多提交 {MAX_BATCH_SIZE} 条事件')
+
+    now = datetime.utcnow()
+    results = [None] * len(events)
+    pending = []
+    for index, data in enumerate(events):
+        try:
+            pending.append((index, normalize_event(data, now, operator_id)))
+        except ValueError as e:
+            results[index] = {'index': index, 'status': 'error', 'error': str(e)}
+
+    # 只接受已建立追踪数据的产品，一次 IN 查询校验
+    product_ids = sorted({row['product_id'] for index, row in pending})
+    tracked = {}
+    for start in range(0, len(product_ids), LOOKUP_CHUNK):
+        chunk = product_ids[start:start + LOOKUP_CHUNK]
+        tracked.update(session.query(TrackingData.product_id, TrackingData.last_updated).filter(TrackingData.product_id.in_(chunk)))
+
+    rows = []
+    for index, row in pending:
+        if row['product_id'] in tracked:
+            rows.append(row)
+            results[index] = {'index': index, 'status': 'accepted'}
+        else:
+            results[index] = {'index': index, 'status': 'error', 'error': '产品没有追踪数据'}
+
+    if rows:
+        connection = session.connection()
+        append_events(connection, rows)
+        _project(connection, rows, tracked, authoritative)
+        # Core 语句不触发 ORM 事件，手动标记扫描缓存失效
+        scan_cache.mark_stale(session, {row['product_id'] for row in rows})
+    return results
+
+
+def history_query(session, product_id):
+    """产品事件历史：按 (product_id, occurred_at, id) 索引范围扫描"""
+    return session.query(TrackingEvent).filter(TrackingEvent.product_id == product_id)
+
+
+def ensure_event_partitions(connection, months_ahead=3):
+    """为 tracking_events 补建未来月份的分区（仅 MySQL），返回新建的分区名"""
+    if connection.dialect.name != 'mysql':
+        return []
+    existing = {name for name, in connection.execute(text(
+        "SELECT PARTITION_NAME FROM INFORMATION_SCHEMA.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'tracking_events' AND PARTITION_NAME IS NOT NULL"
+    ))}
+    if not existing:
+        return []
+    # 只剩 pmax（月份分区全部丢失）时从当前月份开始补建
+    latest = max((name for name in existing if name != 'pmax'), default='')
+    wanted = [
+        (name, bound) for name, bound in monthly_partitions(datetime.utcnow(), months_ahead + 1)
+        if name not in existing and name > latest
+    ]
+    if wanted:
+        connection.exec_driver_sql(
+            f'ALTER TABLE tracking_events REORGANIZE PARTITION pmax INTO ({partition_clause(wanted)})'
+        )
+    return [name for name, bound in wanted]
@@ -0,0 +1,210 @@
+"""产品状态批量流转
+
+状态机：produced -> shipped -> sold，任一未召回状态都可以 -> recalled。
+选中的产品一次读取 (id, status, version)，再按块执行集合 UPDATE：
+WHERE (id, version) IN (...) AND status IN (允许的来源状态) 并递增 version，
+以行版本号作为乐观锁（updated_at 只精确到秒，同一秒内的两次写入无法区分），
+读取后被其他请求修改过的行不会被覆盖，作为冲突返回。
+状态变更同时批量写入追踪事件（投影到 tracking_data），并手动维护仪表盘
+统计和扫描缓存，因为 Core 语句不触发会话事件。调用方负责提交事务。
+"""
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import and_, select, tuple_, update
+from src.models.product import Product
+from src.models.tracking import TrackingData
+from src.services import scan_cache, tracking_events
+from src.services.dashboard_stats import apply_deltas, version_key
+
+# 允许的状态流转：{原状态: 目标状态}
+TRANSITIONS = {
+    'produced': ('shipped', 'recalled'),
+    'shipped': ('sold', 'recalled'),
+    'sold': ('recalled',),
+    'recalled': ()
+}
+# 产品状态对应的追踪状态（与追踪页面的状态选项一致）
+TRACKING_STATUS = {
+    'shipped': 'shipping',
+    'sold': 'delivered',
+    'recalled': 'returned'
+}
+MAX_BATCH_SIZE = 10000
+UPDATE_CHUNK = 1000
+
+products_table = Product.__table__
+
+
+def sources_of(target):
+    """可以流转到 target 的原状态"""
+    if target not in TRACKING_STATUS:
+        raise ValueError(f"目标状态只能为 {', '.join(TRACKING_STATUS)}")
+    return tuple(status for status, targets in TRANSITIONS.items() if target in targets)
+
+
+def _parse_time(value):
+    if isinstance(value, datetime) or value is None:
+        return value
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError:
+        raise ValueError('updated_at 格式错误')
+
+
+def parse_items(items):
+    """解析产品ID列表，元素可以是ID或 {id, version}（兼容 {id, updated_at}）
+
+    返回 {id: 客户端持有的版本号、updated_at 或 None}
+    """
+    if not isinstance(items, list):
+        raise ValueError('product_ids 必须是数组')
+    if len(items) > MAX_BATCH_SIZE:
+        raise ValueError(f'单次最多流转 {MAX_BATCH_SIZE} 个产品')
+    versions = {}
+    for item in items:
+        try:
+            product_id = int(item['id'] if isinstance(item, dict) else item)
+        except (KeyError, TypeError, ValueError):
+            raise ValueError('产品ID必须是整数')
+        if not isinstance(item, dict):
+            versions[product_id] = None
+        elif item.get('version') is not None:
+            if type(item['version']) is not int:
+                raise ValueError('version 必须是整数')
+            versions[product_id] = item['version']
+        else:
+            versions[product_id] = _parse_time(item.get('updated_at'))
+    return versions
+
+
+def product_filter(filters):
+    """产品过滤条件（status、type）"""
+    if not isinstance(filters, dict) or not filters:
+        raise ValueError('filter 不能为空')
+    conditions = []
+    if filters.get('status'):
+        conditions.append(Product.status == filters['status'])
+    if filters.get('type'):
+        conditions.append(Product.product_type == filters['type'])
+    if not conditions:
+        raise ValueError('filter 只支持 status、type')
+    return and_(*conditions)
+
+
+def tracking_selection(tracking_ids=None, filters=None):
+    """按追踪数据ID或追踪过滤条件（current_status、current_location）选择产品"""
+    query = select(TrackingData.product_id)
+    if tracking_ids is not None:
+        if not isinstance(tracking_ids, list) or len(tracking_ids) > MAX_BATCH_SIZE:
+            raise ValueError(f'tracking_ids 必须是不超过 {MAX_BATCH_SIZE} 个元素的数组')
+        try:
+            query = query.where(TrackingData.id.in_([int(tracking_id) for tracking_id in tracking_ids]))
+        except (TypeError, ValueError):
+            raise ValueError('追踪数据ID必须是整数')
+    elif isinstance(filters, dict) and (filters.get('current_status') or filters.get('current_location')):
+        if filters.get('current_status'):
+            query = query.where(TrackingData.current_status == filters['current_status'])
+        if filters.get('current_location'):
+            query = query.where(TrackingData.current_location == filters['current_location'])
+    else:
+        raise ValueError('需要指定 tracking_ids 或 filter（current_status、current_location）')
+    return Product.id.in_(query)
+
+
+def _update_rows(connection, rows, allowed, target, now):
+    """按 (id, version) 乐观锁更新一组产品的状态并递增版本号，返回更新行数"""
+    return connection.execute(
+        update(products_table).where(
+            tuple_(products_table.c.id, products_table.c.version).in_(
+                [(product_id, version) for product_id, status, version in rows]
+            ),
+            products_table.c.status.in_(allowed)
+        ).values(status=target, updated_at=now, version=products_table.c.version + 1)
+    ).rowcount
+
+
+def transition(session, target, condition, versions=None, location=None, operator_id=None,
+               source='bulk', max_rows=MAX_BATCH_SIZE, lock=False):
+    """把满足 condition 的产品流转到 target 状态（由调用方提交事务）
+
+    versions 为 {id: 客户端持有的版本号或 updated_at}，与读取到的值不一致时作为冲突；
+    写入时以本次读取到的 version 作为乐观锁。lock=True 时读取即加行锁（SELECT ... FOR UPDATE），
+    不会产生冲突。返回 updated、not_found、conflicts、invalid、previous_status。
+    """
+    allowed = sources_of(target)
+    location = tracking_events.text_value(location, 'location', TrackingData.__table__.c.current_location)
+    rows = session.query(Product.id, Product.status, Product.version, Product.updated_at).filter(condition).order_by(Product.id)
+    if lock:
+        rows = rows.with_for_update()
+    if max_rows is not None:
+        rows = rows.limit(max_rows + 1)
+    rows = rows.all()
+    if max_rows is not None and len(rows) > max_rows:
+        raise ValueError(f'选中的产品超过 {max_rows} 个，请缩小范围')
+
+    versions = versions or {}
+    candidates, invalid, conflicts = [], [], []
+    for product_id, status, version, updated_at in rows:
+        if status == target:
+            continue
+        if status not in allowed:
+            invalid.append({'id': product_id, 'status': status})
+            continue
+        expected = versions.get(product_id)
+        if expected is not None and expected != (version if isinstance(expected, int) else updated_at):
+            conflicts.append(product_id)
+            continue
+        candidates.append((product_id, status, version))
+
+    # MySQL DATETIME 只保存到秒；追踪事件使用完整精度的服务端时间
+    occurred_at = datetime.utcnow()
+    now = occurred_at.replace(microsecond=0)
+    connection = session.connection()
+    updated = []
+    for start in range(0, len(candidates), UPDATE_CHUNK):
+        chunk = candidates[start:start + UPDATE_CHUNK]
+        savepoint = session.begin_nested()
+        count = _update_rows(connection, chunk, allowed, target, now)
+        if count == len(chunk):
+            savepoint.commit()
+            updated.extend(chunk)
+            continue
+        # 部分行在读取后被修改：撤销本块后逐行更新，未更新的行即为冲突
+        savepoint.rollback()
+        for row in chunk:
+            if _update_rows(connection, [row], allowed, target, now):
+                updated.append(row)
+            else:
+                conflicts.append(row[0])
+
+    previous = Counter(status for product_id, status, version in updated)
+    ids = [product_id for product_id, status, version in updated]
+    if ids:
+        deltas = {f'products.status.{status}': -count for status, count in previous.items()}
+        deltas[f'products.status.{target}'] = len(ids)
+        deltas[version_key('products')] = 1
+        apply_deltas(connection, deltas)
+        # 有追踪数据的产品批量追加状态事件并更新 tracking_data 投影
+        events = [{
+            'product_id': product_id,
+            'event_type': 'status',
+            'status': TRACKING_STATUS[target],
+            'location': location,
+            'source': source,
+            'occurred_at': occurred_at,
+            'details': {'product_status': target, 'previous_status': status}
+        } for product_id, status, version in updated]
+        for start in range(0, len(events), tracking_events.MAX_BATCH_SIZE):
+            tracking_events.record_events(
+                session, events[start:start + tracking_events.MAX_BATCH_SIZE], operator_id=operator_id, authoritative=True
+            )
+        scan_cache.mark_stale(session, ids)
+
+    return {
+        'status': target,
+        'updated': ids,
+        'not_found': sorted(set(versions) - {row[0] for row in rows}),
+        'conflicts': sorted(conflicts),
+        'invalid': invalid,
+        'previous_status': dict(previous)
+    }
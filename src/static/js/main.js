@@ -168,6 +168,39 @@ async function initDashboard() {
     } finally {
         hideLoading(document.getElementById('dashboard-stats'));
     }
+    
+    renderDashboardChart('product_status', 'product-status-chart');
+    renderDashboardChart('quality_trend', 'quality-trend-chart');
+}
+
+// 获取图表数据并在浏览器端绘制简单条形图
+async function renderDashboardChart(chartName, elementId) {
+    const container = document.getElementById(elementId);
+    if (!container) return;
+    
+    try {
+        const response = await apiRequest(`/dashboard/charts/${chartName}`);
+        const chart = response.chart;
+        const maxValue = Math.max(1, ...chart.values);
+        
+        let chartHTML = '<div style="width: 100%; padding: 0 1rem;">';
+        chart.labels.forEach((label, index) => {
+            const value = chart.values[index];
+            chartHTML += `
+                <div style="display: flex; align-items: center; margin: 4px 0;">
+                    <span style="width: 90px; font-size: 0.8rem;">${label}</span>
+                    <div style="flex: 1; background: #e9ecef; border-radius: 3px;">
+                        <div style="width: ${value / maxValue * 100}%; background: #4a6cf7; height: 14px; border-radius: 3px;"></div>
+                    </div>
+                    <span style="width: 40px; text-align: right; font-size: 0.8rem;">${value}</span>
+                </div>
+            `;
+        });
+        chartHTML += '</div>';
+        container.innerHTML = chartHTML;
+    } catch (error) {
+        console.error('获取图表数据失败:', error);
+    }
 }
 
 // 渲染仪表盘统计
@@ -0,0 +1,74 @@
+"""HTTP 条件请求（ETag / Last-Modified）
+
+详情接口先执行只读取版本列的主键查询生成校验值，客户端的 If-None-Match /
+If-Modified-Since 命中时直接返回 304，不加载整行也不序列化。列表接口的
+校验值由 dashboard_stats 中各表的变更计数（写入事务内递增）和请求参数组成，
+一次主键 IN 查询即可得到。
+
+MySQL DATETIME 只精确到秒，最近 RECENT_SECONDS 秒内修改过的行不返回校验值，
+避免同一秒内的两次修改生成相同的 ETag。
+"""
+import hashlib
+from datetime import datetime, timedelta, timezone
+from flask import request, Response
+from werkzeug.http import http_date, quote_etag
+from src.services.dashboard_stats import read_versions
+
+# 表名 -> 版本列；第一列为时间时同时作为 Last-Modified
+VERSION_COLUMNS = {
+    'products': ('updated_at', 'version'),
+    'devices': ('updated_at',),
+    'suppliers': ('updated_at',),
+    # 追踪投影的 last_updated 为事件发生时间，状态、位置一并参与校验
+    'tracking_data': ('last_updated', 'current_status', 'current_location'),
+    'quality_checks': ('version',),
+}
+RECENT_SECONDS = 1
+
+
+def _etag(*parts):
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:32]
+
+
+def row_validators(session, model, ident):
+    """只查询版本列生成 (etag, last_modified)，行不存在时返回 None
+
+    最近修改过的行返回 (None, None)，即本次响应不带校验值
+    """
+    columns = [getattr(model, name) for name in VERSION_COLUMNS[model.__tablename__]]
+    row = session.query(*columns).filter(model.id == ident).first()
+    if row is None:
+        return None
+    last_modified = row[0] if isinstance(row[0], datetime) else None
+    if last_modified is not None and datetime.utcnow() - last_modified < timedelta(seconds=RECENT_SECONDS):
+        return None, None
+    return _etag(request.full_path, *row), last_modified
+
+
+def collection_validators(session, *tables):
+    """列表接口的 (etag, None)：各表变更计数 + 请求路径和查询参数"""
+    versions = read_versions(session, tables)
+    return _etag(request.full_path, *[versions.get(table, 0) for table in tables]), None
+
+
+def cache_headers(etag, last_modified=None):
+    """响应中的校验值头；etag 为 None 时不返回"""
+    if etag is None:
+        return {}
+    headers = {'ETag': quote_etag(etag, weak=True), 'Cache-Control': 'private, no-cache'}
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(last_modified.replace(tzinfo=timezone.utc))
+    return headers
+
+
+def not_modified(etag, last_modified=None):
+    """条件请求命中时返回 304 响应，否则返回 None（If-None-Match 优先于 If-Modified-Since）"""
+    if etag is None:
+        return None
+    if request.if_none_match:
+        hit = request.if_none_match.contains_weak(etag)
+    elif request.if_modified_since and last_modified is not None:
+        hit = last_modified.replace(microsecond=0, tzinfo=timezone.utc) <= request.if_modified_since
+    else:
+        hit = False
+    return Response(status=304, headers=cache_headers(etag, last_modified)) if hit else None
@@ -0,0 +1,147 @@
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import and_, or_, func
+
+# 游标编码：将排序键序列化为不透明的 URL 安全字符串
+def encode_cursor(*values):
+    """将排序键编码为游标"""
+    payload = [{'dt': value.isoformat()} if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(token, size=None):
+    """解码游标，格式不合法时抛出 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw.decode('utf-8'))
+    except Exception:
+        raise ValueError('无效的游标')
+
+    if not isinstance(payload, list) or (size is not None and len(payload) != size):
+        raise ValueError('无效的游标')
+
+    values = []
+    for value in payload:
+        if isinstance(value, dict):
+            if set(value) != {'dt'} or not isinstance(value['dt'], str):
+                raise ValueError('无效的游标')
+            try:
+                value = datetime.fromisoformat(value['dt'])
+            except ValueError:
+                raise ValueError('无效的游标')
+        elif isinstance(value, list):
+            raise ValueError('无效的游标')
+        values.append(value)
+    return values
+
+DEFAULT_PER_PAGE = 20
+MAX_PER_PAGE = 100
+
+# 估算总数时最多计数的行数，超过即返回下限
+TOTAL_ESTIMATE_CAP = 10000
+
+TOTAL_MODES = ('exact', 'estimate', 'none')
+
+def _keyset_filter(order_by, values):
+    """构造 (列1, 列2, ...) 排在游标之后的过滤条件"""
+    clauses = []
+    for index, (column, descending) in enumerate(order_by):
+        equal_prefix = [order_by[i][0] == values[i] for i in range(index)]
+        compare = column < values[index] if descending else column > values[index]
+        clauses.append(and_(*equal_prefix, compare))
+    return or_(*clauses)
+
+def _column_type(column):
+    try:
+        return column.type.python_type
+    except NotImplementedError:
+        return None
+
+def check_cursor_values(order_by, values):
+    """校验游标中的值与排序列类型一致，不一致时抛出 ValueError"""
+    for (column, descending), value in zip(order_by, values):
+        expected = _column_type(column)
+        if value is None:
+            valid = getattr(column, 'nullable', True)
+        elif expected is None:
+            valid = True
+        elif isinstance(value, bool):
+            valid = expected is bool
+        elif expected in (float, Decimal):
+            valid = isinstance(value, (int, float))
+        else:
+            valid = isinstance(value, expected)
+        if not valid:
+            raise ValueError('无效的游标')
+    return values
+
+def count_total(query, key_column, mode='estimate', cap=TOTAL_ESTIMATE_CAP):
+    """统计查询总数，返回 (总数, 是否为估算值)"""
+    if mode == 'none':
+        return None, False
+
+    query = query.order_by(None)
+    if mode == 'exact':
+        return query.count(), False
+
+    # 只计数前 cap 行，代价有上限；达到上限时返回下限值
+    limited = query.with_entities(key_column).limit(cap).subquery()
+    total = query.session.query(func.count()).select_from(limited).scalar()
+    return total, total >= cap
+
+def keyset_paginate(query, order_by, cursor=None, per_page=DEFAULT_PER_PAGE, total=None, page=None):
+    """键集（游标）分页
+
+    order_by 为 [(列, 是否倒序), ...]，最后一列必须唯一（通常为主键）。
+    未提供游标但指定了 page 时退回 OFFSET 分页以兼容旧客户端。
+    total 未指定时首页按 estimate 估算总数，带游标的后续页默认 none 不再计数。
+    """
+    per_page = max(1, min(per_page or DEFAULT_PER_PAGE, MAX_PER_PAGE))
+    if total is None:
+        total = 'none' if cursor else 'estimate'
+    if total not in TOTAL_MODES:
+        raise ValueError('total 参数只能为 exact、estimate 或 none')
+
+    total_count, total_is_estimate = count_total(query, order_by[-1][0], total)
+
+    page_query = query.order_by(*[column.desc() if descending else column.asc() for column, descending in order_by])
+    if cursor:
+        values = check_cursor_values(order_by, decode_cursor(cursor, size=len(order_by)))
+        page_query = page_query.filter(_keyset_filter(order_by, values))
+    elif page and page > 1:
+        page_query = page_query.offset((page - 1) * per_page)
+
+    # 多取一行用于判断是否还有下一页
+    items = page_query.limit(per_page + 1).all()
+    has_more = len(items) > per_page
+    items = items[:per_page]
+
+    next_cursor = None
+    if has_more:
+        last = items[-1]
+        next_cursor = encode_cursor(*[getattr(last, column.key) for column, descending in order_by])
+
+    return {
+        'items': items,
+        'next_cursor': next_cursor,
+        'has_more': has_more,
+        'total': total_count,
+        'total_is_estimate': total_is_estimate,
+        'page': page or 1,
+        'per_page': per_page
+    }
+
+def pagination_meta(result):
+    """生成列表接口中的分页字段"""
+    total = result['total']
+    return {
+        'total': total,
+        'total_is_estimate': result['total_is_estimate'],
+        'page': result['page'],
+        'per_page': result['per_page'],
+        'pages': -(-total // result['per_page']) if total is not None else None,
+        'next_cursor': result['next_cursor'],
+        'has_more': result['has_more']
+    }
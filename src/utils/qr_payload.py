@@ -0,0 +1,62 @@
+"""紧凑二维码内容编码
+
+格式：1 字节版本号 + 5 字节产品ID（大端）+ 5 字节 HMAC-SHA256 截断签名，
+共 11 字节，编码为 18 位无填充 base32。base32 只含大写字母和数字，
+二维码可使用字母数字模式，版本更小、渲染更快；扫描时直接解出产品ID，
+按 tracking_data.product_id 整数唯一索引查询。
+旧格式 PRODUCT:<id>:<时间戳> 不能解码，仍按 qr_code 字符串匹配。
+"""
+import base64
+import hashlib
+import hmac
+import os
+
+VERSION = 1
+ID_BYTES = 5
+SIGNATURE_BYTES = 5
+TOKEN_BYTES = 1 + ID_BYTES + SIGNATURE_BYTES
+TOKEN_LENGTH = 18
+MAX_PRODUCT_ID = 2 ** (8 * ID_BYTES) - 1
+
+SIGNING_KEY = os.getenv('QR_SIGNING_KEY', os.getenv('SECRET_KEY', 'dev_secret_key')).encode('utf-8')
+
+
+def _sign(body):
+    return hmac.new(SIGNING_KEY, body, hashlib.sha256).digest()[:SIGNATURE_BYTES]
+
+
+def encode_payload(product_id):
+    """生成产品的二维码内容"""
+    if not 0 < product_id <= MAX_PRODUCT_ID:
+        raise ValueError('产品ID超出二维码可编码范围')
+    body = bytes([VERSION]) + product_id.to_bytes(ID_BYTES, 'big')
+    return base64.b32encode(body + _sign(body)).decode('ascii').rstrip('=')
+
+
+def decode_payload(payload):
+    """解码紧凑二维码内容，返回产品ID；不是紧凑格式或签名不符时抛出 ValueError"""
+    token = payload.strip().upper()
+    if len(token) != TOKEN_LENGTH:
+        raise ValueError('二维码长度不符')
+    try:
+        raw = base64.b32decode(token + '=' * (-len(token) % 8))
+    except (ValueError, TypeError):
+        raise ValueError('二维码不是有效的base32编码')
+    if len(raw) != TOKEN_BYTES or raw[0] != VERSION:
+        raise ValueError('不支持的二维码版本')
+    # 末位字符含 2 个填充位，解码时不会校验，需要确认是规范编码
+    if base64.b32encode(raw).decode('ascii').rstrip('=') != token:
+        raise ValueError('二维码不是规范编码')
+    body, signature = raw[:1 + ID_BYTES], raw[1 + ID_BYTES:]
+    if not hmac.compare_digest(signature, _sign(body)):
+        raise ValueError('二维码签名校验失败')
+    return int.from_bytes(body[1:], 'big')
+
+
+def product_id_from_payload(payload):
+    """能从二维码直接得到产品ID时返回ID，旧格式或无效内容返回 None"""
+    try:
+        return decode_payload(payload)
+    except ValueError:
+        return None
+
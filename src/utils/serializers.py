@@ -0,0 +1,133 @@
+"""JSON 序列化
+
+每个模型一个预先构建的序列化器，字段与模型的 to_dict() 一致。列表接口
+按 ?fields= 只查询需要的列（查询返回列元组，不构造 ORM 对象），每种字段
+组合的行转换函数只构建一次并缓存。时间字段保持 datetime，由 dumps 直接编码
+为与 isoformat() 相同的格式，不再逐字段调用 isoformat()。
+
+dumps 优先使用 orjson（可选依赖），未安装时退回标准库 json。
+"""
+import json
+from datetime import date
+from decimal import Decimal
+from functools import lru_cache
+from operator import attrgetter
+from flask import make_response
+from src.models.product import Product
+from src.models.device import Device
+from src.models.supplier import Supplier
+from src.models.tracking import TrackingData, QualityCheck
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 可选依赖
+    orjson = None
+
+
+def _default(value):
+    """orjson / json 无法直接编码的类型"""
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f'无法序列化 {type(value).__name__}')
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(data):
+        """编码为 UTF-8 JSON 字节串"""
+        return orjson.dumps(data, default=_default, option=_ORJSON_OPTIONS)
+else:
+    def dumps(data):
+        """编码为 UTF-8 JSON 字节串"""
+        return json.dumps(data, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def output_json(data, code, headers=None):
+    """Flask-RESTful 的 application/json 响应表示"""
+    response = make_response(dumps(data), code)
+    response.headers.extend(headers or {})
+    response.mimetype = 'application/json'
+    return response
+
+
+def install_json_representation(api):
+    """用 dumps 替换 Flask-RESTful 默认的标准库 json 编码"""
+    api.representations['application/json'] = output_json
+
+
+class Serializer:
+    """模型序列化器：字段投影、按列查询和行转换"""
+
+    def __init__(self, model, fields):
+        self.model = model
+        self.fields = tuple(fields)
+        self._columns = {name: getattr(model, name) for name in self.fields}
+
+    def parse_fields(self, value):
+        """解析 ?fields=id,status，未指定时返回全部字段"""
+        if not value:
+            return self.fields
+        names = tuple(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+        unknown = [name for name in names if name not in self._columns]
+        if unknown:
+            raise ValueError(f"未知字段: {', '.join(unknown)}，可选字段: {', '.join(self.fields)}")
+        return names or self.fields
+
+    def columns(self, names, extra=()):
+        """查询列：投影字段加上分页排序需要的列（按列名去重）"""
+        columns = {name: self._columns[name] for name in names}
+        for column in extra:
+            columns.setdefault(column.key, column)
+        return list(columns.values())
+
+    def query(self, query, names, extra=()):
+        """把 ORM 查询改为只返回需要的列"""
+        return query.with_entities(*self.columns(names, extra))
+
+    def dump_rows(self, rows, names):
+        """列元组（按列名取值）转换为字典列表"""
+        convert = _row_converter(names)
+        return [convert(row) for row in rows]
+
+    def dump(self, obj, names=None):
+        """ORM 对象转换为字典（时间字段保持 datetime）"""
+        return _row_converter(names or self.fields)(obj)
+
+
+@lru_cache(maxsize=256)
+def _row_converter(names):
+    """为一组字段构建行转换函数：attrgetter 一次取出全部字段再 zip 成字典"""
+    getter = attrgetter(*names)
+    if len(names) == 1:
+        name = names[0]
+        return lambda row: {name: getter(row)}
+    return lambda row: dict(zip(names, getter(row)))
+
+
+SERIALIZERS = {
+    'products': Serializer(Product, (
+        'id', 'product_code', 'product_name', 'product_type', 'specifications', 'manufacturer',
+        'production_date', 'warranty_period', 'status', 'created_at', 'updated_at', 'version'
+    )),
+    'devices': Serializer(Device, (
+        'id', 'device_code', 'device_name', 'device_type', 'location', 'status', 'last_maintenance',
+        'next_maintenance', 'specifications', 'manufacturer', 'purchase_date', 'created_at', 'updated_at'
+    )),
+    'suppliers': Serializer(Supplier, (
+        'id', 'supplier_code', 'supplier_name', 'contact_person', 'contact_phone', 'contact_email',
+        'address', 'rating', 'status', 'created_at', 'updated_at'
+    )),
+    'quality_checks': Serializer(QualityCheck, (
+        'id', 'product_id', 'inspector_id', 'check_time', 'check_type', 'check_items', 'pass_status',
+        'comments', 'images'
+    )),
+    'tracking_data': Serializer(TrackingData, (
+        'id', 'product_id', 'qr_code', 'blockchain_hash', 'current_location', 'current_status',
+        'last_updated', 'created_at'
+    )),
+}
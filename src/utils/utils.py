@@ -1,10 +1,8 @@
 import hashlib
-import qrcode
 import os
 import json
 from datetime import datetime
-import pandas as pd
-import matplotlib.pyplot as plt
+from src.services.audit_log import audit_sink
 
 # 生成唯一ID
 def generate_unique_id(prefix=''):
@@ -16,6 +14,8 @@ def generate_unique_id(prefix=''):
 # 生成二维码
 def generate_qr_code(data, output_path):
     """生成二维码并保存到指定路径"""
+    import qrcode
+
     qr = qrcode.QRCode(
         version=1,
         error_correction=qrcode.constants.ERROR_CORRECT_L,
@@ -50,45 +50,64 @@ def format_datetime(dt, format_str='%Y-%m-%d %H:%M:%S'):
 
 # 导出数据为Excel
 def export_to_excel(data, filename, sheet_name='Sheet1'):
-    """将数据导出为Excel文件"""
+    """将数据（字典的可迭代对象）逐行写入Excel文件，write_only 模式不在内存中保留整张表"""
+    from openpyxl import Workbook
+
     # 确保输出目录存在
     os.makedirs(os.path.dirname(filename), exist_ok=True)
     
-    # 转换数据为DataFrame
-    df = pd.DataFrame(data)
-    
-    # 保存为Excel文件
-    df.to_excel(filename, index=False, sheet_name=sheet_name)
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=sheet_name)
+    columns = None
+    for row in data:
+        if columns is None:
+            columns = list(row.keys())
+            sheet.append(columns)
+        sheet.append([
+            json.dumps(value, ensure_ascii=False) if isinstance(value, (dict, list)) else value
+            for value in (row.get(column) for column in columns)
+        ])
+    
+    workbook.save(filename)
     return filename
 
 # 生成数据可视化图表
 def generate_chart(data, chart_type, filename, title='', x_label='', y_label=''):
-    """生成数据可视化图表"""
+    """生成数据可视化图表（按文件扩展名输出 PNG 或 SVG）
+
+    使用 Figure 对象和 Agg 画布，不经过 pyplot 的全局状态，可在多线程中调用
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
     # 确保输出目录存在
     os.makedirs(os.path.dirname(filename), exist_ok=True)
     
-    plt.figure(figsize=(10, 6))
+    fig = Figure(figsize=(10, 6))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
     
     if chart_type == 'bar':
         x_data = list(data.keys())
         y_data = list(data.values())
-        plt.bar(x_data, y_data)
+        ax.bar(x_data, y_data)
     elif chart_type == 'pie':
         labels = list(data.keys())
         sizes = list(data.values())
-        plt.pie(sizes, labels=labels, autopct='%1.1f%%')
-        plt.axis('equal')
+        # 全部为 0 时 matplotlib 无法绘制饼图
+        if sum(sizes) > 0:
+            ax.pie(sizes, labels=labels, autopct='%1.1f%%')
+        ax.axis('equal')
     elif chart_type == 'line':
         x_data = list(data.keys())
         y_data = list(data.values())
-        plt.plot(x_data, y_data, marker='o')
+        ax.plot(x_data, y_data, marker='o')
     
-    plt.title(title)
-    plt.xlabel(x_label)
-    plt.ylabel(y_label)
-    plt.tight_layout()
-    plt.savefig(filename)
-    plt.close()
+    ax.set_title(title)
+    ax.set_xlabel(x_label)
+    ax.set_ylabel(y_label)
+    fig.tight_layout()
+    fig.savefig(filename)
     
     return filename
 
@@ -114,9 +133,9 @@ def generate_report_id():
     random_part = generate_unique_id()
     return f"REPORT_{timestamp}_{random_part}"
 
-# 记录操作日志（在实际应用中会写入MongoDB）
+# 记录操作日志
 def log_operation(user_id, operation_type, target_type, target_id, details=None):
-    """记录操作日志"""
+    """记录操作日志：只放入内存队列，由后台线程批量写入日志文件或MongoDB"""
     log_entry = {
         'user_id': user_id,
         'operation_type': operation_type,
@@ -126,10 +145,7 @@ def log_operation(user_id, operation_type, target_type, target_id, details=None)
         'timestamp': datetime.utcnow().isoformat()
     }
     
-    # 在实际应用中，这里会将日志写入MongoDB
-    # mongo_client.logs.insert_one(log_entry)
-    
-    print(f"Operation logged: {json.dumps(log_entry, ensure_ascii=False)}")
+    audit_sink.enqueue(log_entry)
     return log_entry
 
 # 计算产品质量得分
@@ -146,4 +162,16 @@ def calculate_quality_score(check_items):
             total_score += item['score']
             item_count += 1
     
-    return total_score / item_count if item_count > 0 else 0
\ No newline at end of file
+    return total_score / item_count if item_count > 0 else 0
+
+def process_alive(pid):
+    """同一主机上的进程是否仍在运行（用于识别进程退出后遗留的后台任务状态）"""
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True